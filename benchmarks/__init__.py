@@ -0,0 +1,5 @@
+"""
+
+Makeshow benchmarks init-file
+
+"""
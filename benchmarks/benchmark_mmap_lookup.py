@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+
+benchmark_mmap_lookup.py - Compare single-target lookups through the line-based and the memory-mapped paths
+
+Usage:
+    ./benchmarks/benchmark_mmap_lookup.py [--num_targets N] [--recipe_length L]
+        Will generate a Makefile with N targets of L recipe lines each and time looking up a single target definition,
+        both by loading all lines and calling find_single_target_definition and through the mmap byte-offset index.
+
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import utils  # noqa: E402
+
+
+########################################################################################################################
+
+
+def write_synthetic_makefile(makefile_path: Path, num_targets: int, recipe_length: int) -> None:
+    with makefile_path.open("w") as f:
+        for i in range(num_targets):
+            f.write(f"target_{i}: target_{i + 1} target_{i + 2}\n")
+            for j in range(recipe_length):
+                f.write(f"\t@echo 'Step {j} of target {i}' && ./run_step.sh --target {i} --step {j}\n")
+            f.write("\n")
+
+
+def time_it(func: Callable[[], str]) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+########################################################################################################################
+
+
+def main(arg_list: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Compare line-based and memory-mapped single-target lookups.")
+    parser.add_argument("--num_targets", type=int, default=50_000, help="Number of targets in the Makefile.")
+    parser.add_argument("--recipe_length", type=int, default=10, help="Number of recipe lines per target.")
+    args = parser.parse_args(arg_list)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        makefile_path = Path(tmp_dir) / "Makefile"
+        write_synthetic_makefile(makefile_path, args.num_targets, args.recipe_length)
+        target = f"target_{args.num_targets // 2}"
+
+        def _line_based_lookup() -> str:
+            lines = utils.load_lines_from_makefile_and_its_included_files(makefile_path)
+            return utils.find_single_target_definition(lines, target)
+
+        def _mmap_lookup() -> str:
+            index = utils.build_mmap_makefile_index(makefile_path)
+            return utils.get_mmap_target_definition(index, target)
+
+        assert _line_based_lookup() == _mmap_lookup()
+        size_mb = makefile_path.stat().st_size / 1024 / 1024
+        print(f"Makefile: {args.num_targets} targets, {size_mb:.1f} MB")
+        print(f"find_single_target_definition:  {1000 * time_it(_line_based_lookup):8.1f} ms")
+        print(f"get_mmap_target_definition:     {1000 * time_it(_mmap_lookup):8.1f} ms")
+    return 0
+
+
+########################################################################################################################
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+
+benchmark_output.py - Compare printing target definitions with a print per line and with a single buffered write
+
+Usage:
+    ./benchmarks/benchmark_output.py [--num_targets N] [--runs R]
+        Will generate a Makefile with a dependency chain of N targets, and print the definitions of the whole chain,
+        the usage with the list of all targets and the entire Makefile, both with a print call per line, like makeshow
+        used to, and with the buffered output of makeshow.
+        Output is written to a line-buffered stream, like a terminal, and to a block-buffered stream, like a pipe.
+
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import utils  # noqa: E402
+from benchmarks.synthetic_makefiles import SyntheticMakefileSpec, write_synthetic_makefile  # noqa: E402
+
+
+########################################################################################################################
+
+
+# The printing functions of makeshow before the output was buffered, with a print call per line
+
+
+def print_list_per_call(my_list: List[str], sep: str = "*") -> None:
+    print(f"{sep} ", end="")
+    print(f"\n{sep} ".join(my_list))
+
+
+def print_usage_per_call(makefile_path: Path, all_targets: List[str]) -> None:
+    print("Usage: python makeshow.py <target_name> [<target_name> ...]")
+    print("")
+    print("This will print the definition of the provided Makefile targets.")
+    print("")
+    print("Highlighted options:")
+    print("* Add -d to also print the definitions of the targets that the provided targets depend on.")
+    print("* Add -r to also print the definitions of the targets that depend on the provided targets.")
+    print("* Use -s to print the entire Makefile (including includes) instead of specific targets.")
+    print("* Install 'pygments' to show Makefile contents and targets in color.")
+    print("")
+    print("Makefile:")
+    print(f"  {makefile_path.absolute()}")
+    print("")
+    print("Targets found in Makefile:")
+    print_list_per_call(all_targets)
+    print("")
+
+
+def print_entire_makefile_per_call(lines: List[str]) -> None:
+    print("")
+    print("\n".join(lines).strip("\n"))
+    print("")
+
+
+def print_target_definitions_per_call(all_target_definitions: Dict[str, str], targets_to_show: List[str]) -> None:
+    print("")
+    for target in targets_to_show:
+        target_definition = all_target_definitions.get(target, f"(No definition found for target '{target}')")
+        if target_definition != "":
+            print(target_definition)
+        else:
+            print(f"Target '{target}' not found in Makefile.")
+        print("")
+
+
+########################################################################################################################
+
+
+def time_it(func: Callable[[], None], stream: io.TextIOWrapper, runs: int) -> float:
+    durations = []
+    for _ in range(runs):
+        with contextlib.redirect_stdout(stream):
+            start = time.perf_counter()
+            func()
+            stream.flush()
+            durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def capture_output(func: Callable[[], None]) -> str:
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        func()
+    return buffer.getvalue()
+
+
+def open_null_stream(line_buffering: bool) -> io.TextIOWrapper:
+    return io.TextIOWrapper(open(os.devnull, "wb"), encoding="utf-8", line_buffering=line_buffering)
+
+
+########################################################################################################################
+
+
+def main(arg_list: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Compare per-call and buffered printing of makeshow output.")
+    parser.add_argument("--num_targets", type=int, default=5000, help="Number of targets in the dependency chain.")
+    parser.add_argument("--runs", type=int, default=10, help="Number of runs per scenario.")
+    args = parser.parse_args(arg_list)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        spec = SyntheticMakefileSpec(num_targets=args.num_targets, dependency_depth=args.num_targets)
+        makefile_path = write_synthetic_makefile(Path(tmp_dir), spec)
+        lines = utils.load_lines_from_makefile_and_its_included_files(makefile_path)
+    index = utils.build_makefile_index(lines)
+    definitions = utils.get_target_list_definitions(index, index.targets)
+    chain = utils.DependencyGraph(utils.get_target_list_dependencies(index, index.targets)).compute_dependency_chain(
+        ["target_0"]
+    )
+    coloring_func: Optional[Callable[[str], str]] = None
+
+    scenarios = {
+        f"-d chain of {len(chain)} targets": (
+            lambda: print_target_definitions_per_call(definitions, chain),
+            lambda: utils.print_target_definitions(definitions, chain, coloring_func=coloring_func),
+        ),
+        f"usage with {len(index.targets)} targets": (
+            lambda: print_usage_per_call(makefile_path, index.targets),
+            lambda: utils.print_usage(makefile_path, index.targets, coloring_func=coloring_func),
+        ),
+        f"-s with {len(lines)} lines": (
+            lambda: print_entire_makefile_per_call(lines),
+            lambda: utils.print_entire_makefile(lines, coloring_func=coloring_func),
+        ),
+    }
+
+    width = max(len(name) for name in scenarios)
+    for name, (per_call_printing, buffered_printing) in scenarios.items():
+        assert capture_output(per_call_printing) == capture_output(buffered_printing), name
+        for stream_kind, line_buffering in [("line-buffered", True), ("block-buffered", False)]:
+            with open_null_stream(line_buffering) as stream:
+                per_call_time = time_it(per_call_printing, stream, args.runs)
+                buffered_time = time_it(buffered_printing, stream, args.runs)
+            print(
+                f"{name:<{width}}  {stream_kind:<14}  per call: {1000 * per_call_time:7.2f} ms"
+                f"  buffered: {1000 * buffered_time:7.2f} ms  ({per_call_time / buffered_time:4.1f}x faster)"
+            )
+    return 0
+
+
+########################################################################################################################
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+
+benchmark_parallel_includes.py - Compare sequential and parallel loading of included files
+
+Usage:
+    ./benchmarks/benchmark_parallel_includes.py [--num_fragments N] [--latency_ms L] [--jobs J]
+        Will generate a Makefile including N fragments, which all include a common file, and time loading it with the
+        included files read one after another and on a thread pool of J threads.
+        Every file read is delayed by L milliseconds to simulate a network-mounted file system.
+
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import utils  # noqa: E402
+from utils import parsing_utils  # noqa: E402
+
+
+########################################################################################################################
+
+
+def write_synthetic_makefile_tree(makefile_path: Path, num_fragments: int) -> None:
+    fragments_dir = makefile_path.parent / "fragments"
+    fragments_dir.mkdir()
+    (fragments_dir / "common.mk").write_text("common:\n\t@echo 'common'\n")
+    with makefile_path.open("w") as f:
+        for i in range(num_fragments):
+            (fragments_dir / f"fragment_{i}.mk").write_text(
+                f"include fragments/common.mk\n\ntarget_{i}: common\n\t@echo 'target {i}'\n"
+            )
+            f.write(f"include fragments/fragment_{i}.mk\n")
+        f.write("\nall: " + " ".join(f"target_{i}" for i in range(num_fragments)) + "\n")
+
+
+def time_it(func: Callable[[], List[str]]) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+########################################################################################################################
+
+
+def main(arg_list: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Compare sequential and parallel loading of included files.")
+    parser.add_argument("--num_fragments", type=int, default=30, help="Number of included fragments.")
+    parser.add_argument("--latency_ms", type=float, default=5.0, help="Simulated latency of every file read.")
+    parser.add_argument("--jobs", type=int, default=8, help="Number of threads for the parallel loading.")
+    args = parser.parse_args(arg_list)
+
+    # Simulate a high-latency file system by delaying every read of an included file
+    read_lines = parsing_utils.read_lines_and_handle_backslashes
+
+    def _slow_read_lines(file_path: Path, err_msg: str = "File not found:") -> List[str]:
+        time.sleep(args.latency_ms / 1000)
+        return read_lines(file_path, err_msg=err_msg)
+
+    parsing_utils.read_lines_and_handle_backslashes = _slow_read_lines
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        makefile_path = Path(tmp_dir) / "Makefile"
+        write_synthetic_makefile_tree(makefile_path, args.num_fragments)
+
+        def _sequential_loading() -> List[str]:
+            return list(utils.iter_lines_from_makefile_and_its_included_files(makefile_path))
+
+        def _parallel_loading() -> List[str]:
+            return list(utils.iter_lines_from_makefile_and_its_included_files(makefile_path, jobs=args.jobs))
+
+        assert _sequential_loading() == _parallel_loading()
+        print(f"Makefile: {args.num_fragments} included fragments, {args.latency_ms:.1f} ms latency per read")
+        print(f"Sequential loading:         {1000 * time_it(_sequential_loading):8.1f} ms")
+        print(f"Parallel loading ({args.jobs:2d} jobs): {1000 * time_it(_parallel_loading):8.1f} ms")
+    return 0
+
+
+########################################################################################################################
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
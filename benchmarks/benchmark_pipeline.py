@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+
+benchmark_pipeline.py - Time each stage of the makeshow pipeline on synthetic Makefiles
+
+Usage:
+    ./benchmarks/benchmark_pipeline.py [--runs N] [--scale S]
+        Will generate a synthetic Makefile per scenario, each scaling one axis (target count, recipe length,
+        include fan-out, dependency depth and width, continuation density), and print the best time of N runs of
+        each stage: loading the lines, indexing the targets and their definitions, finding the dependencies,
+        computing the dependency chain of target_0, coloring and printing its definitions.
+        The target count of all scenarios is multiplied by S.
+    ./benchmarks/benchmark_pipeline.py --save_baseline benchmarks/baseline.json
+        Will also write the timings to a JSON baseline.
+    MAKESHOW_BENCHMARK_BASELINE=benchmarks/baseline.json python3 -m pytest test/test_benchmarks.py
+        Will check the timings for regressions against a JSON baseline, failing if any stage is more than a fraction
+        MAKESHOW_BENCHMARK_TOLERANCE (0.5 by default) slower than in the baseline.
+
+"""
+
+import argparse
+import contextlib
+import dataclasses
+import io
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, TypeVar
+
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import utils  # noqa: E402
+from benchmarks.synthetic_makefiles import SyntheticMakefileSpec  # noqa: E402
+from benchmarks.synthetic_makefiles import get_target_name, write_synthetic_makefile  # noqa: E402
+
+
+########################################################################################################################
+
+
+BASELINE_FORMAT_VERSION = 1
+# Environment variables of the regression check in test/test_benchmarks.py
+BASELINE_PATH_ENV_VAR = "MAKESHOW_BENCHMARK_BASELINE"
+TOLERANCE_ENV_VAR = "MAKESHOW_BENCHMARK_TOLERANCE"
+DEFAULT_TOLERANCE = 0.5
+# Stages faster than this many seconds in the baseline are too noisy to flag as regressions
+MIN_REGRESSION_DELTA = 0.0005
+
+SCENARIOS = {
+    "default": SyntheticMakefileSpec(),
+    "many_targets": SyntheticMakefileSpec(num_targets=10_000),
+    "long_recipes": SyntheticMakefileSpec(recipe_length=30),
+    "include_fanout": SyntheticMakefileSpec(include_fanout=50),
+    "deep_dependencies": SyntheticMakefileSpec(dependency_depth=200, dependency_width=1),
+    "wide_dependencies": SyntheticMakefileSpec(dependency_depth=3, dependency_width=50),
+    "dense_continuations": SyntheticMakefileSpec(continuation_density=0.8),
+}
+
+T = TypeVar("T")
+
+
+@dataclasses.dataclass
+class PipelineBaseline:
+    runs: int
+    scale: float
+    results: Dict[str, Dict[str, float]]  # Best duration in seconds of each stage, by scenario
+
+
+########################################################################################################################
+
+
+def time_pipeline(makefile_path: Path, coloring_func: Optional[Callable[[str], str]]) -> Dict[str, float]:
+    """
+    Run the makeshow pipeline for showing target_0 and its dependencies once, timing each stage separately.
+    :param makefile_path: Path to the Makefile.
+    :param coloring_func: Coloring function, or None to skip the coloring stage.
+    :return: Duration of each stage in seconds.
+    """
+    durations: Dict[str, float] = dict()
+
+    def _time_stage(stage: str, func: Callable[[], T]) -> T:
+        start = time.perf_counter()
+        result = func()
+        durations[stage] = time.perf_counter() - start
+        return result
+
+    lines = _time_stage("load_lines", lambda: utils.load_lines_from_makefile_and_its_included_files(makefile_path))
+    index = _time_stage("index_targets", lambda: utils.build_makefile_index(lines))
+    definitions = _time_stage("get_definitions", lambda: utils.get_target_list_definitions(index, index.targets))
+    dependencies = _time_stage("get_dependencies", lambda: utils.get_target_list_dependencies(index, index.targets))
+    chain = _time_stage(
+        "compute_dependency_chain",
+        lambda: utils.DependencyGraph(dependencies).compute_dependency_chain([get_target_name(0)]),
+    )
+    if coloring_func is not None:
+        # Color without the highlights memoized by the previous run
+        utils.clear_memory_caches()
+        _time_stage("coloring", lambda: utils.color_texts([definitions[t] for t in chain], coloring_func))
+    with contextlib.redirect_stdout(io.StringIO()):
+        _time_stage("printing", lambda: utils.print_target_definitions(definitions, chain))
+    return durations
+
+
+def run_pipeline_benchmark(runs: int, scale: float) -> Dict[str, Dict[str, float]]:
+    """
+    Time each stage of the makeshow pipeline on the synthetic Makefile of every scenario.
+    :param runs: Number of runs per scenario.
+    :param scale: Factor to multiply the target count of every scenario with.
+    :return: Best duration in seconds of each stage, by scenario.
+    """
+    coloring_func = utils.get_optional_coloring_function("monokai", disable_coloring=False)
+    results: Dict[str, Dict[str, float]] = dict()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, spec in SCENARIOS.items():
+            spec = dataclasses.replace(spec, num_targets=max(1, round(scale * spec.num_targets)))
+            makefile_path = write_synthetic_makefile(Path(tmp_dir) / name, spec)
+            # Warm up first, e.g. the file system cache and the pygments lexer and formatter
+            time_pipeline(makefile_path, coloring_func)
+            best: Dict[str, float] = dict()
+            for _ in range(runs):
+                for stage, duration in time_pipeline(makefile_path, coloring_func).items():
+                    best[stage] = min(duration, best.get(stage, duration))
+            results[name] = best
+    return results
+
+
+########################################################################################################################
+
+
+def find_regressions(
+    results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float
+) -> List[str]:
+    """
+    Compare the stage durations with a baseline.
+    Stages missing from the baseline are skipped, and so are stages less than MIN_REGRESSION_DELTA slower.
+    :param results: Duration in seconds of each stage, by scenario.
+    :param baseline: Baseline duration in seconds of each stage, by scenario.
+    :param tolerance: Fraction a stage may be slower than in the baseline, e.g. 0.25 for 25%.
+    :return: Description of each regression.
+    """
+    regressions = []
+    for name, durations in results.items():
+        for stage, duration in durations.items():
+            baseline_duration = baseline.get(name, dict()).get(stage)
+            if baseline_duration is None:
+                continue
+            if duration > (1 + tolerance) * baseline_duration and duration - baseline_duration > MIN_REGRESSION_DELTA:
+                regressions.append(
+                    f"{name}/{stage}: {1000 * duration:.2f} ms vs. {1000 * baseline_duration:.2f} ms in the baseline"
+                    f" ({100 * (duration / baseline_duration - 1):+.0f}%)"
+                )
+    return regressions
+
+
+def save_baseline(baseline_path: Path, results: Dict[str, Dict[str, float]], runs: int, scale: float) -> None:
+    baseline = {"version": BASELINE_FORMAT_VERSION, "runs": runs, "scale": scale, "results": results}
+    baseline_path.write_text(json.dumps(baseline, indent=2) + "\n")
+
+
+def load_baseline(baseline_path: Path) -> PipelineBaseline:
+    """
+    :param baseline_path: Path to a JSON baseline written by save_baseline.
+    :return: Baseline.
+    :raise ValueError: If the file isn't a baseline of the current format.
+    """
+    baseline = json.loads(baseline_path.read_text())
+    if not isinstance(baseline, dict) or baseline.get("version") != BASELINE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported baseline format in '{baseline_path}', please save the baseline again.")
+    runs, scale, results = baseline.get("runs"), baseline.get("scale"), baseline.get("results")
+    if (
+        not isinstance(runs, int)
+        or not isinstance(scale, (int, float))
+        or not isinstance(results, dict)
+        or not all(isinstance(durations, dict) for durations in results.values())
+        or not all(isinstance(d, (int, float)) for durations in results.values() for d in durations.values())
+    ):
+        raise ValueError(f"Invalid baseline in '{baseline_path}', please save the baseline again.")
+    return PipelineBaseline(runs=runs, scale=float(scale), results=results)
+
+
+########################################################################################################################
+
+
+def main(arg_list: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Time each stage of the makeshow pipeline on synthetic Makefiles.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs per scenario.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Factor to multiply the target counts with.")
+    parser.add_argument("--save_baseline", type=Path, default=None, help="Write the timings to this JSON file.")
+    args = parser.parse_args(arg_list)
+
+    results = run_pipeline_benchmark(args.runs, args.scale)
+    stages = list(dict.fromkeys(stage for durations in results.values() for stage in durations))
+    width = max(len(name) for name in results)
+    print(f"{'scenario':<{width}}" + "".join(f"  {stage:>24}" for stage in stages))
+    for name, durations in results.items():
+        cells = [f"{1000 * durations[s]:21.2f} ms" if s in durations else f"{'-':>24}" for s in stages]
+        print(f"{name:<{width}}" + "".join(f"  {cell}" for cell in cells))
+
+    if args.save_baseline is not None:
+        save_baseline(args.save_baseline, results, args.runs, args.scale)
+        print(f"\nSaved baseline to '{args.save_baseline}'.")
+    return 0
+
+
+########################################################################################################################
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
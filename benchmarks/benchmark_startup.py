@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+
+benchmark_startup.py - Measure the startup latency of makeshow
+
+Usage:
+    ./benchmarks/benchmark_startup.py [--runs N]
+        Will run makeshow N times per scenario in fresh interpreters and print the median wall time of each scenario,
+        together with the cost of eagerly importing pygments, which makeshow no longer pays unless it colors output.
+
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+
+########################################################################################################################
+
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+MAKESHOW_PATH = REPO_DIR / "makeshow.py"
+
+EAGER_PYGMENTS_IMPORT = (
+    "import pygments.formatters, pygments.lexers, pygments.styles;"
+    " list(pygments.styles.get_all_styles()); pygments.lexers.MakefileLexer()"
+)
+
+
+########################################################################################################################
+
+
+def time_command(command: List[str], runs: int) -> float:
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=REPO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def run_startup_benchmark(runs: int) -> Dict[str, float]:
+    python = sys.executable
+    scenarios = {
+        "interpreter only": [python, "-c", "pass"],
+        "eager pygments import (old cost)": [python, "-c", EAGER_PYGMENTS_IMPORT],
+        "makeshow, Makefile not found": [python, str(MAKESHOW_PATH), "-m", "does/not/exist/Makefile", "test"],
+        "makeshow --no_colors test": [python, str(MAKESHOW_PATH), "--no_colors", "test"],
+        "makeshow test (colored)": [python, str(MAKESHOW_PATH), "test"],
+    }
+    return {name: time_command(command, runs) for name, command in scenarios.items()}
+
+
+########################################################################################################################
+
+
+def main(arg_list: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Measure the startup latency of makeshow.")
+    parser.add_argument("--runs", type=int, default=20, help="Number of runs per scenario.")
+    args = parser.parse_args(arg_list)
+    results = run_startup_benchmark(args.runs)
+    width = max(len(name) for name in results)
+    for name, duration in results.items():
+        print(f"{name:<{width}}  {1000 * duration:8.1f} ms")
+    return 0
+
+
+########################################################################################################################
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
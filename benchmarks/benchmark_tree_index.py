@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+
+benchmark_tree_index.py - Time indexing all Makefiles under a folder
+
+Usage:
+    ./benchmarks/benchmark_tree_index.py [--num_makefiles N] [--num_targets T] [--jobs J]
+        Will generate a folder tree with N Makefiles of T targets each and time indexing it sequentially,
+        across a process pool of J processes (0 for one per CPU), and incrementally after changing one Makefile.
+
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import utils  # noqa: E402
+
+
+########################################################################################################################
+
+
+def write_synthetic_tree(root_dir: Path, num_makefiles: int, num_targets: int) -> None:
+    for i in range(num_makefiles):
+        makefile_dir = root_dir / f"service_{i // 30}" / f"component_{i}"
+        makefile_dir.mkdir(parents=True)
+        with (makefile_dir / "Makefile").open("w") as f:
+            f.write("include ../../common.mk\n\n")
+            for j in range(num_targets):
+                f.write(f"target_{i}_{j}: build_{i} target_{i}_{j + 1}\n")
+                f.write(f"\t@echo 'Target {j} of component {i}' && ./run.sh --component {i} --target {j}\n\n")
+    (root_dir / "common.mk").write_text("build_common:\n\t@echo 'common'\n")
+
+
+def time_it(func: Callable[[], utils.TreeIndex]) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+########################################################################################################################
+
+
+def main(arg_list: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Time indexing all Makefiles under a folder.")
+    parser.add_argument("--num_makefiles", type=int, default=900, help="Number of Makefiles in the folder tree.")
+    parser.add_argument("--num_targets", type=int, default=50, help="Number of targets per Makefile.")
+    parser.add_argument("--jobs", type=int, default=0, help="Number of processes, or 0 for one per CPU.")
+    args = parser.parse_args(arg_list)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root_dir = Path(tmp_dir) / "repo"
+        cache_dir = Path(tmp_dir) / "cache"
+        write_synthetic_tree(root_dir, args.num_makefiles, args.num_targets)
+
+        def _sequential_indexing() -> utils.TreeIndex:
+            return utils.build_tree_index(root_dir, jobs=1)
+
+        def _parallel_indexing() -> utils.TreeIndex:
+            return utils.build_tree_index(root_dir, jobs=args.jobs)
+
+        def _incremental_indexing() -> utils.TreeIndex:
+            return utils.update_tree_index(root_dir, cache_dir=cache_dir, jobs=args.jobs)
+
+        assert _sequential_indexing() == _parallel_indexing()
+        print(f"Folder tree: {args.num_makefiles} Makefiles of {args.num_targets} targets each")
+        print(f"Sequential indexing:               {1000 * time_it(_sequential_indexing):8.1f} ms")
+        print(f"Process pool indexing:             {1000 * time_it(_parallel_indexing):8.1f} ms")
+        _incremental_indexing()
+        with (root_dir / "service_0" / "component_0" / "Makefile").open("a") as f:
+            f.write("new_target:\n\t@echo 'new'\n")
+        print(f"Incremental indexing (1 changed):  {1000 * time_it(_incremental_indexing):8.1f} ms")
+    return 0
+
+
+########################################################################################################################
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
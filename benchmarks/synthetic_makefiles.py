@@ -0,0 +1,80 @@
+"""
+
+Synthetic Makefile generator for the makeshow benchmarks
+
+"""
+
+import dataclasses
+import random
+from pathlib import Path
+from typing import List
+
+
+########################################################################################################################
+
+
+@dataclasses.dataclass
+class SyntheticMakefileSpec:
+    num_targets: int = 1000
+    recipe_length: int = 3  # Number of recipe lines of each target
+    include_fanout: int = 0  # Number of included files sharing the targets with the root Makefile
+    dependency_depth: int = 8  # Number of layers of targets, each target depending on targets of the next layer
+    dependency_width: int = 2  # Number of prerequisites of each target outside the last layer
+    continuation_density: float = 0.0  # Fraction of recipe lines continued on the next line with a backslash
+    seed: int = 0
+
+
+def get_target_name(i: int) -> str:
+    return f"target_{i}"
+
+
+def get_layer_bounds(spec: SyntheticMakefileSpec) -> List[int]:
+    """
+    Split the targets into spec.dependency_depth layers of (almost) equal size.
+    :param spec: Synthetic Makefile specification.
+    :return: Index of the first target of each layer, followed by the number of targets.
+    """
+    depth = max(1, min(spec.dependency_depth, spec.num_targets))
+    return [layer * spec.num_targets // depth for layer in range(depth + 1)]
+
+
+def write_synthetic_makefile(makefile_dir: Path, spec: SyntheticMakefileSpec) -> Path:
+    """
+    Write a Makefile, and the files it includes, with the targets described by a specification.
+    Target i of a layer depends on spec.dependency_width randomly picked targets of the next layer, so the dependency
+    chain of target_0 is spec.dependency_depth targets deep.
+    The targets are dealt round-robin to the root Makefile and its spec.include_fanout included files.
+    :param makefile_dir: Folder to write the Makefile and the included files to.
+    :param spec: Synthetic Makefile specification.
+    :return: Path to the root Makefile.
+    """
+    rng = random.Random(spec.seed)
+    layer_bounds = get_layer_bounds(spec)
+    num_files = 1 + spec.include_fanout
+    file_chunks: List[List[str]] = [[] for _ in range(num_files)]
+    for layer, (first, end) in enumerate(zip(layer_bounds[:-1], layer_bounds[1:])):
+        next_layer_end = layer_bounds[layer + 2] if layer + 2 < len(layer_bounds) else end
+        for i in range(first, end):
+            prerequisites: List[int] = []
+            if next_layer_end > end:
+                prerequisites = sorted({rng.randrange(end, next_layer_end) for _ in range(spec.dependency_width)})
+            chunk = [f"{get_target_name(i)}: {' '.join(get_target_name(p) for p in prerequisites)}".rstrip()]
+            for j in range(spec.recipe_length):
+                if rng.random() < spec.continuation_density:
+                    chunk.append(f"\t@echo 'Step {j} of target {i}' && \\\n\t\t./run_step.sh --target {i} --step {j}")
+                else:
+                    chunk.append(f"\t@echo 'Step {j} of target {i}' && ./run_step.sh --target {i} --step {j}")
+            file_chunks[i % num_files].append("\n".join(chunk) + "\n")
+
+    makefile_dir.mkdir(parents=True, exist_ok=True)
+    include_lines = [f"include fragments/fragment_{k}.mk\n" for k in range(spec.include_fanout)]
+    if spec.include_fanout > 0:
+        (makefile_dir / "fragments").mkdir(exist_ok=True)
+        for k in range(spec.include_fanout):
+            (makefile_dir / "fragments" / f"fragment_{k}.mk").write_text("\n".join(file_chunks[k + 1]))
+    makefile_path = makefile_dir / "Makefile"
+    makefile_path.write_text("".join(include_lines) + "\n" + "\n".join(file_chunks[0]))
+    return makefile_path
+
+
+########################################################################################################################
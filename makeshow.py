@@ -12,23 +12,83 @@ Usage:
         Will print the definitions of Makefile targets 1 to N.
     ./makeshow.py --show_dependencies target1
         Will print the definition of Makefile target "target1" and its dependencies, e.g. targets 3, 5 and 17.
+    ./makeshow.py --reverse_dependencies target1
+        Will print the definition of Makefile target "target1" and the targets that depend on it.
+    ./makeshow.py --expand target1
+        Will print the definition of Makefile target "target1" with its variables and functions expanded.
+    ./makeshow.py 'docker_*'
+        Will print the definitions of all Makefile targets starting with "docker_".
+    ./makeshow.py --search docker
+        Will print a list of the Makefile targets whose names contain "docker".
+    ./makeshow.py --grep 'docker push'
+        Will print the Makefile targets whose definitions contain "docker push", with the matching lines.
+    ./makeshow.py --tree path/to/repo target1
+        Will print the definitions of target "target1" in all Makefiles under "path/to/repo" that define it.
+    ./makeshow.py --watch --show_dependencies target1
+        Will keep printing the definition of Makefile target "target1" and its dependencies as the Makefile changes.
+    ./makeshow.py --format ndjson --show_dependencies target1
+        Will print a JSON record of Makefile target "target1" and of each of its dependencies per line.
+    ./makeshow.py --profile target1
+        Will print the definition of Makefile target "target1", and the time and memory used by each stage to stderr.
+    ./makeshow.py --completion_script bash
+        Will print a script for completing target names in bash (or zsh or fish), to be loaded with "source <(...)".
+    ./makeshow.py --daemon
+        Will keep parsed Makefiles in memory and serve ./makeshow_client.py, which takes the same arguments.
 
 """
 
+from __future__ import annotations
+
+import functools
+import os
 import sys
-from typing import List
+import time
 
 import utils
 
 
+# NB: Only the modules needed by the requested mode are imported, see utils/__init__.py, to keep the startup fast.
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from pathlib import Path
+    from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
 ########################################################################################################################
 
 
-def main(arg_list: List[str]) -> int:
+def main(arg_list: List[str], in_daemon: bool = False) -> int:
+    # Complete target names without parsing the arguments, as shell completion runs on every key press
+    completion_args = utils.parse_completion_args(arg_list)
+    if completion_args is not None:
+        return utils.run_completion(*completion_args)
+    start = time.perf_counter()
     params = utils.parse_args(arg_list)
+    # NB: The daemon serves one request at a time, so requests that never end are run locally by the client instead.
+    if in_daemon and (params.watch or params.run_daemon):
+        raise utils.LocalRunRequested()
+    if params.run_daemon:
+        return utils.run_daemon(utils.get_daemon_socket_path(), run_daemon_request)
+    if params.profile:
+        return run_makeshow_with_profiler(params, parse_args_time=time.perf_counter() - start)
     return run_makeshow(params)
 
 
+def run_daemon_request(arg_list: List[str]) -> int:
+    # NB: Running makeshow.py exits with 0 whatever main returns, so the client exits with 0 too.
+    main(arg_list, in_daemon=True)
+    return 0
+
+
+def run_makeshow_with_profiler(params: utils.MakeshowParameters, parse_args_time: float) -> int:
+    profiler = utils.Profiler(trace_memory=params.profile_memory, cprofile_path=params.profile_cprofile_path)
+    profiler.record_stage("parse_args", parse_args_time, 0 if params.profile_memory else utils.get_max_rss())
+    with profiler.activate():
+        exit_code = run_makeshow(params)
+    utils.print_profile_summary(profiler, params.profile_format)
+    return exit_code
+
+
 ########################################################################################################################
 
 
@@ -39,8 +99,25 @@ def run_makeshow(params: utils.MakeshowParameters) -> int:
     disable_coloring = params.disable_coloring
     color_scheme = params.color_scheme
 
+    # Clear the cache if requested
+    if params.clear_cache:
+        utils.clear_cache(utils.get_cache_dir())
+    cache_dir = utils.get_cache_dir() if params.use_cache else None
+
+    # Print a shell completion script, or the target names for shell completion, if requested
+    if params.completion_shell is not None:
+        sys.stdout.write(utils.get_completion_script(params.completion_shell))
+        return 0
+    if params.complete_prefix is not None:
+        return utils.run_completion(params.complete_prefix, str(makefile_path), use_cache=params.use_cache)
+
     # Prepare coloring function if colors are available
-    coloring_func = utils.get_optional_coloring_function(color_scheme, disable_coloring)
+    with utils.profile_stage("coloring_setup"):
+        coloring_func = utils.get_optional_coloring_function(color_scheme, disable_coloring, cache_dir=cache_dir)
+
+    # Look up targets in all Makefiles under a folder instead, if requested
+    if params.tree_dir is not None:
+        return run_makeshow_on_tree(params, cache_dir, coloring_func)
 
     # Show error message if given Makefile is not found
     if not makefile_path.is_file():
@@ -48,35 +125,246 @@ def run_makeshow(params: utils.MakeshowParameters) -> int:
         utils.print_makefile_not_found_error(makefile_path)
         return 17
 
-    # Load Makefile contents
-    lines = utils.load_lines_from_makefile_and_its_included_files(makefile_path)
+    # Keep showing the desired targets while the Makefile changes, if requested
+    if params.watch:
+        return watch_makeshow(params, coloring_func)
 
+    # Look up targets in a memory-mapped byte-offset index instead, if requested, to only decode the shown definitions
+    if params.use_mmap and not (
+        params.show_makefile_instead
+        or params.show_dependencies
+        or params.show_reverse_dependencies
+        or params.output_format != "text"
+        or params.expand
+        or params.search is not None
+        or params.grep is not None
+    ):
+        with utils.profile_stage("loading"):
+            mmap_index = utils.build_mmap_makefile_index(makefile_path)
+        utils.count_profile_event("targets", len(mmap_index.targets))
+        if len(desired_targets) == 0:
+            with utils.profile_stage("output"):
+                utils.print_banner()
+                utils.print_usage(makefile_path, mmap_index.targets, coloring_func=coloring_func)
+            return 0
+        # NB: Patterns, e.g. 'docker_*', and targets that are not found, which get suggestions, are only resolved by
+        #     the line-based index below.
+        if all(t in mmap_index.spans and not utils.is_target_pattern(t) for t in desired_targets):
+            with utils.profile_stage("target_extraction"):
+                target_definitions = utils.get_mmap_target_list_definitions(mmap_index, desired_targets)
+            with utils.profile_stage("output"):
+                utils.print_target_definitions(target_definitions, desired_targets, coloring_func=coloring_func)
+            return 0
+
+    # Load Makefile contents and index its targets, their definitions and their dependencies in a single pass
+    # NB: JSON records hold the file and line number of each target, which are recorded while the files are read.
+    _, index = utils.load_and_index_makefile(
+        makefile_path, cache_dir=cache_dir, jobs=params.jobs, source_positions=params.output_format != "text"
+    )
+    utils.count_profile_event("lines", len(index.lines))
+    utils.count_profile_event("targets", len(index.targets))
+    show_makefile_contents(params, index, utils.get_dependency_graph, coloring_func)
+    return 0
+
+
+def show_makefile_contents(
+    params: utils.MakeshowParameters,
+    index: utils.MakefileIndex,
+    get_dependency_graph: Callable[[utils.MakefileIndex], utils.DependencyGraph],
+    coloring_func: Optional[Callable[[str], str]],
+) -> None:
     # Maybe show entire Makefile instead?
     if params.show_makefile_instead:
-        utils.print_entire_makefile(lines, coloring_func=coloring_func)
-        return 0
+        with utils.profile_stage("output"):
+            utils.print_entire_makefile(index.lines, coloring_func=coloring_func)
+        return
+
+    # Print the targets whose names contain the search string instead, if requested
+    if params.search is not None:
+        with utils.profile_stage("output"):
+            utils.print_search_results(params.search, utils.get_target_search_index(index).search(params.search))
+        return
 
-    # Extract targets and their definitions
-    all_targets, all_target_definitions = utils.extract_targets_and_target_definitions(lines)
+    # Print the targets whose definitions contain the grep pattern instead, with the matching lines, if requested
+    if params.grep is not None:
+        cache_dir = utils.get_cache_dir() if params.use_cache else None
+        with utils.profile_stage("target_extraction"):
+            definition_index = utils.get_definition_token_index(index, params.makefile_path, cache_dir)
+            candidates = definition_index.find_candidates(params.grep)
+            candidate_definitions = utils.get_target_list_definitions(index, candidates)
+            matching_lines = utils.find_matching_lines(candidate_definitions, params.grep)
+        with utils.profile_stage("output"):
+            utils.print_grep_results(params.grep, matching_lines, highlight=not params.disable_coloring)
+        return
+
+    # Replace the desired targets that are patterns, e.g. 'docker_*', by the targets matching them
+    desired_targets = resolve_desired_targets(params.desired_targets, index)
+
+    # Print the targets as JSON records instead, if requested
+    if params.output_format != "text":
+        show_target_records(params, desired_targets, index, get_dependency_graph)
+        return
 
     # If no targets are given, print usage and a list of detected targets
     if len(desired_targets) == 0:
-        utils.print_banner()
-        utils.print_usage(makefile_path, all_targets, coloring_func=coloring_func)
-        return 0
+        with utils.profile_stage("output"):
+            utils.print_banner()
+            utils.print_usage(params.makefile_path, index.targets, coloring_func=coloring_func)
+        return
 
-    # Determine list of targets to show
-    if params.show_dependencies:
-        all_target_dependencies = utils.find_target_list_dependencies(lines, all_targets)
-        dependency_chain = utils.compute_dependency_chain_for_list_of_desired_targets(
-            desired_targets, all_target_dependencies
-        )
-        targets_to_show = dependency_chain
+    # Suggest similar target names for the desired targets that are not found
+    suggestions: Dict[str, List[str]] = dict()
+    missing_targets = [t for t in desired_targets if utils.get_rule(index, t) is None]
+    if len(missing_targets) > 0:
+        search_index = utils.get_target_search_index(index)
+        suggestions = {target: search_index.suggest(target) for target in missing_targets}
+
+    # Print the definitions of the targets to show while they are resolved, rather than after resolving all of them
+    target_definitions = iter_target_definitions_to_show(params, desired_targets, index, get_dependency_graph)
+    with utils.profile_stage("output"):
+        utils.stream_target_definitions(target_definitions, coloring_func=coloring_func, suggestions=suggestions)
+
+
+def resolve_desired_targets(desired_targets: List[str], index: utils.MakefileIndex) -> List[str]:
+    # NB: The search index is only built if a desired target is a pattern.
+    if not any(utils.is_target_pattern(target) for target in desired_targets):
+        return desired_targets
+    return utils.expand_target_patterns(utils.get_target_search_index(index), desired_targets)
+
+
+def show_target_records(
+    params: utils.MakeshowParameters,
+    desired_targets: List[str],
+    index: utils.MakefileIndex,
+    get_dependency_graph: Callable[[utils.MakefileIndex], utils.DependencyGraph],
+) -> None:
+    # Print a record of each target to show, or of all targets if none are given, resolving them while printing
+    if len(desired_targets) == 0:
+        targets_to_show: Iterable[str] = index.targets
     else:
-        targets_to_show = desired_targets
+        targets_to_show = iter_targets_to_show(params, desired_targets, index, get_dependency_graph)
+    records = (utils.get_target_record(index, target) for target in targets_to_show)
+    with utils.profile_stage("output"):
+        utils.print_target_records(records, params.output_format)
+
+
+def iter_targets_to_show(
+    params: utils.MakeshowParameters,
+    desired_targets: List[str],
+    index: utils.MakefileIndex,
+    get_dependency_graph: Callable[[utils.MakefileIndex], utils.DependencyGraph],
+) -> Iterator[str]:
+    """
+    Stream the desired targets, preceded by their dependencies with -d and followed by their dependents with -r.
+    :param params: Makeshow parameters.
+    :param desired_targets: Desired targets, with any patterns already replaced by the targets matching them.
+    :param index: Makefile index.
+    :param get_dependency_graph: Function returning the dependency graph of the index.
+    :return: Iterator over the targets to show.
+    """
+    if not (params.show_dependencies or params.show_reverse_dependencies):
+        yield from desired_targets
+        return
+    dependency_graph = get_dependency_graph(index)
+    utils.count_profile_event("edges", len(dependency_graph.forward_edges))
+    targets: Iterable[str] = desired_targets
+    if params.show_dependencies:
+        targets = dependency_graph.iter_dependency_chain(desired_targets)
+    shown_targets = set()
+    for target in targets:
+        shown_targets.add(target)
+        yield target
+    if params.show_reverse_dependencies:
+        yield from (t for t in dependency_graph.get_all_dependents(desired_targets) if t not in shown_targets)
+
+
+def iter_target_definitions_to_show(
+    params: utils.MakeshowParameters,
+    desired_targets: List[str],
+    index: utils.MakefileIndex,
+    get_dependency_graph: Callable[[utils.MakefileIndex], utils.DependencyGraph],
+) -> Iterator[Tuple[str, str]]:
+    """
+    Stream the targets to show with their definitions, expanded with --expand, yielding each target as soon as its
+    position among the targets to show is final, e.g. once its dependencies are resolved with -d.
+    :param params: Makeshow parameters.
+    :param desired_targets: Desired targets, with any patterns already replaced by the targets matching them.
+    :param index: Makefile index.
+    :param get_dependency_graph: Function returning the dependency graph of the index.
+    :return: Iterator over the targets to show and their definitions.
+    """
+    get_definition: Callable[[str], str] = functools.partial(utils.get_single_target_definition, index)
+    if params.expand:
+        with utils.profile_stage("expansion"):
+            table = utils.build_variable_table(index.lines, params.makefile_path.parent, params.allow_shell)
+        get_definition = functools.partial(utils.expand_target_definition, table, index)
+    targets_to_show = iter_targets_to_show(params, desired_targets, index, get_dependency_graph)
+    while True:
+        with utils.profile_stage("dependency_resolution"):
+            target = next(targets_to_show, None)
+        if target is None:
+            break
+        with utils.profile_stage("expansion" if params.expand else "target_extraction"):
+            definition = get_definition(target)
+        yield target, definition if definition != "" else f"(No definition found for target '{target}')"
+    if params.expand:
+        utils.count_profile_event("variable_expansions", table.num_expansions)
+
+
+def watch_makeshow(params: utils.MakeshowParameters, coloring_func: Optional[Callable[[str], str]]) -> int:
+    watcher = utils.MakefileWatcher(params.makefile_path, source_positions=params.output_format != "text")
+    try:
+        while True:
+            # Clear the terminal and show the Makefile contents again
+            print(utils.CLEAR_TERMINAL, end="")
+            show_makefile_contents(params, watcher.index, lambda _: watcher.get_dependency_graph(), coloring_func)
+            sys.stdout.flush()
+            sys.stderr.write(f"makeshow: Watching '{params.makefile_path}' for changes. Press Ctrl+C to stop.\n")
+            # Wait until the Makefile or one of its included files changes, and update the index
+            while not utils.poll_makefile_watcher(watcher):
+                time.sleep(utils.WATCH_POLL_INTERVAL)
+    except KeyboardInterrupt:
+        return 0
+
+
+def run_makeshow_on_tree(
+    params: utils.MakeshowParameters, cache_dir: Optional[Path], coloring_func: Optional[Callable[[str], str]]
+) -> int:
+    tree_dir = params.tree_dir
+    desired_targets = params.desired_targets
+    assert tree_dir is not None
+
+    # Show error message if given folder is not found
+    if not tree_dir.is_dir():
+        utils.print_banner()
+        utils.print_tree_dir_not_found_error(tree_dir)
+        return 17
+
+    # Index the targets of all Makefiles under the folder, only parsing the Makefiles changed since the last run
+    with utils.profile_stage("loading"):
+        tree_index = utils.update_tree_index(tree_dir, cache_dir=cache_dir, jobs=params.jobs)
+    utils.count_profile_event("files", len(tree_index.files))
+    utils.count_profile_event("targets", len(tree_index.target_files))
+
+    # If no targets are given, print usage and a list of the targets of all Makefiles
+    if len(desired_targets) == 0:
+        utils.print_banner()
+        utils.print_usage(None, coloring_func=coloring_func)
+        utils.print_tree_targets(tree_dir, len(tree_index.files), tree_index.target_files)
+        return 0
 
-    # Print the contents of the desired targets
-    utils.print_target_definitions(all_target_definitions, targets_to_show, coloring_func=coloring_func)
+    # Show the definitions of the desired targets in every Makefile that defines them, preceded by the Makefile path
+    # NB: Makefiles that can no longer be read, e.g. as they were removed since they were indexed, are skipped.
+    target_definitions: Dict[str, str] = dict()
+    for target in desired_targets:
+        definitions = []
+        for rel_path in tree_index.target_files.get(target, []):
+            definition = utils.find_makefile_target_definition(tree_dir / rel_path, target)
+            if definition is not None:
+                definitions.append(f"# {tree_dir / rel_path}\n{definition}")
+        if len(definitions) > 0:
+            target_definitions[target] = "\n\n".join(definitions)
+    utils.print_target_definitions(target_definitions, desired_targets, coloring_func=coloring_func)
     return 0
 
 
@@ -84,4 +372,9 @@ def run_makeshow(params: utils.MakeshowParameters) -> int:
 
 
 if __name__ == "__main__":
-    main(sys.argv[1:])
+    try:
+        main(sys.argv[1:])
+    except BrokenPipeError:
+        # NB: E.g. when piped into head. Python flushes stdout on exit, so it is redirected to avoid another error.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
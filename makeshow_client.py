@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+
+makeshow_client.py - Show definitions of Makefile targets using a running makeshow daemon
+
+Usage:
+    ./makeshow.py --daemon &
+        Will start the daemon, which keeps parsed Makefiles and coloring state in memory.
+    ./makeshow_client.py target1
+        Will forward the arguments to the daemon and print the same output as "./makeshow.py target1".
+        If no daemon is running, makeshow.py is run instead.
+
+"""
+
+from __future__ import annotations
+
+import _socket  # NB: The socket module imports enum and selectors, which take longer than a request to the daemon.
+import os
+import sys
+
+from utils.daemon_protocol_utils import FORWARDED_ENV_VAR_PREFIXES, FRAME_HEADER, get_daemon_socket_path
+
+
+# NB: Only the modules needed to talk to the daemon are imported, to keep the client startup fast.
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import BinaryIO, List, Optional
+
+
+########################################################################################################################
+
+
+def forward_to_daemon(socket_path: str, arg_list: List[str], stdout: BinaryIO, stderr: BinaryIO) -> Optional[int]:
+    """
+    Let the daemon run makeshow with the given arguments, and write its output as it arrives.
+    :param socket_path: Path to the socket of the daemon.
+    :param arg_list: Argument list.
+    :param stdout: Binary stream for the standard output of makeshow.
+    :param stderr: Binary stream for the standard error of makeshow.
+    :return: Exit code, or None if no daemon is listening on the socket, or if the daemon can't serve the request,
+             e.g. with --watch, so makeshow has to be run locally.
+    """
+    client_socket = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    try:
+        try:
+            client_socket.connect(socket_path)
+        except OSError:
+            return None
+        env = {name: value for name, value in os.environ.items() if name.startswith(FORWARDED_ENV_VAR_PREFIXES)}
+        request = {"argv": arg_list, "cwd": os.getcwd(), "env": env}
+        client_socket.sendall(ascii(request).encode("ascii"))
+        client_socket.shutdown(_socket.SHUT_WR)
+
+        # Write the frames of the response to stdout and stderr until the exit code arrives
+        response = b""
+        while True:
+            chunk = client_socket.recv(65536)
+            if chunk == b"":
+                stderr.write(b"makeshow: The daemon closed the connection unexpectedly.\n")
+                return 1
+            response += chunk
+            offset = 0
+            while len(response) - offset >= FRAME_HEADER.size:
+                channel, length = FRAME_HEADER.unpack_from(response, offset)
+                end = offset + FRAME_HEADER.size + length
+                if len(response) < end:
+                    break
+                payload = response[offset + FRAME_HEADER.size : end]
+                offset = end
+                if channel == b"x":
+                    return int(payload)
+                if channel == b"l":
+                    return None
+                stream = stdout if channel == b"o" else stderr
+                stream.write(payload)
+                stream.flush()
+            response = response[offset:]
+    finally:
+        client_socket.close()
+
+
+########################################################################################################################
+
+
+def main(arg_list: List[str]) -> int:
+    exit_code = forward_to_daemon(get_daemon_socket_path(), arg_list, sys.stdout.buffer, sys.stderr.buffer)
+    if exit_code is None:
+        # Run makeshow in this process instead, when no daemon is running or it can't serve the request
+        makeshow_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "makeshow.py")
+        os.execv(sys.executable, [sys.executable, makeshow_path] + arg_list)
+    return exit_code
+
+
+########################################################################################################################
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main(sys.argv[1:]))
+    except BrokenPipeError:
+        # NB: Like makeshow.py, when piped into head. Python flushes stdout on exit, so it is redirected first.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
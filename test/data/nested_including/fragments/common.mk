@@ -0,0 +1,4 @@
+include fragments/x.mk
+
+common:
+	echo "common"
@@ -0,0 +1,4 @@
+include fragments/common.mk
+
+x: common
+	echo "x"
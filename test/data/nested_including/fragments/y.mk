@@ -0,0 +1,4 @@
+sinclude fragments/common.mk fragments/missing.mk
+
+y: common
+	echo "y"
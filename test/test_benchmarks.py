@@ -0,0 +1,79 @@
+"""
+
+Makeshow benchmarks - Unit tests
+
+"""
+
+import os
+from pathlib import Path
+
+from pytest import mark, raises
+
+from benchmarks.benchmark_pipeline import BASELINE_PATH_ENV_VAR, DEFAULT_TOLERANCE, TOLERANCE_ENV_VAR, find_regressions
+from benchmarks.benchmark_pipeline import load_baseline, run_pipeline_benchmark, save_baseline
+from benchmarks.synthetic_makefiles import SyntheticMakefileSpec, write_synthetic_makefile
+from utils import DependencyGraph, build_makefile_index, get_target_list_dependencies, load_lines_and_include_graph
+
+
+########################################################################################################################
+
+
+def test_write_synthetic_makefile(tmp_path: Path) -> None:
+    # Given
+    spec = SyntheticMakefileSpec(
+        num_targets=100, recipe_length=4, include_fanout=3, dependency_depth=5, continuation_density=0.5
+    )
+    # When
+    makefile_path = write_synthetic_makefile(tmp_path, spec)
+    lines, include_graph = load_lines_and_include_graph(makefile_path)
+    index = build_makefile_index(lines)
+    graph = DependencyGraph(get_target_list_dependencies(index, index.targets))
+    # Then
+    assert len(include_graph[makefile_path]) == 3
+    assert sorted(index.targets) == sorted(f"target_{i}" for i in range(100))
+    assert all(len(index.rules[t].recipe) == 4 for t in index.targets)
+    assert 5 <= len(graph.compute_dependency_chain(["target_0"])) <= 1 + 2 + 4 + 8 + 16
+
+
+def test_find_regressions() -> None:
+    # Given
+    baseline = {"default": {"load_lines": 0.010, "printing": 0.0001}}
+    results = {"default": {"load_lines": 0.020, "printing": 0.0004, "coloring": 0.1}, "new_scenario": {"x": 1.0}}
+    # When
+    regressions = find_regressions(results, baseline, tolerance=0.5)
+    # Then
+    # NB: The printing stage is 4 times slower, but only by 0.3 ms, which is within the noise.
+    assert regressions == ["default/load_lines: 20.00 ms vs. 10.00 ms in the baseline (+100%)"]
+
+
+def test_save_and_load_baseline(tmp_path: Path) -> None:
+    # Given
+    baseline_path = tmp_path / "baseline.json"
+    results = {"default": {"load_lines": 0.01}}
+    # When
+    save_baseline(baseline_path, results, runs=3, scale=0.5)
+    baseline = load_baseline(baseline_path)
+    # Then
+    assert (baseline.runs, baseline.scale, baseline.results) == (3, 0.5, results)
+    # When / Then
+    baseline_path.write_text('{"version": 1, "runs": 3, "scale": 0.5, "results": {"default": 0.01}}')
+    with raises(ValueError, match="Invalid baseline"):
+        load_baseline(baseline_path)
+
+
+########################################################################################################################
+
+
+@mark.skipif(BASELINE_PATH_ENV_VAR not in os.environ, reason=f"Set {BASELINE_PATH_ENV_VAR} to a saved baseline.")
+def test_pipeline_has_no_regressions() -> None:
+    # Given
+    baseline = load_baseline(Path(os.environ[BASELINE_PATH_ENV_VAR]))
+    tolerance = float(os.environ.get(TOLERANCE_ENV_VAR, DEFAULT_TOLERANCE))
+    # When
+    # NB: The runs and scale of the baseline are used, so the timings are comparable.
+    results = run_pipeline_benchmark(baseline.runs, baseline.scale)
+    # Then
+    assert find_regressions(results, baseline.results, tolerance) == []
+
+
+########################################################################################################################
@@ -0,0 +1,207 @@
+"""
+
+Makeshow parse cache utils - Unit tests
+
+"""
+
+import os
+import shutil
+from pathlib import Path
+from typing import List
+
+from pytest import MonkeyPatch
+
+from utils import caching_utils
+from utils.caching_utils import clear_cache, clear_memory_caches, evict_cache_entries, get_cache_entry_path
+from utils.caching_utils import get_definition_token_index, load_and_index_makefile, load_cache_entry
+from utils.caching_utils import load_cached_definition_index
+from utils.completion_utils import load_cached_target_list
+from utils.parsing_utils import MakefileIndex, build_makefile_index, get_target_record, update_makefile_index
+
+
+########################################################################################################################
+
+
+def test_load_and_index_makefile_with_cache(tmp_path: Path) -> None:
+    # Given
+    makefile_folder = tmp_path / "including"
+    shutil.copytree(Path(__file__).parent / "data" / "including", makefile_folder)
+    makefile_path = makefile_folder / "Makefile"
+    cache_dir = tmp_path / "cache"
+    # When
+    assert load_cache_entry(makefile_path, cache_dir) is None
+    lines, index = load_and_index_makefile(makefile_path, cache_dir=cache_dir)
+    cached = load_cache_entry(makefile_path, cache_dir)
+    # Then
+    assert cached is not None
+    cached_lines, cached_index = cached.lines, cached.index
+    assert cached_lines == lines
+    assert cached_index.targets == index.targets == ["a", "b", "c", "d", "e", "f"]
+    assert cached_index.rules["e"].definition == 'e: d\n\techo "e"'
+    assert load_cached_target_list(str(makefile_path), str(cache_dir)) == ["a", "b", "c", "d", "e", "f"]
+
+
+def test_cached_lines_without_source_positions_are_loaded_again(tmp_path: Path) -> None:
+    # Given
+    makefile_folder = tmp_path / "including"
+    shutil.copytree(Path(__file__).parent / "data" / "including", makefile_folder)
+    makefile_path = makefile_folder / "Makefile"
+    cache_dir = tmp_path / "cache"
+    clear_cache(cache_dir)
+    _, index = load_and_index_makefile(makefile_path, cache_dir=cache_dir)
+    # When
+    _, source_index = load_and_index_makefile(makefile_path, cache_dir=cache_dir, source_positions=True)
+    clear_memory_caches()
+    _, cached_source_index = load_and_index_makefile(makefile_path, cache_dir=cache_dir, source_positions=True)
+    # Then
+    assert get_target_record(index, "b")["line"] is None
+    assert source_index.lines == index.lines
+    assert get_target_record(source_index, "b")["line"] == 3
+    # The lines with their source positions replaced the cached lines without them
+    assert get_target_record(cached_source_index, "b")["line"] == 3
+    assert load_and_index_makefile(makefile_path, cache_dir=cache_dir)[1] is cached_source_index
+
+
+########################################################################################################################
+
+
+def test_definition_token_index_is_stored_next_to_the_parse_cache(tmp_path: Path) -> None:
+    # Given
+    makefile_folder = tmp_path / "including"
+    shutil.copytree(Path(__file__).parent / "data" / "including", makefile_folder)
+    makefile_path = makefile_folder / "Makefile"
+    cache_dir = tmp_path / "cache"
+    _, index = load_and_index_makefile(makefile_path, cache_dir=cache_dir)
+    # When
+    definition_index = get_definition_token_index(index, makefile_path, cache_dir)
+    clear_memory_caches()
+    _, reloaded_index = load_and_index_makefile(makefile_path, cache_dir=cache_dir)
+    entry = load_cache_entry(makefile_path, cache_dir)
+    # Then
+    assert entry is not None
+    file_stats = {fingerprint.path: (fingerprint.mtime_ns, fingerprint.size) for fingerprint in entry.fingerprints}
+    assert "e" in definition_index.find_candidates('echo "e"')
+    # NB: The token index is loaded from the cache folder, as the in-memory caches were cleared.
+    stored_definition_index = load_cached_definition_index(makefile_path, cache_dir, file_stats)
+    assert stored_definition_index is not None
+    assert stored_definition_index.postings == definition_index.postings
+    assert get_definition_token_index(reloaded_index, makefile_path, cache_dir).postings == definition_index.postings
+    assert load_cached_definition_index(makefile_path, cache_dir, dict()) is None
+
+
+def test_definition_token_index_follows_updates_of_the_makefile_index() -> None:
+    # Given
+    index = build_makefile_index(["a:", "\techo 'first'", "", "b: a", "\techo 'second'"])
+    definition_index = get_definition_token_index(index)
+    # When
+    update_makefile_index(index, 1, 2, ["\techo 'updated'"])
+    updated_definition_index = get_definition_token_index(index)
+    # Then
+    assert definition_index.find_candidates("first") == ["a"]
+    assert updated_definition_index is not definition_index
+    assert updated_definition_index.find_candidates("first") == []
+    assert updated_definition_index.find_candidates("updated") == ["a"]
+    assert get_definition_token_index(index) is updated_definition_index
+
+
+########################################################################################################################
+
+
+def test_cache_is_invalidated_when_an_included_file_changes(tmp_path: Path) -> None:
+    # Given
+    makefile_folder = tmp_path / "including"
+    shutil.copytree(Path(__file__).parent / "data" / "including", makefile_folder)
+    makefile_path = makefile_folder / "Makefile"
+    cache_dir = tmp_path / "cache"
+    load_and_index_makefile(makefile_path, cache_dir=cache_dir)
+    # When
+    with (makefile_folder / "extras" / "d_and_e.mk").open("a") as f:
+        f.write("\ng: e\n\techo 'g'\n")
+    # Then
+    assert load_cache_entry(makefile_path, cache_dir) is None
+    _, index = load_and_index_makefile(makefile_path, cache_dir=cache_dir)
+    assert "g" in index.targets
+
+
+def test_file_changed_after_it_was_read_is_not_cached(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    # Given
+    makefile_folder = tmp_path / "including"
+    shutil.copytree(Path(__file__).parent / "data" / "including", makefile_folder)
+    makefile_path = makefile_folder / "Makefile"
+    cache_dir = tmp_path / "cache"
+    build_makefile_index = caching_utils.build_makefile_index
+
+    def _change_file_and_build_makefile_index(lines: List[str]) -> MakefileIndex:
+        with (makefile_folder / "extras" / "d_and_e.mk").open("a") as f:
+            f.write("\ng: e\n\techo 'g'\n")
+        return build_makefile_index(lines)
+
+    monkeypatch.setattr(caching_utils, "build_makefile_index", _change_file_and_build_makefile_index)
+    # When
+    _, index = load_and_index_makefile(makefile_path, cache_dir=cache_dir)
+    monkeypatch.undo()
+    # Then
+    # NB: The file was changed after it was read, so its parsed lines must not be cached under its new contents.
+    assert "g" not in index.targets
+    assert load_cache_entry(makefile_path, cache_dir) is None
+    _, index = load_and_index_makefile(makefile_path, cache_dir=cache_dir)
+    assert "g" in index.targets
+
+
+def test_cache_entry_is_used_in_a_read_only_cache_folder(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    # Given
+    cache_dir = tmp_path / "cache"
+    makefile_path = tmp_path / "Makefile"
+    makefile_path.write_text("a:\n\techo 'a'\n")
+    load_and_index_makefile(makefile_path, cache_dir=cache_dir)
+
+    def _fail_to_utime(path: Path) -> None:
+        raise PermissionError(f"Read-only: '{path}'")
+
+    monkeypatch.setattr(os, "utime", _fail_to_utime)
+    # When
+    entry = load_cache_entry(makefile_path, cache_dir)
+    # Then
+    assert entry is not None
+
+
+########################################################################################################################
+
+
+def test_evict_cache_entries(tmp_path: Path) -> None:
+    # Given
+    cache_dir = tmp_path / "cache"
+    makefile_path = Path(__file__).parent / "data" / "circular" / "Makefile"
+    load_and_index_makefile(makefile_path, cache_dir=cache_dir)
+    entry_path = get_cache_entry_path(makefile_path, cache_dir)
+    assert entry_path.is_file()
+    # When
+    evict_cache_entries(cache_dir, max_cache_size=entry_path.stat().st_size)
+    # Then
+    assert entry_path.is_file()
+    # When
+    evict_cache_entries(cache_dir, max_cache_size=0)
+    # Then
+    assert not entry_path.is_file()
+
+
+########################################################################################################################
+
+
+def test_cache_is_invalidated_when_an_optional_included_file_appears(tmp_path: Path) -> None:
+    # Given
+    makefile_folder = tmp_path / "nested_including"
+    shutil.copytree(Path(__file__).parent / "data" / "nested_including", makefile_folder)
+    makefile_path = makefile_folder / "Makefile"
+    cache_dir = tmp_path / "cache"
+    load_and_index_makefile(makefile_path, cache_dir=cache_dir)
+    assert load_cache_entry(makefile_path, cache_dir) is not None
+    # When
+    (makefile_folder / "fragments" / "missing.mk").write_text("m:\n\techo 'm'\n")
+    # Then
+    assert load_cache_entry(makefile_path, cache_dir) is None
+    _, index = load_and_index_makefile(makefile_path, cache_dir=cache_dir)
+    assert "m" in index.targets
+
+
+########################################################################################################################
@@ -7,7 +7,9 @@ Makeshow command-line interface utils - Unit tests
 from pathlib import Path
 from typing import List
 
-from utils.cli_utils import MakeshowParameters, parse_args
+from pytest import MonkeyPatch
+
+from utils.cli_utils import MakeshowParameters, parse_args, parse_args_with_argument_parser
 
 
 ########################################################################################################################
@@ -22,6 +24,9 @@ def test_parse_args_empty() -> None:
     assert params.makefile_path.resolve() == Path("./Makefile").resolve()
     assert params.desired_targets == []
     assert not params.show_dependencies
+    assert not params.show_reverse_dependencies
+    assert params.jobs == 0
+    assert params.tree_dir is None
 
 
 ########################################################################################################################
@@ -39,3 +44,65 @@ def test_parse_args_full() -> None:
 
 
 ########################################################################################################################
+
+
+def test_parse_args_jobs() -> None:
+    # When
+    params_with_short_option: MakeshowParameters = parse_args(["-j", "4", "target1"])
+    params_with_long_option: MakeshowParameters = parse_args(["--jobs", "8", "target1"])
+    # Then
+    assert params_with_short_option.jobs == 4
+    assert params_with_long_option.jobs == 8
+    assert params_with_long_option.desired_targets == ["target1"]
+
+
+########################################################################################################################
+
+
+def test_parse_args_cache(monkeypatch: MonkeyPatch) -> None:
+    # Given
+    monkeypatch.setenv("MAKESHOW_CACHE", "1")
+    # When
+    params_with_cache: MakeshowParameters = parse_args(["--clear_cache"])
+    params_without_cache: MakeshowParameters = parse_args(["--no_cache"])
+    # Then
+    assert params_with_cache.use_cache
+    assert params_with_cache.clear_cache
+    assert not params_without_cache.use_cache
+    assert not params_without_cache.clear_cache
+
+
+########################################################################################################################
+
+
+def test_parse_args_profile() -> None:
+    # When
+    params_without_profile: MakeshowParameters = parse_args(["target1"])
+    params_with_json_profile: MakeshowParameters = parse_args(["--profile_json", "target1"])
+    params_with_cprofile: MakeshowParameters = parse_args(["--profile_cprofile", "makeshow.prof", "target1"])
+    # Then
+    assert not params_without_profile.profile
+    assert params_with_json_profile.profile
+    assert params_with_json_profile.profile_format == "json"
+    assert params_with_cprofile.profile
+    assert params_with_cprofile.profile_format == "text"
+    assert params_with_cprofile.profile_cprofile_path == Path("makeshow.prof")
+
+
+########################################################################################################################
+
+
+def test_parse_args_without_options(monkeypatch: MonkeyPatch) -> None:
+    # Given
+    monkeypatch.setenv("MAKESHOW_CACHE", "1")
+    args_list = ["target1", "target2"]
+    # When
+    params: MakeshowParameters = parse_args(args_list)
+    # Then
+    # NB: Without options, the argument parser isn't used, but the parameters must be the same.
+    assert params == parse_args_with_argument_parser(args_list)
+    assert params.desired_targets == ["target1", "target2"]
+    assert params.use_cache
+
+
+########################################################################################################################
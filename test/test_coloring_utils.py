@@ -0,0 +1,116 @@
+"""
+
+Makeshow coloring utils - Unit tests
+
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pygments
+import pygments.formatters
+import pygments.lexers
+import pygments.styles
+from pytest import CaptureFixture
+from shared_test_utils import capture_and_reemit_stdout_and_stderr
+
+from utils.caching_utils import clear_cache
+from utils.coloring_utils import MakefileColoringFunction, color_texts, get_optional_coloring_function
+
+
+########################################################################################################################
+
+
+def test_coloring_function_matches_pygments_highlight() -> None:
+    # Given
+    text = 'a: b\n\techo "a"'
+    formatter = pygments.formatters.Terminal256Formatter(style=pygments.styles.get_style_by_name("one-dark"))
+    expected = pygments.highlight(text, lexer=pygments.lexers.MakefileLexer(), formatter=formatter).rstrip("\n")
+    # When
+    coloring_func = get_optional_coloring_function("one-dark", disable_coloring=False)
+    # Then
+    assert coloring_func is not None
+    assert coloring_func(text) == expected
+
+
+########################################################################################################################
+
+
+def test_coloring_function_with_unknown_style(capsys: CaptureFixture[str]) -> None:
+    # When
+    coloring_func = get_optional_coloring_function("no-such-style", disable_coloring=False)
+    stdout, stderr = capture_and_reemit_stdout_and_stderr(capsys)
+    # Then
+    assert coloring_func is None
+    assert stderr == "WARNING: Style 'no-such-style' not found. Coloring disabled.\n"
+
+
+########################################################################################################################
+
+
+def test_pygments_formatter_is_not_imported_until_coloring() -> None:
+    # Given
+    code = (
+        "import sys, utils;"
+        " coloring_func = utils.get_optional_coloring_function('one-dark', disable_coloring=False);"
+        " print('pygments.formatters' in sys.modules);"
+        " coloring_func('a: b');"
+        " print('pygments.formatters' in sys.modules)"
+    )
+    # When
+    repo_dir = Path(__file__).parent.parent
+    result = subprocess.run([sys.executable, "-c", code], cwd=repo_dir, capture_output=True, text=True, check=True)
+    # Then
+    assert result.stdout.split() == ["False", "True"]
+
+
+########################################################################################################################
+
+
+def test_color_texts_in_batch_matches_coloring_each_text() -> None:
+    # Given
+    texts = [
+        'a: b\n\techo "a"',
+        "b: $(unterminated",
+        "c: d \\",
+        "ifeq ($(A),1)\nd:\n\t@echo 'd'\n\nendif",
+        "(No definition found for target 'e')",
+    ]
+    coloring_func = get_optional_coloring_function("one-dark", disable_coloring=False)
+    assert coloring_func is not None
+    # When
+    colored_texts = color_texts(texts, coloring_func)
+    # Then
+    assert colored_texts == [coloring_func(text) for text in texts]
+    assert color_texts(texts, None) == texts
+
+
+########################################################################################################################
+
+
+def test_colored_texts_are_cached(tmp_path: Path) -> None:
+    # Given
+    cache_dir = tmp_path / "cache"
+    texts = ['a: b\n\techo "a"', "b:"]
+    expected = MakefileColoringFunction("one-dark").color_batch(texts)
+    clear_cache(cache_dir)
+    MakefileColoringFunction("one-dark", cache_dir=cache_dir).color_batch(texts)
+    # When
+    in_memory_coloring_func = MakefileColoringFunction("one-dark")
+    in_memory_colored_texts = in_memory_coloring_func.color_batch(texts)
+    clear_cache(tmp_path / "other_cache")
+    on_disk_coloring_func = MakefileColoringFunction("one-dark", cache_dir=cache_dir)
+    on_disk_colored_texts = on_disk_coloring_func.color_batch(texts)
+    other_style_colored_texts = MakefileColoringFunction("dracula", cache_dir=cache_dir).color_batch(texts)
+    # Then
+    # Verify that the cached texts were returned without setting up pygments
+    assert in_memory_colored_texts == expected
+    assert not in_memory_coloring_func._is_set_up
+    assert on_disk_colored_texts == expected
+    assert not on_disk_coloring_func._is_set_up
+    # Verify that the style is part of the cache key
+    assert other_style_colored_texts != expected
+
+
+########################################################################################################################
@@ -0,0 +1,122 @@
+"""
+
+Makeshow shell completion utils - Unit tests
+
+"""
+
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+from pytest import CaptureFixture, MonkeyPatch
+from shared_test_utils import capture_and_reemit_stdout_and_stderr
+
+from utils.completion_utils import complete_target_names, get_completion_script, get_target_list_path
+from utils.completion_utils import parse_completion_args, run_completion
+from utils.parsing_utils import build_makefile_index, load_lines_from_makefile_and_its_included_files, scan_target_names
+
+
+########################################################################################################################
+
+
+def test_scan_target_names() -> None:
+    # Given
+    makefile_path = Path(__file__).parent / "data" / "nested_including" / "Makefile"
+    # When
+    targets = scan_target_names(makefile_path)
+    # Then
+    index = build_makefile_index(load_lines_from_makefile_and_its_included_files(makefile_path))
+    assert targets == list(dict.fromkeys(index.targets))
+
+
+########################################################################################################################
+
+
+def test_complete_target_names_with_target_list(tmp_path: Path) -> None:
+    # Given
+    makefile_folder = tmp_path / "including"
+    shutil.copytree(Path(__file__).parent / "data" / "including", makefile_folder)
+    makefile_path = str(makefile_folder / "Makefile")
+    cache_dir = str(tmp_path / "cache")
+    # When
+    all_targets = complete_target_names(makefile_path, "", cache_dir)
+    list_exists = os.path.isfile(get_target_list_path(makefile_path, cache_dir))
+    with (makefile_folder / "extras" / "d_and_e.mk").open("a") as f:
+        f.write("\ndeploy: e\n\techo deploy\n")
+    d_targets = complete_target_names(makefile_path, "d", cache_dir)
+    # Then
+    assert all_targets == ["a", "b", "c", "d", "e", "f"]
+    assert list_exists
+    # NB: The included file changed, so the stored target list is scanned again.
+    assert d_targets == ["d", "deploy"]
+    assert complete_target_names(str(tmp_path / "missing" / "Makefile"), "", cache_dir) == []
+
+
+def test_run_completion_stores_the_target_list_only_with_the_cache(
+    tmp_path: Path, monkeypatch: MonkeyPatch, capsys: CaptureFixture[str]
+) -> None:
+    # Given
+    makefile_path = str(Path(__file__).parent / "data" / "including" / "Makefile")
+    cache_dir = tmp_path / "makeshow"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.delenv("MAKESHOW_CACHE", raising=False)
+    # When
+    run_completion("d", makefile_path)
+    stdout, _ = capture_and_reemit_stdout_and_stderr(capsys)
+    # Then
+    assert stdout == "d\n"
+    assert not cache_dir.exists()
+    # When
+    monkeypatch.setenv("MAKESHOW_CACHE", "1")
+    run_completion("d", makefile_path)
+    # Then
+    assert os.path.isfile(get_target_list_path(makefile_path, str(cache_dir)))
+
+
+def test_parse_completion_args() -> None:
+    # Given
+    completion_args = ["--complete=do", "--makefile_path", "path/to/Makefile"]
+    # When
+    parsed_args = parse_completion_args(completion_args)
+    # Then
+    assert parsed_args == ("do", "path/to/Makefile")
+    assert parse_completion_args(["--complete="]) == ("", os.path.join(".", "Makefile"))
+    assert parse_completion_args(["--complete", "do"]) is None
+    assert parse_completion_args(["-d", "--complete=do"]) is None
+
+
+########################################################################################################################
+
+
+def test_bash_completion_script(tmp_path: Path) -> None:
+    # Given
+    repo_dir = Path(__file__).resolve().parent.parent
+    makefile_path = repo_dir / "test" / "data" / "including" / "Makefile"
+    script = get_completion_script("bash")
+    script += f'COMP_WORDS=(./makeshow.py -d -m "{makefile_path}" d); COMP_CWORD=4\n'
+    script += '_makeshow_complete; echo "${COMPREPLY[@]}"\n'
+    env = {name: value for name, value in os.environ.items() if name != "MAKESHOW_CACHE"}
+    env["XDG_CACHE_HOME"] = str(tmp_path)
+    # When
+    result = subprocess.run(["bash", "-c", script], cwd=repo_dir, env=env, capture_output=True, text=True, check=True)
+    # Then
+    assert result.stdout == "d\n"
+    # NB: The cache is not enabled, so no target list is stored in the cache folder.
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("shell", ["zsh", "fish"])
+def test_completion_script_syntax(shell: str) -> None:
+    if shutil.which(shell) is None:
+        pytest.skip(f"{shell} is not installed")
+    # Given
+    script = get_completion_script(shell)
+    # When
+    result = subprocess.run([shell, "-n"], input=script, capture_output=True, text=True)
+    # Then
+    assert result.returncode == 0, result.stderr
+
+
+########################################################################################################################
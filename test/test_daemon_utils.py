@@ -0,0 +1,167 @@
+"""
+
+Makeshow daemon utils - Unit tests
+
+"""
+
+import io
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from typing import List
+
+import pytest
+from pytest import CaptureFixture
+from shared_test_utils import capture_and_reemit_stdout_and_stderr
+
+from makeshow import main, run_daemon_request
+from makeshow_client import forward_to_daemon
+from utils.daemon_utils import DaemonStopped, FramedOutput, FramedOutputStream, create_daemon_socket, run_handler
+from utils.daemon_utils import serve_requests
+
+
+########################################################################################################################
+
+
+def test_daemon_output_matches_makeshow_and_follows_makefile_changes(
+    tmp_path: Path, capsys: CaptureFixture[str]
+) -> None:
+    # Given
+    makefile_folder = tmp_path / "including"
+    shutil.copytree(Path(__file__).parent / "data" / "including", makefile_folder)
+    makefile_path = makefile_folder / "Makefile"
+    socket_path = tmp_path / "daemon.sock"
+    server_socket = create_daemon_socket(socket_path)
+    assert server_socket is not None
+    server_thread = threading.Thread(target=serve_requests, args=(server_socket, run_daemon_request, 5))
+    server_thread.start()
+    arg_list = ["-m", str(makefile_path), "-n", "-d", "f", "unknown_target"]
+    main(arg_list)
+    expected_stdout, _ = capture_and_reemit_stdout_and_stderr(capsys)
+    try:
+        # When
+        stdout, stderr = io.BytesIO(), io.BytesIO()
+        exit_code = forward_to_daemon(str(socket_path), arg_list, stdout, stderr)
+        # Then
+        assert exit_code == 0
+        assert stdout.getvalue().decode() == expected_stdout
+        assert stderr.getvalue() == b""
+        # When
+        with (makefile_folder / "extras" / "d_and_e.mk").open("a") as f:
+            f.write("\nunknown_target: e\n\techo 'no longer unknown'\n")
+        stdout = io.BytesIO()
+        forward_to_daemon(str(socket_path), arg_list, stdout, io.BytesIO())
+        # Then
+        assert "echo 'no longer unknown'" in stdout.getvalue().decode()
+        # When
+        stderr = io.BytesIO()
+        exit_code = forward_to_daemon(str(socket_path), ["--no_such_option"], io.BytesIO(), stderr)
+        # Then
+        assert exit_code == 2
+        assert b"unrecognized arguments: --no_such_option" in stderr.getvalue()
+        # When
+        exit_code = forward_to_daemon(str(socket_path), ["--watch"] + arg_list, io.BytesIO(), io.BytesIO())
+        stdout = io.BytesIO()
+        next_exit_code = forward_to_daemon(str(socket_path), arg_list, stdout, io.BytesIO())
+        # Then
+        # NB: A watch never ends, so the client is asked to run it locally, and the daemon keeps serving requests.
+        assert exit_code is None
+        assert next_exit_code == 0
+        assert "echo 'no longer unknown'" in stdout.getvalue().decode()
+    finally:
+        server_thread.join(timeout=10)
+        server_socket.close()
+
+
+def test_daemon_streams_colored_dependencies_and_warnings_like_makeshow(
+    tmp_path: Path, capsys: CaptureFixture[str]
+) -> None:
+    # Given
+    # NB: Every target depends on the two previous ones, so resolving the chain warns about each target while the
+    #     colored definitions are written by a background thread, through the same daemon connection.
+    n = 2000
+    makefile_path = tmp_path / "Makefile"
+    makefile_path.write_text(
+        "t0 t1:\n\techo 'first'\n" + "".join(f"t{i}: t{i - 1} t{i - 2}\n\techo 'target {i}'\n" for i in range(2, n))
+    )
+    socket_path = tmp_path / "daemon.sock"
+    server_socket = create_daemon_socket(socket_path)
+    assert server_socket is not None
+    server_thread = threading.Thread(target=serve_requests, args=(server_socket, run_daemon_request, 1))
+    server_thread.start()
+    arg_list = ["-m", str(makefile_path), "-d", f"t{n - 1}"]
+    main(arg_list)
+    expected_stdout, expected_stderr = capture_and_reemit_stdout_and_stderr(capsys)
+    try:
+        # When
+        stdout, stderr = io.BytesIO(), io.BytesIO()
+        exit_code = forward_to_daemon(str(socket_path), arg_list, stdout, stderr)
+        # Then
+        assert exit_code == 0
+        assert "\x1b[" in expected_stdout
+        assert expected_stderr.count("Circular dependency dropped") == n - 3
+        assert stdout.getvalue().decode() == expected_stdout
+        assert stderr.getvalue().decode() == expected_stderr
+    finally:
+        server_thread.join(timeout=10)
+        server_socket.close()
+
+
+def test_daemon_exit_code_matches_makeshow(tmp_path: Path) -> None:
+    # Given
+    repo_dir = Path(__file__).resolve().parent.parent
+    socket_path = tmp_path / "daemon.sock"
+    server_socket = create_daemon_socket(socket_path)
+    assert server_socket is not None
+    server_thread = threading.Thread(target=serve_requests, args=(server_socket, run_daemon_request, 1))
+    server_thread.start()
+    arg_list = ["-m", str(tmp_path / "missing" / "Makefile"), "-n", "a"]
+    expected_exit_code = subprocess.run(
+        [sys.executable, "makeshow.py"] + arg_list, cwd=repo_dir, capture_output=True
+    ).returncode
+    try:
+        # When
+        exit_code = forward_to_daemon(str(socket_path), arg_list, io.BytesIO(), io.BytesIO())
+        # Then
+        assert exit_code == expected_exit_code == 0
+    finally:
+        server_thread.join(timeout=10)
+        server_socket.close()
+
+
+def test_forward_to_daemon_without_daemon(tmp_path: Path) -> None:
+    # When
+    exit_code = forward_to_daemon(str(tmp_path / "daemon.sock"), [], io.BytesIO(), io.BytesIO())
+    # Then
+    assert exit_code is None
+
+
+def test_framed_output_stream_flush() -> None:
+    # Given
+    server_conn, client_conn = socket.socketpair()
+    stdout = FramedOutputStream(FramedOutput(server_conn), b"o")
+    # When
+    stdout.write("a\n")
+    stdout.flush()
+    # Then
+    # NB: The frame is sent by the flush, long before the buffer is full.
+    assert client_conn.recv(1024) == b"o\x00\x00\x00\x02a\n"
+    server_conn.close()
+    client_conn.close()
+
+
+def test_run_handler_stops_the_daemon_on_sigterm() -> None:
+    # Given
+    def _handler(arg_list: List[str]) -> int:
+        raise DaemonStopped(0)
+
+    # When / Then
+    assert run_handler(lambda arg_list: main(["--no_such_option"]), []) == 2
+    with pytest.raises(DaemonStopped):
+        run_handler(_handler, [])
+
+
+########################################################################################################################
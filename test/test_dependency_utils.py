@@ -4,7 +4,14 @@ Makeshow dependency resolver utils - Unit tests
 
 """
 
-from utils import compute_dependency_chain
+import random
+import sys
+from typing import Dict, List
+
+from pytest import CaptureFixture
+from shared_test_utils import capture_and_reemit_stdout_and_stderr
+
+from utils import DependencyGraph, compute_dependency_chain, compute_dependency_chain_for_list_of_desired_targets
 
 
 ########################################################################################################################
@@ -64,3 +71,149 @@ def test_compute_dependency_chain_circular_again() -> None:
 
 
 ########################################################################################################################
+
+
+def test_compute_dependency_chain_diamond(capsys: CaptureFixture[str]) -> None:
+    # Given
+    all_target_dependencies = {"a": ["b", "c"], "b": ["d"], "c": ["d"]}
+    desired_targets = ["c", "a", "c"]
+    expected_chain = ["d", "c", "b", "a"]
+    expected_stderr = (
+        "makeshow: Circular dependency dropped: b <- d (meaning 'b' requires 'd')\n"
+        "makeshow: Circular dependency dropped: a <- c (meaning 'a' requires 'c')\n"
+        "makeshow: Circular dependency dropped: ____DUMMY____ <- c (meaning '____DUMMY____' requires 'c')\n"
+    )
+    # When
+    dependency_chain = compute_dependency_chain_for_list_of_desired_targets(desired_targets, all_target_dependencies)
+    stdout, stderr = capture_and_reemit_stdout_and_stderr(capsys)
+    # Then
+    assert dependency_chain == expected_chain
+    assert stderr == expected_stderr
+
+
+########################################################################################################################
+
+
+def test_compute_dependency_chain_deep(capsys: CaptureFixture[str]) -> None:
+    # Given
+    n = 100_000
+    all_target_dependencies = {f"t{i}": [f"t{i + 1}"] for i in range(n)}
+    all_target_dependencies[f"t{n}"] = ["t0"]
+    # When
+    dependency_chain = compute_dependency_chain("t0", all_target_dependencies)
+    stdout, stderr = capture_and_reemit_stdout_and_stderr(capsys)
+    # Then
+    assert dependency_chain == [f"t{i}" for i in range(n, -1, -1)]
+    assert stderr == f"makeshow: Circular dependency dropped: t{n} <- t0 (meaning 't{n}' requires 't0')\n"
+
+
+########################################################################################################################
+
+
+def test_compute_dependency_chain_wide() -> None:
+    # Given
+    n = 100_000
+    leaves = [f"t{i}" for i in range(1, n)]
+    all_target_dependencies = {"t0": leaves + leaves}
+    # When
+    dependency_chain = compute_dependency_chain("t0", all_target_dependencies)
+    # Then
+    assert dependency_chain == leaves + ["t0"]
+
+
+########################################################################################################################
+
+
+def compute_dependency_chain_recursively(x: str, dependencies: Dict[str, List[str]], seen: List[str]) -> List[str]:
+    # Reference implementation: Plain recursive depth-first post-order
+    chain = []
+    seen.append(x)
+    for dep in dependencies.get(x, []):
+        if dep in seen:
+            sys.stderr.write(f"makeshow: Circular dependency dropped: {x} <- {dep} (meaning '{x}' requires '{dep}')\n")
+        else:
+            chain.extend(compute_dependency_chain_recursively(dep, dependencies, seen))
+    chain.append(x)
+    return chain
+
+
+def test_compute_dependency_chain_random_graphs(capsys: CaptureFixture[str]) -> None:
+    rng = random.Random(17)
+    for _ in range(50):
+        # Given
+        n = rng.randrange(1, 60)
+        all_target_dependencies = {
+            f"t{i}": [f"t{rng.randrange(n + 5)}" for _ in range(rng.randrange(4))] for i in range(n)
+        }
+        # When
+        dependency_chain = compute_dependency_chain("t0", all_target_dependencies)
+        stdout, stderr = capsys.readouterr()
+        expected_chain = compute_dependency_chain_recursively("t0", all_target_dependencies, [])
+        stdout, expected_stderr = capsys.readouterr()
+        # Then
+        assert dependency_chain == expected_chain
+        assert stderr == expected_stderr
+
+
+########################################################################################################################
+
+
+def test_compute_dependency_chain_scales_linearly() -> None:
+    # Given
+    n = 100_000
+    rng = random.Random(42)
+    all_target_dependencies = {f"t{i}": [f"t{rng.randrange(n)}" for _ in range(5)] for i in range(n)}
+    # When
+    dependency_chain = compute_dependency_chain_for_list_of_desired_targets(["t0"], all_target_dependencies)
+    # Then
+    assert dependency_chain[-1] == "t0"
+    assert len(dependency_chain) == len(set(dependency_chain))
+
+
+########################################################################################################################
+
+
+########################################################################################################################
+
+
+def test_dependency_graph_queries() -> None:
+    # Given
+    all_target_dependencies = {"a": ["b", "c"], "b": ["d"], "c": ["d", "e"], "d": [], "f": ["a"]}
+    # When
+    graph = DependencyGraph(all_target_dependencies)
+    # Then
+    assert graph.get_dependencies("c") == ["d", "e"]
+    assert graph.get_dependencies("e") == []
+    assert graph.get_dependencies("unknown") == []
+    assert graph.get_dependents("d") == ["b", "c"]
+    assert graph.get_dependents("f") == []
+    assert graph.get_all_dependents(["d"]) == ["b", "c", "a", "f"]
+    assert graph.get_all_dependents(["e", "b"]) == ["c", "a", "f"]
+    assert graph.is_reachable("e", from_target="f")
+    assert graph.is_reachable("a", from_target="a")
+    assert not graph.is_reachable("f", from_target="e")
+    assert not graph.is_reachable("unknown", from_target="a")
+    assert graph.compute_dependency_chain(["c", "unknown", "a"]) == ["d", "e", "c", "unknown", "b", "a"]
+
+
+########################################################################################################################
+
+
+def test_dependency_graph_reverse_edges_match_forward_edges() -> None:
+    # Given
+    rng = random.Random(3)
+    n = 1000
+    all_target_dependencies = {f"t{i}": [f"t{rng.randrange(n)}" for _ in range(rng.randrange(6))] for i in range(n)}
+    # When
+    graph = DependencyGraph(all_target_dependencies)
+    # Then
+    for target, deps in all_target_dependencies.items():
+        assert graph.get_dependencies(target) == deps
+        for dep in deps:
+            assert target in graph.get_dependents(dep)
+    assert sum(len(graph.get_dependents(target)) for target in all_target_dependencies) == sum(
+        len(deps) for deps in all_target_dependencies.values()
+    )
+
+
+########################################################################################################################
@@ -0,0 +1,90 @@
+"""
+
+Makeshow variable expansion utils - Unit tests
+
+"""
+
+from pathlib import Path
+
+from utils.expansion_utils import build_variable_table, expand_target_definition
+from utils.parsing_utils import build_makefile_index
+
+
+########################################################################################################################
+
+
+def test_expand_variables_and_functions(tmp_path: Path) -> None:
+    # Given
+    lines = [
+        "SRCS = a.c b.c",
+        "OBJS = $(SRCS:.c=.o)",
+        "LATE = $(LATER)",
+        "EARLY := $(LATER)",
+        "LATER = later",
+        "FLAGS = -O1",
+        "FLAGS += -g",
+        "FLAGS ?= ignored",
+        "ifeq ($(LATER),later)",
+        "  MODE := later",
+        "else",
+        "  MODE := other",
+        "endif",
+        "greet = hello $(1) and $(2)",
+        "HASH != git rev-parse HEAD",
+    ]
+    # When
+    table = build_variable_table(lines, tmp_path)
+    # Then
+    assert table.expand("$(OBJS) $(patsubst %.c,%.h,$(SRCS))") == "a.o b.o a.h b.h"
+    assert table.expand("[$(LATE)] [$(EARLY)] $(FLAGS) $(MODE)") == "[later] [] -O1 -g later"
+    assert table.expand("$(call greet,you,$(words $(SRCS)))") == "hello you and 2"
+    assert table.expand("$(foreach s,$(SRCS),<$(s)>) $(if $(UNDEFINED),yes,no) $$HOME") == "<a.c> <b.c> no $HOME"
+    unexpanded_references = "$(shell git rev-parse HEAD) $(shell date) $(eval X := 1)"
+    assert table.expand("$(HASH) $(shell date) $(eval X := 1)") == unexpanded_references
+
+
+def test_expand_shell_only_if_allowed(tmp_path: Path) -> None:
+    # Given
+    lines = ["GREETING != echo hello", "WHO = $(shell printf 'a\\nb\\n')"]
+    # When
+    table = build_variable_table(lines, tmp_path, allow_shell=True)
+    # Then
+    assert table.expand("$(GREETING) $(WHO)") == "hello a b"
+
+
+########################################################################################################################
+
+
+def test_expand_target_definition(tmp_path: Path) -> None:
+    # Given
+    lines = ["CC = gcc", "OUT = build", "$(OUT)/app: main.o util.o main.o", "\t$(CC) $(CFLAGS) -o $@ $^ # $<"]
+    lines += ["", "debug: CFLAGS = -g", "debug: $(OUT)/app", "\t$(CC) $(CFLAGS) $(@F) $(@D)"]
+    index = build_makefile_index(lines)
+    table = build_variable_table(index.lines, tmp_path)
+    # When
+    definitions = [expand_target_definition(table, index, target) for target in index.targets]
+    # Then
+    assert definitions == [
+        "build/app: main.o util.o main.o\n\tgcc  -o build/app main.o util.o # main.o",
+        "debug: build/app\n\tgcc -g debug .",
+    ]
+    assert expand_target_definition(table, index, "unknown") == ""
+
+
+def test_expand_target_definition_expands_each_variable_once(tmp_path: Path) -> None:
+    # Given
+    lines = ["FILES = $(wildcard *.txt)", "CMD = cat $(FILES)"]
+    for i in range(100):
+        lines += [f"t{i}: t{i + 1}", "\t$(CMD) > $@"]
+    (tmp_path / "a.txt").write_text("a")
+    index = build_makefile_index(lines)
+    table = build_variable_table(index.lines, tmp_path)
+    # When
+    definitions = {target: expand_target_definition(table, index, target) for target in index.targets}
+    # Then
+    assert definitions["t0"] == "t0: t1\n\tcat a.txt > t0"
+    assert definitions["t99"] == "t99: t100\n\tcat a.txt > t99"
+    assert table.num_expansions == 2
+
+
+########################################################################################################################
@@ -4,11 +4,13 @@ Makeshow integration test
 
 """
 
+import json
 from pathlib import Path
 
-from pytest import CaptureFixture
+from pytest import CaptureFixture, MonkeyPatch
 from shared_test_utils import capture_and_reemit_stdout_and_stderr
 
+import utils
 from makeshow import run_makeshow
 from utils import MakeshowParameters
 
@@ -100,3 +102,346 @@ def test_makeshow_file_not_found(capsys: CaptureFixture[str]) -> None:
 
 
 ########################################################################################################################
+
+
+def test_makeshow_reverse_dependencies(capsys: CaptureFixture[str]) -> None:
+    """
+    Integration test to verify that the targets depending on the given target are shown.
+    :param capsys: Pytest fixture to capture stdout and stderr.
+    """
+    #
+    # Given
+    #
+    makefile_path = Path("test/data/including/Makefile").resolve()
+
+    #
+    # When
+    #
+    # Prepare parameters to run makeshow on the test data file
+    params = MakeshowParameters(
+        makefile_path=makefile_path,
+        desired_targets=["d"],
+        show_dependencies=False,
+        show_makefile_instead=False,
+        disable_coloring=True,
+        color_scheme="one-dark",
+        show_reverse_dependencies=True,
+    )
+
+    # Run makeshow and capture its output
+    run_makeshow(params)
+    stdout, stderr = capture_and_reemit_stdout_and_stderr(capsys)
+
+    #
+    # Then
+    #
+    # Verify that the target and the targets depending on it were printed in order
+    output_lines = stdout.split("\n")
+    assert [line for line in output_lines if ":" in line] == ["d: c", "e: d", "f: e"]
+    assert stderr == ""
+
+
+########################################################################################################################
+
+
+def test_makeshow_tree(capsys: CaptureFixture[str]) -> None:
+    """
+    Integration test to verify that the definitions of a target in all Makefiles under a folder are shown.
+    :param capsys: Pytest fixture to capture stdout and stderr.
+    """
+    #
+    # Given
+    #
+    tree_dir = Path("test/data")
+
+    #
+    # When
+    #
+    # Prepare parameters to run makeshow on all test data files
+    params = MakeshowParameters(
+        makefile_path=Path("./Makefile"),
+        desired_targets=["b", "unknown_target"],
+        show_dependencies=False,
+        show_makefile_instead=False,
+        disable_coloring=True,
+        color_scheme="one-dark",
+        tree_dir=tree_dir,
+    )
+
+    # Run makeshow and capture its output
+    run_makeshow(params)
+    stdout, stderr = capture_and_reemit_stdout_and_stderr(capsys)
+
+    #
+    # Then
+    #
+    # Verify that the definition in each Makefile was printed after the Makefile path
+    output_lines = stdout.split("\n")
+    assert [line for line in output_lines if line.startswith("# ") or ":" in line] == [
+        f"# {tree_dir / 'backslahes' / 'Makefile'}",
+        "b:",
+        f"# {tree_dir / 'circular' / 'Makefile'}",
+        "b: a",
+        f"# {tree_dir / 'including' / 'extras' / 'b_and_c.mk'}",
+        "b: a",
+    ]
+    assert "(No definition found for target 'unknown_target')" in output_lines
+    assert stderr == ""
+
+
+########################################################################################################################
+
+
+def test_makeshow_ndjson(capsys: CaptureFixture[str]) -> None:
+    """
+    Integration test to verify that the dependency chain of a target is printed as one JSON record per line.
+    :param capsys: Pytest fixture to capture stdout and stderr.
+    """
+    #
+    # Given
+    #
+    makefile_path = Path("test/data/including/Makefile")
+
+    #
+    # When
+    #
+    # Prepare parameters to run makeshow on the test data file
+    params = MakeshowParameters(
+        makefile_path=makefile_path,
+        desired_targets=["c"],
+        show_dependencies=True,
+        show_makefile_instead=False,
+        disable_coloring=True,
+        color_scheme="one-dark",
+        output_format="ndjson",
+    )
+
+    # Run makeshow and capture its output
+    run_makeshow(params)
+    stdout, stderr = capture_and_reemit_stdout_and_stderr(capsys)
+
+    #
+    # Then
+    #
+    # Verify that each target of the dependency chain was printed as a record, with the file and line defining it
+    records = [json.loads(line) for line in stdout.splitlines()]
+    assert [(r["target"], r["file"], r["line"], r["prerequisites"]) for r in records] == [
+        ("a", str(makefile_path), 3, []),
+        ("b", str(makefile_path.parent / "extras" / "b_and_c.mk"), 3, ["a"]),
+        ("c", str(makefile_path.parent / "extras" / "b_and_c.mk"), 6, ["b"]),
+    ]
+    assert stderr == ""
+
+
+########################################################################################################################
+
+
+def test_makeshow_expand(capsys: CaptureFixture[str]) -> None:
+    """
+    Integration test to verify that the variables and functions in a target definition are expanded with --expand.
+    :param capsys: Pytest fixture to capture stdout and stderr.
+    """
+    #
+    # Given
+    #
+    makefile_path = Path("test/data/expanding/Makefile")
+
+    #
+    # When
+    #
+    # Prepare parameters to run makeshow on a Makefile with a header function and a list of files
+    params = MakeshowParameters(
+        makefile_path=makefile_path,
+        desired_targets=["format"],
+        show_dependencies=False,
+        show_makefile_instead=False,
+        disable_coloring=True,
+        color_scheme="one-dark",
+        expand=True,
+    )
+
+    # Run makeshow and capture its output
+    run_makeshow(params)
+    stdout, stderr = capture_and_reemit_stdout_and_stderr(capsys)
+
+    #
+    # Then
+    #
+    # Verify that the header function and the list of files were expanded
+    assert stdout == '\nformat:\n\t    @echo -e "\\033[1;35m"[make format]"\\033[0m"\n\t@black main.py utils\n\n'
+    assert stderr == ""
+
+
+########################################################################################################################
+
+
+def test_makeshow_target_patterns_and_suggestions(capsys: CaptureFixture[str]) -> None:
+    """
+    Integration test to verify that target patterns are replaced by the matching targets, and that similar target names
+    are suggested for a misspelled target.
+    :param capsys: Pytest fixture to capture stdout and stderr.
+    """
+    #
+    # Given
+    #
+    makefile_path = Path("Makefile")
+
+    #
+    # When
+    #
+    # Prepare parameters to run makeshow on the Makefile of makeshow itself
+    params = MakeshowParameters(
+        makefile_path=makefile_path,
+        desired_targets=["ruff_*", "isrot_fix"],
+        show_dependencies=False,
+        show_makefile_instead=False,
+        disable_coloring=True,
+        color_scheme="one-dark",
+    )
+
+    # Run makeshow and capture its output
+    run_makeshow(params)
+    stdout, stderr = capture_and_reemit_stdout_and_stderr(capsys)
+
+    #
+    # Then
+    #
+    # Verify that both ruff targets were shown, followed by a suggestion for the misspelled target
+    assert stdout.startswith("\nruff_check:\n")
+    assert "\nruff_fix:\n" in stdout
+    assert stdout.endswith("\n(No definition found for target 'isrot_fix')\nDid you mean: isort_fix?\n\n")
+    assert stderr == ""
+
+
+########################################################################################################################
+
+
+def test_makeshow_grep(capsys: CaptureFixture[str]) -> None:
+    """
+    Integration test to verify that the targets whose definitions contain a fixed string are shown with their matching
+    lines.
+    :param capsys: Pytest fixture to capture stdout and stderr.
+    """
+    #
+    # Given
+    #
+    makefile_path = Path("Makefile")
+
+    #
+    # When
+    #
+    # Prepare parameters to run makeshow on the Makefile of makeshow itself
+    params = MakeshowParameters(
+        makefile_path=makefile_path,
+        desired_targets=[],
+        show_dependencies=False,
+        show_makefile_instead=False,
+        disable_coloring=True,
+        color_scheme="one-dark",
+        grep="isort --settings-path",
+    )
+
+    # Run makeshow and capture its output
+    run_makeshow(params)
+    stdout, stderr = capture_and_reemit_stdout_and_stderr(capsys)
+
+    #
+    # Then
+    #
+    # Verify that both isort targets were shown with the line running isort, but not the targets depending on them
+    assert stdout.startswith("Targets with definitions containing 'isort --settings-path' found in Makefile:\n\n")
+    assert "\n* isort_check\n\t@isort --settings-path ./pyproject.toml --diff" in stdout
+    assert "\n* isort_fix\n\t@isort --settings-path ./pyproject.toml $(PYTHON_FILES_AND_FOLDERS)\n\n" in stdout
+    assert stdout.count("\n* ") == 2
+    assert stderr == ""
+
+
+########################################################################################################################
+
+
+def test_makeshow_mmap_with_patterns_and_unknown_targets(capsys: CaptureFixture[str]) -> None:
+    """
+    Integration test to verify that --mmap shows target patterns and unknown targets like the default path does.
+    :param capsys: Pytest fixture to capture stdout and stderr.
+    """
+    #
+    # Given
+    #
+    makefile_path = Path("Makefile")
+
+    #
+    # When
+    #
+    # Run makeshow on the Makefile of makeshow itself, with and without --mmap
+    outputs = []
+    for use_mmap in [False, True]:
+        params = MakeshowParameters(
+            makefile_path=makefile_path,
+            desired_targets=["isort_*", "isortfix"],
+            show_dependencies=False,
+            show_makefile_instead=False,
+            disable_coloring=True,
+            color_scheme="one-dark",
+            use_mmap=use_mmap,
+        )
+        run_makeshow(params)
+        # NB: The output is not re-emitted, as it would be captured again with the next output.
+        outputs.append(capsys.readouterr())
+
+    #
+    # Then
+    #
+    # Verify that the matching targets and the suggestions were shown with --mmap too
+    assert outputs[1] == outputs[0]
+    assert "\nisort_check:\n" in outputs[1].out
+    assert "\nisort_fix:\n" in outputs[1].out
+    assert "Did you mean: isort_fix" in outputs[1].out
+    assert outputs[1].err == ""
+
+
+def test_makeshow_watch_with_mmap(capsys: CaptureFixture[str], monkeypatch: MonkeyPatch) -> None:
+    """
+    Integration test to verify that --watch keeps watching the Makefile when --mmap is given too.
+    :param capsys: Pytest fixture to capture stdout and stderr.
+    :param monkeypatch: Pytest fixture to stop watching after the first output.
+    """
+    #
+    # Given
+    #
+    makefile_path = Path("Makefile")
+
+    def stop_watching(watcher: utils.MakefileWatcher) -> bool:
+        raise KeyboardInterrupt()
+
+    monkeypatch.setattr(utils, "poll_makefile_watcher", stop_watching)
+
+    #
+    # When
+    #
+    # Prepare parameters to watch the Makefile of makeshow itself
+    params = MakeshowParameters(
+        makefile_path=makefile_path,
+        desired_targets=["test"],
+        show_dependencies=False,
+        show_makefile_instead=False,
+        disable_coloring=True,
+        color_scheme="one-dark",
+        use_mmap=True,
+        watch=True,
+    )
+
+    # Run makeshow and capture its output
+    exit_code = run_makeshow(params)
+    stdout, stderr = capture_and_reemit_stdout_and_stderr(capsys)
+
+    #
+    # Then
+    #
+    # Verify that the target was shown once the terminal was cleared, before waiting for changes
+    assert exit_code == 0
+    assert stdout.startswith(utils.CLEAR_TERMINAL)
+    assert "\ntest:\n" in stdout
+    assert stderr == "makeshow: Watching 'Makefile' for changes. Press Ctrl+C to stop.\n"
+
+
+########################################################################################################################
@@ -0,0 +1,55 @@
+"""
+
+Makeshow memory-mapped Makefile utils - Unit tests
+
+"""
+
+from pathlib import Path
+
+from utils.mmap_utils import build_mmap_makefile_index, get_mmap_target_definition, get_mmap_target_list_definitions
+from utils.parsing_utils import extract_targets_and_target_definitions, load_lines_from_makefile_and_its_included_files
+
+
+########################################################################################################################
+
+
+def test_mmap_index_matches_line_based_parsing() -> None:
+    # Given
+    data_path = Path(__file__).parent / "data"
+    makefile_paths = [
+        data_path / "backslahes" / "Makefile",
+        data_path / "circular" / "Makefile",
+        data_path / "including" / "Makefile",
+        data_path / "including" / "Makefile2",
+        data_path / "nested_including" / "Makefile",
+    ]
+    for makefile_path in makefile_paths:
+        lines = load_lines_from_makefile_and_its_included_files(makefile_path)
+        all_targets, all_target_definitions = extract_targets_and_target_definitions(lines)
+        # When
+        index = build_mmap_makefile_index(makefile_path)
+        # Then
+        assert index.targets == all_targets
+        assert get_mmap_target_list_definitions(index, index.targets) == all_target_definitions
+
+
+########################################################################################################################
+
+
+def test_mmap_index_byte_spans(tmp_path: Path) -> None:
+    # Given
+    makefile_path = tmp_path / "Makefile"
+    makefile_path.write_bytes(
+        b"VAR := 1\n\na: b \\\n  c\n\techo a \\\n\t\tmore\n\n\n\techo a2\n# Comment\nb:\n\techo b"
+    )
+    # When
+    index = build_mmap_makefile_index(makefile_path)
+    # Then
+    assert index.targets == ["a", "b"]
+    assert index.spans["a"] == (0, 10, 49)
+    assert get_mmap_target_definition(index, "a") == "a: b    c\n\techo a \tmore\n\n\techo a2"
+    assert get_mmap_target_definition(index, "b") == "b:\n\techo b"
+    assert get_mmap_target_definition(index, "c") == ""
+
+
+########################################################################################################################
@@ -5,9 +5,19 @@ Makeshow parsing utils - Unit tests
 """
 
 
+import random
 from pathlib import Path
+from typing import Dict, List
 
-from utils.parsing_utils import load_lines_from_makefile_and_its_included_files
+from pytest import CaptureFixture, MonkeyPatch, raises
+from shared_test_utils import capture_and_reemit_stdout_and_stderr
+
+from utils import parsing_utils
+from utils.parsing_utils import build_makefile_index, collapse_blank_lines, extract_targets_and_target_definitions
+from utils.parsing_utils import find_target_list_dependencies, get_target_record
+from utils.parsing_utils import iter_lines_from_makefile_and_its_included_files, load_lines_and_include_graph
+from utils.parsing_utils import load_lines_from_makefile_and_its_included_files, read_lines_and_handle_backslashes
+from utils.parsing_utils import read_source_lines_and_handle_backslashes, update_makefile_index
 
 
 ########################################################################################################################
@@ -32,3 +42,270 @@ def test_load_lines_from_makefile_and_its_included_files() -> None:
 
 
 ########################################################################################################################
+
+
+def test_load_lines_with_nested_optional_and_circular_includes(
+    monkeypatch: MonkeyPatch, capsys: CaptureFixture[str]
+) -> None:
+    # Given
+    makefile_path = Path(__file__).parent / "data" / "nested_including" / "Makefile"
+    read_file_names: List[str] = []
+    read_lines = parsing_utils.read_lines_and_handle_backslashes
+
+    def read_lines_and_record_file_name(file_path: Path, err_msg: str = "File not found:") -> List[str]:
+        read_file_names.append(file_path.name)
+        return read_lines(file_path, err_msg=err_msg)
+
+    monkeypatch.setattr(parsing_utils, "read_lines_and_handle_backslashes", read_lines_and_record_file_name)
+    # When
+    lines, include_graph = load_lines_and_include_graph(makefile_path)
+    _, stderr = capture_and_reemit_stdout_and_stderr(capsys)
+    # Then
+    assert [line for line in lines if line.endswith(":") or ": " in line] == [
+        "common:",
+        "x: common",
+        "x: common",
+        "common:",
+        "y: common",
+        "a: x y",
+    ]
+    assert not any("include" in line for line in lines if not line.startswith("#"))
+    # Each included file is read once, and missing files of "-include" and "sinclude" directives are skipped
+    assert sorted(read_file_names) == ["common.mk", "x.mk", "y.mk"]
+    fragments_path = makefile_path.parent / "fragments"
+    assert include_graph[makefile_path] == [
+        fragments_path / "x.mk",
+        fragments_path / "y.mk",
+        fragments_path / "missing.mk",
+    ]
+    assert include_graph[fragments_path / "common.mk"] == [fragments_path / "x.mk"]
+    # Each include that would form a cycle is dropped with a warning
+    assert stderr.count("makeshow: Circular include dropped:") == 2
+
+
+def test_missing_include_file_raises(tmp_path: Path) -> None:
+    # Given
+    makefile_path = tmp_path / "Makefile"
+    makefile_path.write_text("-include optional.mk\ninclude required.mk\n")
+    # When / Then
+    with raises(FileNotFoundError, match="required.mk"):
+        load_lines_from_makefile_and_its_included_files(makefile_path)
+
+
+def test_include_file_is_read_once_whatever_its_spelling(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    # Given
+    (tmp_path / "x.mk").write_text("x:\n")
+    (tmp_path / "fragments").mkdir()
+    makefile_path = tmp_path / "Makefile"
+    makefile_path.write_text("include x.mk fragments/../x.mk\n")
+    read_file_names: List[str] = []
+    read_lines = parsing_utils.read_lines_and_handle_backslashes
+
+    def read_lines_and_record_file_name(file_path: Path, err_msg: str = "File not found:") -> List[str]:
+        read_file_names.append(file_path.name)
+        return read_lines(file_path, err_msg=err_msg)
+
+    monkeypatch.setattr(parsing_utils, "read_lines_and_handle_backslashes", read_lines_and_record_file_name)
+    for jobs in [1, 2]:
+        read_file_names.clear()
+        # When
+        lines = list(iter_lines_from_makefile_and_its_included_files(makefile_path, jobs=jobs))
+        # Then
+        assert lines.count("x:") == 2
+        assert read_file_names.count("x.mk") == 1
+
+
+########################################################################################################################
+
+
+def test_parallel_include_loading_matches_sequential_loading(tmp_path: Path) -> None:
+    # Given
+    rng = random.Random(11)
+    (tmp_path / "fragments").mkdir()
+    num_fragments = 30
+    for i in range(num_fragments):
+        directives = [
+            f"{rng.choice(['include', '-include', 'sinclude'])} fragments/f{rng.randrange(num_fragments)}.mk"
+            for _ in range(rng.randrange(3))
+        ]
+        lines = directives + ["-include fragments/missing.mk", f"f{i}: common", f"\techo {i}", ""]
+        (tmp_path / "fragments" / f"f{i}.mk").write_text("\n".join(lines))
+    (tmp_path / "fragments" / "common.mk").write_text("common:\n\techo common\n")
+    makefile_lines = [f"include fragments/f{i}.mk fragments/common.mk" for i in range(num_fragments)]
+    makefile_path = tmp_path / "Makefile"
+    makefile_path.write_text("\n".join(makefile_lines + ["all: f0", ""]))
+    expected_graph: Dict[Path, List[Path]] = dict()
+    expected_lines = list(iter_lines_from_makefile_and_its_included_files(makefile_path, expected_graph))
+    for jobs in [2, 8]:
+        # When
+        include_graph: Dict[Path, List[Path]] = dict()
+        lines = list(iter_lines_from_makefile_and_its_included_files(makefile_path, include_graph, jobs=jobs))
+        # Then
+        assert lines == expected_lines
+        assert include_graph == expected_graph
+    # When / Then
+    (tmp_path / "fragments" / "f0.mk").write_text("include fragments/required.mk\n")
+    with raises(FileNotFoundError, match="required.mk"):
+        list(iter_lines_from_makefile_and_its_included_files(makefile_path, jobs=8))
+
+
+########################################################################################################################
+
+
+def test_build_makefile_index() -> None:
+    # Given
+    makefile_path = Path(__file__).parent / "data" / "backslahes" / "Makefile"
+    lines = load_lines_from_makefile_and_its_included_files(makefile_path)
+    # When
+    index = build_makefile_index(lines)
+    # Then
+    assert index.targets == ["a", "b", "c", "all", "d"]
+    rule = index.rules["all"]
+    assert lines[rule.start] == "all :"
+    assert lines[rule.end] == "d : all"
+    assert rule.prerequisites == []
+    assert rule.recipe == ["\t@echo no space", "\t@echo nospace", "\t@echo one space", "\t@echo one space"]
+    assert index.rules["a"].prerequisites == ["b", "c"]
+    assert index.rules["d"].definition == 'd : all\n\techo "d"'
+
+
+########################################################################################################################
+
+
+def test_extract_targets_and_dependencies_from_index() -> None:
+    # Given
+    lines = ["a: b c", "\techo a", "", "b :", "\techo b", "", "\techo still b", "c:", "", "var := x"]
+    # When
+    all_targets, all_target_definitions = extract_targets_and_target_definitions(lines)
+    all_target_dependencies = find_target_list_dependencies(lines, all_targets + ["unknown"])
+    # Then
+    assert all_targets == ["a", "b", "c"]
+    assert all_target_definitions == {"a": "a: b c\n\techo a", "b": "b :\n\techo b\n\n\techo still b", "c": "c:"}
+    assert all_target_dependencies == {"a": ["b", "c"], "b": [], "c": [], "unknown": []}
+
+
+def test_build_makefile_index_with_multi_target_and_pattern_rules() -> None:
+    # Given
+    lines = [
+        "CC := gcc -o x:y",
+        "a b:\tc | d",
+        "\techo $@",
+        "%.o: %.c",
+        "\t$(CC) $<",
+        "define RECIPE",
+        "fake: target",
+        "endef",
+        "install:: a",
+        "a: CFLAGS += -O2",
+        ".PHONY: a",
+    ]
+    # When
+    index = build_makefile_index(lines)
+    # Then
+    assert index.targets == ["a", "b", "%.o", "install"]
+    assert index.rules["a"].prerequisites == ["c", "d"]
+    assert index.rules["b"].definition == "a b:\tc | d\n\techo $@"
+    assert index.rules["%.o"].prerequisites == ["%.c"]
+    assert index.header_line_numbers[".PHONY"] == 10
+
+
+########################################################################################################################
+
+
+########################################################################################################################
+
+
+def read_lines_and_handle_backslashes_from_text(text: str) -> List[str]:
+    # Reference implementation: Handle backslashes on the whole text at once
+    text = text.replace("\\\n\t", "")
+    text = text.replace("\\\n", " ")
+    return text.splitlines(keepends=False)
+
+
+def collapse_blank_lines_in_text(lines: List[str]) -> List[str]:
+    # Reference implementation: Collapse blank lines by repeated replacements on the joined text
+    if len(lines) > 0 and lines[-1] != "":
+        lines = lines + [""]
+    text = "\n".join(lines)
+    while "\n\n\n" in text:
+        text = text.replace("\n\n\n", "\n\n")
+    return text.splitlines(keepends=False)
+
+
+def test_streaming_reader_matches_whole_text_processing(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    rng = random.Random(5)
+    pieces = ["a", "b:", " ", "\t", "\\", "\n", "\n", "\n", "\f", "\r\n"]
+    file_path = tmp_path / "Makefile"
+    for _ in range(2000):
+        # Given
+        text = "".join(rng.choice(pieces) for _ in range(rng.randrange(30)))
+        file_path.write_bytes(text.encode())
+        monkeypatch.setattr(parsing_utils, "READ_CHUNK_SIZE", rng.randrange(1, 10))
+        # When
+        lines = read_lines_and_handle_backslashes(file_path)
+        # Then
+        expected_lines = read_lines_and_handle_backslashes_from_text(file_path.read_text())
+        assert lines == expected_lines, repr(text)
+        assert list(collapse_blank_lines(lines)) == collapse_blank_lines_in_text(expected_lines), repr(text)
+        assert read_source_lines_and_handle_backslashes(file_path) == expected_lines, repr(text)
+
+
+def test_get_target_record_with_source_positions() -> None:
+    # Given
+    data_dir = Path(__file__).parent / "data"
+    expected_records = {
+        "including": {
+            "target": "b",
+            "found": True,
+            "file": str(data_dir / "including" / "extras" / "b_and_c.mk"),
+            "line": 3,
+            "prerequisites": ["a"],
+            "recipe": ['\techo "b"'],
+        },
+        "backslahes": {
+            "target": "a",
+            "found": True,
+            "file": str(data_dir / "backslahes" / "Makefile"),
+            "line": 6,
+            "prerequisites": ["b", "c"],
+            "recipe": ['\techo "a"'],
+        },
+    }
+    for folder_name, expected_record in expected_records.items():
+        makefile_path = data_dir / folder_name / "Makefile"
+        target = str(expected_record["target"])
+        # When
+        lines = list(iter_lines_from_makefile_and_its_included_files(makefile_path, source_positions=True))
+        index = build_makefile_index(lines)
+        # Then
+        assert lines == load_lines_from_makefile_and_its_included_files(makefile_path)
+        assert get_target_record(index, target) == expected_record
+        assert get_target_record(index, "unknown_target")["found"] is False
+        # Without source positions, the file and line number are left out
+        index = build_makefile_index(load_lines_from_makefile_and_its_included_files(makefile_path))
+        assert get_target_record(index, target) == dict(expected_record, file=None, line=None)
+
+
+########################################################################################################################
+
+
+def test_update_makefile_index_matches_rebuilding_the_index() -> None:
+    # Given
+    rng = random.Random(14)
+    line_choices = ["a: b", "b:", "c : a b", "a: c", "x := 1", "d: x:y", "a d:: c", "b: X = 1", "\techo a", "\techo b"]
+    line_choices += [" indented", "", "# c", "define V", "override define W :=", "endef", "a: V"]
+    for _ in range(500):
+        lines = [rng.choice(line_choices) for _ in range(rng.randrange(12))]
+        index = build_makefile_index(list(lines))
+        for _ in range(5):
+            start = rng.randrange(len(lines) + 1)
+            end = rng.randrange(start, len(lines) + 1)
+            new_lines = [rng.choice(line_choices) for _ in range(rng.randrange(4))]
+            lines[start:end] = new_lines
+            # When
+            update_makefile_index(index, start, end, new_lines)
+            # Then
+            assert index == build_makefile_index(list(lines)), lines
+
+
+########################################################################################################################
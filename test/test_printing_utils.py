@@ -4,11 +4,15 @@ Makeshow printing utils - Unit tests
 
 """
 
+import io
+from contextlib import redirect_stdout
+from typing import Iterator, List, Tuple
 
+import pytest
 from pytest import CaptureFixture
 from shared_test_utils import capture_and_reemit_stdout_and_stderr
 
-from utils.printing_utils import print_list
+from utils.printing_utils import print_list, print_target_definitions, stream_target_definitions
 
 
 ########################################################################################################################
@@ -29,3 +33,68 @@ def test_print_list(capsys: CaptureFixture[str]) -> None:
 
 
 ########################################################################################################################
+
+
+def test_print_target_definitions(capsys: CaptureFixture[str]) -> None:
+    # Given
+    all_target_definitions = {"a": "a: b\n\techo a", "b": "b:\n\techo b", "c": ""}
+    targets_to_show = ["b", "a", "c", "d"]
+    # When
+    print_target_definitions(all_target_definitions, targets_to_show)
+    stdout, stderr = capture_and_reemit_stdout_and_stderr(capsys)
+    # Then
+    assert stderr == ""
+    assert stdout == (
+        "\nb:\n\techo b\n\na: b\n\techo a\n\nTarget 'c' not found in Makefile.\n\n"
+        "(No definition found for target 'd')\n\n"
+    )
+
+
+########################################################################################################################
+
+
+def test_stream_target_definitions() -> None:
+    # Given
+    all_target_definitions = {"a": "a: b\n\techo a", "b": "b:\n\techo b", "c": ""}
+    targets_to_show = ["b", "a", "c", "d"]
+    suggestions = {"d": ["a"]}
+    buffer = io.StringIO()
+    outputs_before_targets: List[str] = []
+
+    def _iter_target_definitions() -> Iterator[Tuple[str, str]]:
+        for target in targets_to_show:
+            outputs_before_targets.append(buffer.getvalue())
+            yield target, all_target_definitions.get(target, f"(No definition found for target '{target}')")
+
+    # When
+    expected_outputs = []
+    for coloring_func in [None, str.upper]:
+        with redirect_stdout(io.StringIO()) as expected_stdout:
+            print_target_definitions(
+                all_target_definitions, targets_to_show, coloring_func=coloring_func, suggestions=suggestions
+            )
+        expected_outputs.append(expected_stdout.getvalue())
+        with redirect_stdout(buffer):
+            stream_target_definitions(_iter_target_definitions(), coloring_func=coloring_func, suggestions=suggestions)
+    # Then
+    assert buffer.getvalue() == "".join(expected_outputs)
+    assert expected_outputs[1] == (
+        "\nB:\n\tECHO B\n\nA: B\n\tECHO A\n\nTarget 'c' not found in Makefile.\n\n"
+        "(NO DEFINITION FOUND FOR TARGET 'D')\nDid you mean: a?\n\n"
+    )
+    # NB: Without coloring, the first definition is written before the second target is produced.
+    assert outputs_before_targets[1] == "\nb:\n\techo b\n\n"
+
+
+def test_stream_target_definitions_raises_errors_of_the_producer() -> None:
+    # Given
+    def _iter_target_definitions() -> Iterator[Tuple[str, str]]:
+        yield "a", "a:"
+        raise ValueError("Resolution failed")
+
+    # When
+    with redirect_stdout(io.StringIO()), pytest.raises(ValueError, match="Resolution failed"):
+        stream_target_definitions(_iter_target_definitions(), coloring_func=str.upper)
+
+
+########################################################################################################################
@@ -0,0 +1,84 @@
+"""
+
+Makeshow profiling utils - Unit tests
+
+"""
+
+import io
+import json
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from pytest import CaptureFixture
+from shared_test_utils import capture_and_reemit_stdout_and_stderr
+
+from makeshow import main
+from utils import Profiler, count_profile_event, profile_stage
+
+
+########################################################################################################################
+
+
+def test_profiler_nested_stages() -> None:
+    # Given
+    profiler = Profiler(trace_memory=True)
+    # When
+    with redirect_stdout(io.StringIO()), profiler.activate():
+        with profile_stage("loading"):
+            for _ in range(2):
+                with profile_stage("include_expansion"):
+                    data = [0] * 100_000
+            count_profile_event("files", 3)
+        with profile_stage("output"):
+            print("abc\N{COPYRIGHT SIGN}")
+    # Then
+    assert list(profiler.stages) == ["loading", "loading/include_expansion", "output"]
+    assert profiler.stages["loading/include_expansion"].calls == 2
+    assert profiler.stages["loading"].wall_time >= profiler.stages["loading/include_expansion"].wall_time
+    assert profiler.stages["loading/include_expansion"].peak_memory >= 8 * len(data)
+    assert profiler.stages["loading"].peak_memory >= profiler.stages["loading/include_expansion"].peak_memory
+    assert profiler.counts == {"files": 3, "bytes_printed": 6}
+
+
+def test_profile_stage_without_active_profiler() -> None:
+    # Given
+    profiler = Profiler()
+    # When
+    with profile_stage("loading"):
+        count_profile_event("files")
+    # Then
+    assert profiler.stages == dict()
+    assert profiler.counts == dict()
+
+
+########################################################################################################################
+
+
+def test_makeshow_profile_json(capsys: CaptureFixture[str]) -> None:
+    # Given
+    makefile_path = Path("test/data/including/Makefile")
+    arg_list = ["-m", str(makefile_path), "-n", "-d", "a"]
+    main(arg_list)
+    expected_stdout = capsys.readouterr().out
+    # When
+    main(["--profile_json"] + arg_list)
+    stdout, stderr = capture_and_reemit_stdout_and_stderr(capsys)
+    profile = json.loads(stderr)
+    # Then
+    assert stdout == expected_stdout
+    # NB: The definitions are printed while the targets are resolved, so resolving them is part of the output stage.
+    assert list(profile["stages"]) == [
+        "parse_args",
+        "coloring_setup",
+        "loading",
+        "output",
+        "output/dependency_resolution",
+        "output/target_extraction",
+    ]
+    assert profile["counts"]["lines"] > 0
+    assert profile["counts"]["targets"] > 0
+    assert profile["counts"]["edges"] > 0
+    assert profile["counts"]["bytes_printed"] == len(expected_stdout.encode("utf-8"))
+
+
+########################################################################################################################
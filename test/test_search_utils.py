@@ -0,0 +1,102 @@
+"""
+
+Makeshow target search utils - Unit tests
+
+"""
+
+import fnmatch
+import random
+
+from utils.search_utils import DefinitionTokenIndex, TargetSearchIndex, expand_target_patterns, find_matching_lines
+
+
+########################################################################################################################
+
+
+def test_prefix_trie_matches_scanning_the_targets() -> None:
+    # Given
+    rng = random.Random(23)
+    targets = ["".join(rng.choice("ab_") for _ in range(rng.randrange(6))) for _ in range(300)]
+    names = list(dict.fromkeys(targets))
+    # When
+    search_index = TargetSearchIndex(targets)
+    # Then
+    for prefix in ["", "a", "ab", "b_a", "__", "abab", "c"]:
+        assert search_index.find_prefix(prefix) == [name for name in names if name.startswith(prefix)]
+    for pattern in ["a*", "*b", "a?_*", "[ab]_*", "ab"]:
+        assert search_index.match_pattern(pattern) == [name for name in names if fnmatch.fnmatchcase(name, pattern)]
+
+
+def test_search_and_suggest() -> None:
+    # Given
+    targets = ["docker_build", "docker_push", "test", "test_unit", "lint", "Deploy", "x"]
+    # When
+    search_index = TargetSearchIndex(targets)
+    # Then
+    assert search_index.search("PUSH") == ["docker_push"]
+    assert search_index.search("er_") == ["docker_build", "docker_push"]
+    assert search_index.search("t") == ["test", "test_unit", "lint"]
+    assert search_index.search("") == targets
+    assert search_index.suggest("dokcer_push") == ["docker_push"]
+    assert search_index.suggest("tes") == ["test", "test_unit"]
+    assert search_index.suggest("deploy") == ["Deploy"]
+    assert search_index.suggest("unrelated") == []
+
+
+def test_expand_target_patterns() -> None:
+    # Given
+    search_index = TargetSearchIndex(["docker_build", "docker_push", "test", "a[1]"])
+    # When
+    expanded_targets = expand_target_patterns(search_index, ["test", "docker_*", "a[1]", "lint_*", "test"])
+    # Then
+    assert expanded_targets == ["test", "docker_build", "docker_push", "a[1]", "lint_*", "test"]
+
+
+########################################################################################################################
+
+
+def test_definition_token_index_finds_every_matching_definition() -> None:
+    # Given
+    rng = random.Random(24)
+    target_definitions = {
+        f"t{i}": f"t{i}:\n\t" + " ".join("".join(rng.choice("ab_$( )") for _ in range(4)) for _ in range(3))
+        for i in range(200)
+    }
+    # When
+    definition_index = DefinitionTokenIndex(target_definitions)
+    # Then
+    for fixed_string in ["a", "ab", "b a", "_a b", "$(a", "ab)", "a_b", "bab_", " ", "$(", "t1", "t1:", "t12", ":\n"]:
+        expected = [t for t, definition in target_definitions.items() if fixed_string in definition]
+        candidates = definition_index.find_candidates(fixed_string)
+        assert set(expected).issubset(candidates)
+        assert list(find_matching_lines({t: target_definitions[t] for t in candidates}, fixed_string)) == [
+            t for t in expected if any(fixed_string in line for line in target_definitions[t].split("\n"))
+        ]
+
+
+def test_definition_token_index_and_find_matching_lines() -> None:
+    # Given
+    target_definitions = {
+        "docker_push": "docker_push: docker_build\n\tdocker push $(IMAGE)",
+        "docker_build": "docker_build:\n\tdocker build -t $(IMAGE) .",
+        "venv": "venv:\n\tpython -m venv $(VENV)\n\t$(VENV)/bin/pip install -e .",
+    }
+    # When
+    definition_index = DefinitionTokenIndex(target_definitions)
+    # Then
+    assert definition_index.find_candidates("docker push") == ["docker_push"]
+    assert definition_index.find_candidates("ker bui") == ["docker_build"]
+    assert definition_index.find_candidates("ocke") == ["docker_push", "docker_build"]
+    assert definition_index.find_candidates("nst") == ["venv"]
+    assert definition_index.find_candidates("$(VENV)") == ["venv"]
+    assert definition_index.find_candidates("podman") == []
+    assert find_matching_lines(target_definitions, "$(VENV)") == {
+        "venv": ["\tpython -m venv $(VENV)", "\t$(VENV)/bin/pip install -e ."]
+    }
+    assert find_matching_lines(target_definitions, "docker_build") == {
+        "docker_push": ["docker_push: docker_build"],
+        "docker_build": ["docker_build:"],
+    }
+
+
+########################################################################################################################
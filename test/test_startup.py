@@ -0,0 +1,95 @@
+"""
+
+Makeshow startup - Unit tests
+
+"""
+
+import ast
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import utils
+
+
+########################################################################################################################
+
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+# Time budget for the imports of "./makeshow.py --help", on top of the imports of the interpreter itself
+# NB: The budget is generous, as import times vary a lot between machines, so it only catches gross regressions,
+#     e.g. importing pygments. Use benchmarks/benchmark_startup.py to measure the startup time.
+HELP_IMPORT_TIME_BUDGET = 0.500
+# Modules that are slow to import and not needed to show the help text
+MODULES_NOT_IMPORTED_FOR_HELP = ["hashlib", "json", "mmap", "pickle", "pygments", "socket"]
+
+
+########################################################################################################################
+
+
+def get_public_names(module_path: Path) -> List[str]:
+    names: List[str] = []
+    for node in ast.parse(module_path.read_text()).body:
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            names.append(node.name)
+        elif isinstance(node, ast.Assign):
+            names += [target.id for target in node.targets if isinstance(target, ast.Name)]
+        elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+            names.append(node.target.id)
+    # NB: TYPE_CHECKING is defined by the modules that avoid importing typing, but it isn't a public name.
+    return [name for name in names if not name.startswith("_") and name != "TYPE_CHECKING"]
+
+
+def get_import_times(arg_list: List[str]) -> Dict[str, float]:
+    """
+    Run Python with the given arguments, and parse the output of its "-X importtime" option.
+    :param arg_list: Arguments for the Python interpreter.
+    :return: Import time in seconds of each imported module, excluding the time of the modules it imports.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime"] + arg_list, cwd=REPO_DIR, capture_output=True, text=True, check=True
+    )
+    import_times: Dict[str, float] = dict()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "[us]" not in line:
+            self_time, _, module_name = line[len("import time:") :].split("|")
+            import_times[module_name.strip()] = int(self_time) / 1e6
+    return import_times
+
+
+########################################################################################################################
+
+
+def test_utils_submodule_names() -> None:
+    # Given
+    utils_dir = REPO_DIR / "utils"
+    # When
+    submodule_names = {p.stem: get_public_names(p) for p in sorted(utils_dir.glob("*_utils.py"))}
+    # Then
+    assert utils.SUBMODULES == list(submodule_names)
+    assert [(m, n) for m, names in utils.LAZY_NAMES.items() for n in names if n not in submodule_names[m]] == []
+    assert utils.parse_args is utils.cli_utils.parse_args
+    assert "print_banner" in dir(utils)
+    # Names that aren't listed as lazy names are found in their submodule too
+    assert utils.compute_dependency_chain is utils.dependency_utils.compute_dependency_chain
+
+
+########################################################################################################################
+
+
+def test_makeshow_help_import_time() -> None:
+    # Given
+    interpreter_modules = get_import_times(["-c", "pass"])
+    # When
+    # NB: The best of three runs is used, as import times are noisy.
+    runs = [get_import_times(["makeshow.py", "--help"]) for _ in range(3)]
+    help_import_times = [sum(t for m, t in run.items() if m not in interpreter_modules) for run in runs]
+    # Then
+    imported_modules = {module_name for run in runs for module_name in run}
+    assert [m for m in imported_modules if m.split(".")[0] in MODULES_NOT_IMPORTED_FOR_HELP] == []
+    assert "concurrent.futures" not in imported_modules
+    assert min(help_import_times) < HELP_IMPORT_TIME_BUDGET, f"{1000 * min(help_import_times):.1f} ms"
+
+
+########################################################################################################################
@@ -0,0 +1,76 @@
+"""
+
+Makeshow Makefile tokenizing utils - Unit tests
+
+"""
+
+from utils.tokenizing_utils import MakefileAssignment, MakefileDirective, MakefileRuleHeader, iter_makefile_statements
+from utils.tokenizing_utils import split_words, tokenize_line
+
+
+########################################################################################################################
+
+
+def test_tokenize_rule_headers() -> None:
+    # Given
+    lines = ["a b: c", "%.o: %.c", "target:: x", "a\t:\tb c", "$(OBJS): %.o: %.c | dir ; echo $@"]
+    # When
+    headers = [tokenize_line(line) for line in lines]
+    # Then
+    assert headers == [
+        MakefileRuleHeader(0, ["a", "b"], ["c"], [], False, None, None),
+        MakefileRuleHeader(0, ["%.o"], ["%.c"], [], False, None, None),
+        MakefileRuleHeader(0, ["target"], ["x"], [], True, None, None),
+        MakefileRuleHeader(0, ["a"], ["b", "c"], [], False, None, None),
+        MakefileRuleHeader(0, ["$(OBJS)"], ["%.c"], ["dir"], False, "%.o", "echo $@"),
+    ]
+
+
+def test_tokenize_assignments_and_directives() -> None:
+    # Given
+    lines = [
+        "x := a:b",
+        "y = $(x:.c=.o) # comment",
+        "export PATH += :/bin",
+        "a.o: CFLAGS ?= -O2",
+        "export : all",
+        "ifeq ($(x),a:b)",
+        "export X Y",
+        "# comment",
+    ]
+    # When
+    statements = [tokenize_line(line) for line in lines]
+    # Then
+    assert statements == [
+        MakefileAssignment(0, "x", ":=", "a:b", [], []),
+        MakefileAssignment(0, "y", "=", "$(x:.c=.o)", [], []),
+        MakefileAssignment(0, "PATH", "+=", ":/bin", [], ["export"]),
+        MakefileAssignment(0, "CFLAGS", "?=", "-O2", ["a.o"], []),
+        MakefileRuleHeader(0, ["export"], ["all"], [], False, None, None),
+        MakefileDirective(0, "ifeq", "($(x),a:b)"),
+        MakefileDirective(0, "export", "X Y"),
+        None,
+    ]
+
+
+########################################################################################################################
+
+
+def test_iter_makefile_statements_with_define() -> None:
+    # Given
+    lines = ["define RECIPE =", "\techo $(1)", "define NESTED", "not: a rule", "endef", "endef", "", "all: ; $(RECIPE)"]
+    # When
+    statements = list(iter_makefile_statements(lines))
+    # Then
+    assert statements == [
+        MakefileAssignment(0, "RECIPE", "=", "\techo $(1)\ndefine NESTED\nnot: a rule\nendef", [], []),
+        MakefileRuleHeader(7, ["all"], [], [], False, None, "$(RECIPE)"),
+    ]
+
+
+def test_split_words() -> None:
+    assert split_words(" a\tb  c ") == ["a", "b", "c"]
+    assert split_words("$(call f, x y) ${z 1}.o $$a") == ["$(call f, x y)", "${z 1}.o", "$$a"]
+
+
+########################################################################################################################
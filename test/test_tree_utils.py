@@ -0,0 +1,103 @@
+"""
+
+Makeshow monorepo tree utils - Unit tests
+
+"""
+
+import shutil
+from pathlib import Path
+from typing import List, Optional
+
+from pytest import MonkeyPatch
+
+from utils import tree_utils
+from utils.tree_utils import build_tree_index, discover_makefiles, find_makefile_target_definition, update_tree_index
+
+
+########################################################################################################################
+
+
+def test_discover_makefiles() -> None:
+    # Given
+    root_dir = Path(__file__).parent / "data"
+    # When
+    makefile_paths = discover_makefiles(root_dir)
+    # Then
+    assert makefile_paths == [
+        "backslahes/Makefile",
+        "circular/Makefile",
+        "expanding/Makefile",
+        "including/Makefile",
+        "including/extras/b_and_c.mk",
+        "including/extras/d_and_e.mk",
+        "nested_including/Makefile",
+        "nested_including/fragments/common.mk",
+        "nested_including/fragments/x.mk",
+        "nested_including/fragments/y.mk",
+    ]
+
+
+########################################################################################################################
+
+
+def test_build_tree_index_in_process_pool_matches_sequential_parsing(monkeypatch: MonkeyPatch) -> None:
+    # Given
+    root_dir = Path(__file__).parent / "data"
+    sequential_index = build_tree_index(root_dir, jobs=1)
+    monkeypatch.setattr(tree_utils, "MIN_FILES_FOR_PROCESS_POOL", 0)
+    # When
+    index = build_tree_index(root_dir, jobs=2)
+    # Then
+    assert index == sequential_index
+    assert index.target_files["e"] == ["including/extras/d_and_e.mk"]
+    assert index.target_files["c"] == ["backslahes/Makefile", "circular/Makefile", "including/extras/b_and_c.mk"]
+
+
+########################################################################################################################
+
+
+def test_update_tree_index_only_parses_changed_makefiles(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    # Given
+    root_dir = tmp_path / "data"
+    shutil.copytree(Path(__file__).parent / "data", root_dir)
+    cache_dir = tmp_path / "cache"
+    update_tree_index(root_dir, cache_dir=cache_dir)
+    parsed_paths: List[str] = []
+    find_makefile_targets = tree_utils.find_makefile_targets
+
+    def find_makefile_targets_and_record_path(makefile_path: Path) -> Optional[List[str]]:
+        parsed_paths.append(makefile_path.relative_to(root_dir).as_posix())
+        return find_makefile_targets(makefile_path)
+
+    monkeypatch.setattr(tree_utils, "find_makefile_targets", find_makefile_targets_and_record_path)
+    # When
+    with (root_dir / "circular" / "Makefile").open("a") as f:
+        f.write("\ng: a\n\techo 'g'\n")
+    (root_dir / "including" / "extras" / "d_and_e.mk").unlink()
+    (root_dir / "new.mk").write_text("h:\n\techo 'h'\n")
+    index = update_tree_index(root_dir, cache_dir=cache_dir)
+    # Then
+    assert parsed_paths == ["new.mk", "circular/Makefile"]
+    assert index.target_files["g"] == ["circular/Makefile"]
+    assert index.target_files["h"] == ["new.mk"]
+    assert "e" not in index.target_files
+    assert index == build_tree_index(root_dir)
+
+
+########################################################################################################################
+
+
+def test_find_makefile_target_definition_of_unreadable_makefile(tmp_path: Path) -> None:
+    # Given
+    makefile_path = tmp_path / "Makefile"
+    makefile_path.write_bytes(b"a:\n\techo 'a'\n")
+    # When / Then
+    assert find_makefile_target_definition(makefile_path, "a") == "a:\n\techo 'a'"
+    assert find_makefile_target_definition(makefile_path, "b") == ""
+    makefile_path.write_bytes(b"a:\n\techo '\xff'\n")
+    assert find_makefile_target_definition(makefile_path, "a") is None
+    makefile_path.unlink()
+    assert find_makefile_target_definition(makefile_path, "a") is None
+
+
+########################################################################################################################
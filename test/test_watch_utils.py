@@ -0,0 +1,81 @@
+"""
+
+Makeshow watch utils - Unit tests
+
+"""
+
+import shutil
+from pathlib import Path
+from typing import List
+
+from pytest import MonkeyPatch
+
+from utils import parsing_utils
+from utils.parsing_utils import build_makefile_index, get_target_record, load_lines_from_makefile_and_its_included_files
+from utils.watch_utils import MakefileWatcher, find_changed_line_range
+
+
+########################################################################################################################
+
+
+def test_find_changed_line_range() -> None:
+    # Given
+    old_lines = ["a:", "\techo a", "", "b: a", "\techo b", "", "c: b"]
+    new_lines = ["a:", "\techo a", "", "b: a c", "\techo b", "\techo b2", "", "c: b"]
+    # When
+    start, end, new_end = find_changed_line_range(old_lines, new_lines)
+    # Then
+    assert (start, end, new_end) == (3, 5, 6)
+    assert old_lines[:start] + new_lines[start:new_end] + old_lines[end:] == new_lines
+    assert find_changed_line_range(old_lines, old_lines) == (7, 7, 7)
+    assert find_changed_line_range(["a:", "a:"], ["a:"]) == (1, 2, 1)
+
+
+########################################################################################################################
+
+
+def test_makefile_watcher_only_reads_changed_files(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    # Given
+    makefile_folder = tmp_path / "including"
+    shutil.copytree(Path(__file__).parent / "data" / "including", makefile_folder)
+    makefile_path = makefile_folder / "Makefile"
+    watcher = MakefileWatcher(makefile_path)
+    read_file_names: List[str] = []
+    read_lines = parsing_utils.read_lines_and_handle_backslashes
+
+    def read_lines_and_record_file_name(file_path: Path, err_msg: str = "File not found:") -> List[str]:
+        read_file_names.append(file_path.name)
+        return read_lines(file_path, err_msg=err_msg)
+
+    monkeypatch.setattr(parsing_utils, "read_lines_and_handle_backslashes", read_lines_and_record_file_name)
+    # When / Then
+    assert not watcher.poll()
+    # When
+    included_file_path = makefile_folder / "extras" / "b_and_c.mk"
+    included_file_path.write_text(included_file_path.read_text().replace("b: a", "b: a g\n\techo 'b needs g'"))
+    # Then
+    assert watcher.poll()
+    assert read_file_names == ["b_and_c.mk"]
+    assert watcher.index == build_makefile_index(load_lines_from_makefile_and_its_included_files(makefile_path))
+    assert watcher.index.rules["b"].prerequisites == ["a", "g"]
+    assert watcher.get_dependency_graph().get_dependencies("b") == ["a", "g"]
+
+
+########################################################################################################################
+
+
+def test_makefile_watcher_updates_source_positions(tmp_path: Path) -> None:
+    # Given
+    makefile_folder = tmp_path / "including"
+    shutil.copytree(Path(__file__).parent / "data" / "including", makefile_folder)
+    watcher = MakefileWatcher(makefile_folder / "Makefile", source_positions=True)
+    included_file_path = makefile_folder / "extras" / "b_and_c.mk"
+    assert get_target_record(watcher.index, "b")["line"] == 3
+    # When
+    included_file_path.write_text("# Two new lines\n\n" + included_file_path.read_text())
+    # Then
+    assert watcher.poll()
+    assert get_target_record(watcher.index, "b")["line"] == 5
+
+
+########################################################################################################################
@@ -2,10 +2,139 @@
 
 Makeshow utils init-file
 
+The names of the submodules are imported on first use, so that makeshow only imports the modules needed by the
+requested mode, which keeps its startup fast.
+
 """
 
-from .cli_utils import *  # noqa: F403
-from .coloring_utils import *  # noqa: F403
-from .dependency_utils import *  # noqa: F403
-from .parsing_utils import *  # noqa: F403
-from .printing_utils import *  # noqa: F403
+from __future__ import annotations
+
+import importlib
+
+
+# NB: Like the submodules, the typing module is only imported for type checking, as it is slow to import.
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any, Dict, List
+
+    from .caching_utils import *  # noqa: F403
+    from .cli_utils import *  # noqa: F403
+    from .coloring_utils import *  # noqa: F403
+    from .completion_utils import *  # noqa: F403
+    from .daemon_protocol_utils import *  # noqa: F403
+    from .daemon_utils import *  # noqa: F403
+    from .dependency_utils import *  # noqa: F403
+    from .expansion_utils import *  # noqa: F403
+    from .mmap_utils import *  # noqa: F403
+    from .parsing_utils import *  # noqa: F403
+    from .printing_utils import *  # noqa: F403
+    from .profiling_utils import *  # noqa: F403
+    from .search_utils import *  # noqa: F403
+    from .tokenizing_utils import *  # noqa: F403
+    from .tree_utils import *  # noqa: F403
+    from .watch_utils import *  # noqa: F403
+
+
+########################################################################################################################
+
+
+SUBMODULES = [
+    "caching_utils",
+    "cli_utils",
+    "coloring_utils",
+    "completion_utils",
+    "daemon_protocol_utils",
+    "daemon_utils",
+    "dependency_utils",
+    "expansion_utils",
+    "mmap_utils",
+    "parsing_utils",
+    "printing_utils",
+    "profiling_utils",
+    "search_utils",
+    "tokenizing_utils",
+    "tree_utils",
+    "watch_utils",
+]
+
+# Names used by makeshow.py, by submodule, which are looked up without importing any other submodule
+LAZY_NAMES: Dict[str, List[str]] = {
+    "caching_utils": [
+        "clear_cache",
+        "get_cache_dir",
+        "get_definition_token_index",
+        "get_dependency_graph",
+        "get_target_search_index",
+        "load_and_index_makefile",
+    ],
+    "cli_utils": ["MakeshowParameters", "parse_args"],
+    "coloring_utils": ["get_optional_coloring_function"],
+    "completion_utils": ["get_completion_script", "parse_completion_args", "run_completion"],
+    "daemon_protocol_utils": ["get_daemon_socket_path"],
+    "daemon_utils": ["LocalRunRequested", "run_daemon"],
+    "dependency_utils": ["DependencyGraph"],
+    "expansion_utils": ["build_variable_table", "expand_target_definition"],
+    "mmap_utils": ["build_mmap_makefile_index", "get_mmap_target_list_definitions"],
+    "parsing_utils": [
+        "MakefileIndex",
+        "get_rule",
+        "get_single_target_definition",
+        "get_target_list_definitions",
+        "get_target_record",
+    ],
+    "printing_utils": [
+        "print_banner",
+        "print_entire_makefile",
+        "print_grep_results",
+        "print_makefile_not_found_error",
+        "print_search_results",
+        "print_target_definitions",
+        "print_target_records",
+        "print_tree_dir_not_found_error",
+        "print_tree_targets",
+        "print_usage",
+        "stream_target_definitions",
+    ],
+    "profiling_utils": ["Profiler", "count_profile_event", "get_max_rss", "print_profile_summary", "profile_stage"],
+    "search_utils": ["expand_target_patterns", "find_matching_lines", "is_target_pattern"],
+    "tree_utils": ["find_makefile_target_definition", "update_tree_index"],
+    "watch_utils": ["CLEAR_TERMINAL", "MakefileWatcher", "WATCH_POLL_INTERVAL", "poll_makefile_watcher"],
+}
+
+_NAME_SUBMODULES = {name: submodule for submodule, names in LAZY_NAMES.items() for name in names}
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Import the submodule providing the given name on first use (PEP 562).
+    Names that aren't listed in LAZY_NAMES are looked up in the submodules in turn, like "from .submodule import *".
+    :param name: Name of a submodule, or of a public name of a submodule.
+    :return: The submodule or the value of the name.
+    """
+    if name in SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    submodule = _NAME_SUBMODULES.get(name)
+    if submodule is not None:
+        value = getattr(importlib.import_module(f".{submodule}", __name__), name)
+    elif not name.startswith("_"):
+        value = _find_public_name(name)
+    else:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    # NB: Once stored in the module, the name is found without calling __getattr__ again.
+    globals()[name] = value
+    return value
+
+
+def _find_public_name(name: str) -> Any:
+    for submodule in SUBMODULES:
+        module = importlib.import_module(f".{submodule}", __name__)
+        if name in vars(module):
+            return vars(module)[name]
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(SUBMODULES) | set(_NAME_SUBMODULES))
+
+
+########################################################################################################################
@@ -0,0 +1,524 @@
+"""
+
+Makeshow cache utils
+
+"""
+
+import dataclasses
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .completion_utils import store_target_list_in_cache
+from .dependency_utils import DependencyGraph
+from .parsing_utils import MakefileIndex, build_makefile_index, get_target_list_definitions
+from .parsing_utils import get_target_list_dependencies, iter_lines_from_makefile_and_its_included_files
+from .profiling_utils import count_profile_event, profile_stage
+from .search_utils import DefinitionTokenIndex, TargetSearchIndex
+
+
+########################################################################################################################
+
+
+CACHE_FORMAT_VERSION = 7
+DEFINITION_INDEX_FORMAT_VERSION = 2
+DEFAULT_MAX_CACHE_SIZE = 64 * 1024 * 1024
+DEFAULT_MAX_HIGHLIGHT_CACHE_SIZE = 16 * 1024 * 1024
+HIGHLIGHT_MEMORY_CACHE_ENTRIES = 4096
+PARSE_MEMORY_CACHE_ENTRIES = 32
+
+# In-memory LRU cache of highlighted texts, shared by all coloring functions of the process
+_highlight_memory_cache: "OrderedDict[str, str]" = OrderedDict()
+
+# In-memory LRU caches of parsed Makefiles and their dependency graphs, which keep long-running processes warm
+_parse_memory_cache: "OrderedDict[Path, ParseMemoryCacheEntry]" = OrderedDict()
+_dependency_graph_memory_cache: "OrderedDict[int, Tuple[MakefileIndex, DependencyGraph]]" = OrderedDict()
+_search_index_memory_cache: "OrderedDict[int, Tuple[MakefileIndex, int, TargetSearchIndex]]" = OrderedDict()
+_definition_index_memory_cache: "OrderedDict[int, Tuple[MakefileIndex, int, DefinitionTokenIndex]]" = OrderedDict()
+
+
+@dataclasses.dataclass
+class FileFingerprint:
+    path: str
+    mtime_ns: int
+    size: int
+    sha256: str
+
+
+@dataclasses.dataclass
+class ParseCacheEntry:
+    version: int
+    fingerprints: List[FileFingerprint]
+    include_graph: Dict[Path, List[Path]]
+    lines: List[str]
+    index: MakefileIndex
+    source_positions: bool  # Whether the lines are SourceLine objects
+
+
+@dataclasses.dataclass
+class DefinitionIndexCacheEntry:
+    version: int
+    file_stats: Dict[str, Tuple[int, int]]  # File stats of the parsed Makefile, like in its ParseMemoryCacheEntry
+    definition_index: DefinitionTokenIndex
+
+
+@dataclasses.dataclass
+class ParseMemoryCacheEntry:
+    file_stats: Dict[str, Tuple[int, int]]  # Maps each loaded file to its mtime and size, or (-1, -1) if it is missing
+    lines: List[str]
+    index: MakefileIndex
+    source_positions: bool  # Whether the lines are SourceLine objects
+
+
+########################################################################################################################
+
+
+def get_cache_dir() -> Path:
+    """
+    Get the makeshow cache folder, i.e. $XDG_CACHE_HOME/makeshow, defaulting to ~/.cache/makeshow.
+    :return: Path to the cache folder (which might not exist yet).
+    """
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME", "")
+    cache_home = Path(xdg_cache_home) if xdg_cache_home != "" else Path.home() / ".cache"
+    return cache_home / "makeshow"
+
+
+def clear_cache(cache_dir: Path) -> None:
+    clear_memory_caches()
+    if cache_dir.is_dir():
+        import shutil
+
+        shutil.rmtree(cache_dir)
+
+
+def clear_memory_caches() -> None:
+    # NB: Unlike clear_cache, the cache folder is kept, e.g. to time uncached stages without reading files again.
+    _highlight_memory_cache.clear()
+    _parse_memory_cache.clear()
+    _dependency_graph_memory_cache.clear()
+    _search_index_memory_cache.clear()
+    _definition_index_memory_cache.clear()
+
+
+def get_cache_entry_path(makefile_path: Path, cache_dir: Path) -> Path:
+    key = compute_sha256(str(makefile_path.resolve()).encode())[:32]
+    return cache_dir / f"{key}.pickle"
+
+
+def get_definition_index_path(makefile_path: Path, cache_dir: Path) -> Path:
+    # NB: Named like the parse cache entry of the Makefile, so both are evicted by the same size limit.
+    return get_cache_entry_path(makefile_path, cache_dir).with_suffix(".definitions.pickle")
+
+
+########################################################################################################################
+
+
+def compute_sha256(data: bytes) -> str:
+    # NB: Like pickle and shutil, hashlib is imported on first use, as it is slow to import and only used by the caches.
+    import hashlib
+
+    return hashlib.sha256(data).hexdigest()
+
+
+def compute_file_fingerprint(file_path: Path) -> FileFingerprint:
+    try:
+        stat = file_path.stat()
+    except FileNotFoundError:
+        # NB: Missing files of "-include" directives are fingerprinted too, so the entry is dropped if they appear.
+        return FileFingerprint(path=str(file_path.resolve()), mtime_ns=-1, size=-1, sha256="")
+    return FileFingerprint(
+        path=str(file_path.resolve()),
+        mtime_ns=stat.st_mtime_ns,
+        size=stat.st_size,
+        sha256=compute_sha256(file_path.read_bytes()),
+    )
+
+
+def is_fingerprint_valid(fingerprint: FileFingerprint) -> bool:
+    file_path = Path(fingerprint.path)
+    try:
+        stat = file_path.stat()
+    except OSError:
+        return fingerprint.sha256 == ""
+    if fingerprint.sha256 == "":
+        return False
+    # Compare the cheap stat results before hashing the file contents
+    if stat.st_mtime_ns != fingerprint.mtime_ns or stat.st_size != fingerprint.size:
+        return False
+    return compute_sha256(file_path.read_bytes()) == fingerprint.sha256
+
+
+########################################################################################################################
+
+
+def get_loaded_file_paths(include_graph: Dict[Path, List[Path]]) -> List[Path]:
+    """
+    :param include_graph: Include graph, mapping each loaded file to the files it includes.
+    :return: The Makefile and every file it includes (including missing optional ones), without duplicates.
+    """
+    file_paths: Dict[Path, None] = dict()
+    for file_path, included_file_paths in include_graph.items():
+        file_paths[file_path] = None
+        for p in included_file_paths:
+            file_paths[p] = None
+    return list(file_paths)
+
+
+def load_cache_entry(makefile_path: Path, cache_dir: Path) -> Optional[ParseCacheEntry]:
+    """
+    Look up the parsed Makefile in the cache.
+    The entry is only used if the Makefile and all of its included files are unchanged since it was stored.
+    :param makefile_path: Path to the Makefile.
+    :param cache_dir: Cache folder.
+    :return: Cache entry holding the Makefile lines and the Makefile index, or None on a cache miss.
+    """
+    import pickle
+
+    entry_path = get_cache_entry_path(makefile_path, cache_dir)
+    try:
+        with entry_path.open("rb") as f:
+            entry = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    if not isinstance(entry, ParseCacheEntry) or entry.version != CACHE_FORMAT_VERSION:
+        return None
+    if not all(is_fingerprint_valid(fingerprint) for fingerprint in entry.fingerprints):
+        return None
+    # Mark the entry as recently used for the size-based eviction
+    try:
+        os.utime(entry_path)
+    except OSError:
+        pass  # NB: A read-only cache folder should never make makeshow fail.
+    return entry
+
+
+def store_makefile_index_in_cache(
+    makefile_path: Path,
+    cache_dir: Path,
+    lines: List[str],
+    index: MakefileIndex,
+    include_graph: Dict[Path, List[Path]],
+    max_cache_size: int = DEFAULT_MAX_CACHE_SIZE,
+    source_positions: bool = False,
+    file_stats: Optional[Dict[str, Tuple[int, int]]] = None,
+) -> None:
+    # Fingerprint the Makefile and every file it includes
+    fingerprints = [compute_file_fingerprint(p) for p in get_loaded_file_paths(include_graph)]
+    # NB: The files are hashed after they are parsed, so the entry is not stored if a file changed since it was read,
+    #     as its hash might not match the parsed lines.
+    if file_stats is not None and any(file_stats.get(fp.path) != (fp.mtime_ns, fp.size) for fp in fingerprints):
+        return
+    entry = ParseCacheEntry(
+        version=CACHE_FORMAT_VERSION,
+        fingerprints=fingerprints,
+        include_graph=include_graph,
+        lines=lines,
+        index=index,
+        source_positions=source_positions,
+    )
+    # Write the entry atomically, so concurrent makeshow runs never see a partially written entry
+    import pickle
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    entry_path = get_cache_entry_path(makefile_path, cache_dir)
+    tmp_path = entry_path.with_suffix(f".{os.getpid()}.tmp")
+    with tmp_path.open("wb") as f:
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, entry_path)
+    evict_cache_entries(cache_dir, max_cache_size)
+
+
+def evict_cache_entries(cache_dir: Path, max_cache_size: int, pattern: str = "*.pickle") -> None:
+    """
+    Delete the least recently used cache entries until the total size of the cache is at most max_cache_size bytes.
+    :param cache_dir: Cache folder.
+    :param max_cache_size: Maximum total size of the cache entries in bytes.
+    :param pattern: Glob pattern matching the cache entries in the cache folder.
+    """
+    entries = []
+    for entry_path in cache_dir.glob(pattern):
+        try:
+            stat = entry_path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime_ns, stat.st_size, entry_path))
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, entry_path in sorted(entries):
+        if total_size <= max_cache_size:
+            break
+        entry_path.unlink(missing_ok=True)
+        total_size -= size
+
+
+########################################################################################################################
+
+
+def load_and_index_makefile(
+    makefile_path: Path, cache_dir: Optional[Path] = None, jobs: int = 1, source_positions: bool = False
+) -> Tuple[List[str], MakefileIndex]:
+    """
+    Load and index a Makefile, using the parse cache in the given cache folder if provided.
+    Parsed Makefiles are also kept in memory, and reused while the size and modification time of the Makefile and all
+    of its included files are unchanged, which keeps long-running processes such as the makeshow daemon warm.
+    :param makefile_path: Path to the Makefile.
+    :param cache_dir: Cache folder, or None to disable caching.
+    :param jobs: Number of threads reading included files concurrently, or 1 to read them one after another.
+    :param source_positions: Whether the lines must be SourceLine objects, e.g. for the records of get_target_record.
+        Cached lines without source positions are then loaded again, and cached with their source positions.
+    :return: Tuple of the Makefile lines and the Makefile index.
+    """
+    with profile_stage("loading"):
+        memory_key = makefile_path.resolve()
+        memory_entry = _parse_memory_cache.get(memory_key)
+        if (
+            memory_entry is not None
+            and (memory_entry.source_positions or not source_positions)
+            and all(get_file_stat(Path(p)) == file_stat for p, file_stat in memory_entry.file_stats.items())
+        ):
+            _parse_memory_cache.move_to_end(memory_key)
+            count_profile_event("memory_cache_hits")
+            return memory_entry.lines, memory_entry.index
+        if cache_dir is not None:
+            entry = load_cache_entry(makefile_path, cache_dir)
+            if entry is not None and (entry.source_positions or not source_positions):
+                file_stats = {fp.path: (fp.mtime_ns, fp.size) for fp in entry.fingerprints}
+                memory_entry = ParseMemoryCacheEntry(file_stats, entry.lines, entry.index, entry.source_positions)
+                store_makefile_index_in_memory(memory_key, memory_entry)
+                count_profile_event("disk_cache_hits")
+                return entry.lines, entry.index
+        # Load the lines of the Makefile and its included files
+        include_graph: Dict[Path, List[Path]] = dict()
+        read_file_stats: Dict[Path, Tuple[int, int]] = dict()
+        lines = list(
+            iter_lines_from_makefile_and_its_included_files(
+                makefile_path, include_graph, jobs, source_positions, file_stats=read_file_stats
+            )
+        )
+        count_profile_event("files", len(get_loaded_file_paths(include_graph)))
+    # NB: The index reuses the list of lines.
+    with profile_stage("target_extraction"):
+        index = build_makefile_index(lines)
+    # NB: The files are stat'ed before they are read, so a file changed while or after it is read is loaded again.
+    file_stats = {
+        str(p.resolve()): read_file_stats.get(p.resolve(), (-1, -1)) for p in get_loaded_file_paths(include_graph)
+    }
+    store_makefile_index_in_memory(memory_key, ParseMemoryCacheEntry(file_stats, lines, index, source_positions))
+    if cache_dir is not None:
+        try:
+            store_makefile_index_in_cache(
+                makefile_path,
+                cache_dir,
+                lines,
+                index,
+                include_graph,
+                source_positions=source_positions,
+                file_stats=file_stats,
+            )
+            store_target_list_in_cache(str(makefile_path), str(cache_dir), index.targets, file_stats)
+        except OSError:
+            pass  # NB: A read-only or full cache folder should never make makeshow fail.
+    return lines, index
+
+
+def get_file_stat(file_path: Path) -> Tuple[int, int]:
+    try:
+        stat = file_path.stat()
+    except OSError:
+        return -1, -1
+    return stat.st_mtime_ns, stat.st_size
+
+
+def store_makefile_index_in_memory(key: Path, entry: ParseMemoryCacheEntry) -> None:
+    _parse_memory_cache[key] = entry
+    _parse_memory_cache.move_to_end(key)
+    while len(_parse_memory_cache) > PARSE_MEMORY_CACHE_ENTRIES:
+        _parse_memory_cache.popitem(last=False)
+
+
+def get_dependency_graph(index: MakefileIndex) -> DependencyGraph:
+    """
+    Compile the dependency graph of all targets of a Makefile index, reusing the graph compiled for the same index.
+    :param index: Makefile index.
+    :return: Dependency graph.
+    """
+    cached = _dependency_graph_memory_cache.get(id(index))
+    if cached is not None and cached[0] is index:
+        _dependency_graph_memory_cache.move_to_end(id(index))
+        return cached[1]
+    dependency_graph = DependencyGraph(get_target_list_dependencies(index, index.targets))
+    # NB: The index is kept alive by the cache entry, so its id can't be reused by another index.
+    _dependency_graph_memory_cache[id(index)] = (index, dependency_graph)
+    while len(_dependency_graph_memory_cache) > PARSE_MEMORY_CACHE_ENTRIES:
+        _dependency_graph_memory_cache.popitem(last=False)
+    return dependency_graph
+
+
+def get_target_search_index(index: MakefileIndex) -> TargetSearchIndex:
+    """
+    Build the search index of the targets of a Makefile index, reusing the search index built for the same targets.
+    :param index: Makefile index.
+    :return: Target search index.
+    """
+    cached = _search_index_memory_cache.get(id(index))
+    # NB: The version is compared too, as the index is updated in place in watch mode.
+    if cached is not None and cached[0] is index and cached[1] == index.version:
+        _search_index_memory_cache.move_to_end(id(index))
+        return cached[2]
+    with profile_stage("search_indexing"):
+        search_index = TargetSearchIndex(index.targets)
+    _search_index_memory_cache[id(index)] = (index, index.version, search_index)
+    while len(_search_index_memory_cache) > PARSE_MEMORY_CACHE_ENTRIES:
+        _search_index_memory_cache.popitem(last=False)
+    return search_index
+
+
+def get_definition_token_index(
+    index: MakefileIndex, makefile_path: Optional[Path] = None, cache_dir: Optional[Path] = None
+) -> DefinitionTokenIndex:
+    """
+    Build the token index of the target definitions of a Makefile index, reusing the token index built for the same
+    lines, which is also stored next to the parse cache entry of the Makefile if a cache folder is given.
+    The stored token index is only used while the Makefile and all of its included files are unchanged.
+    :param index: Makefile index, e.g. from load_and_index_makefile.
+    :param makefile_path: Path to the Makefile, or None to only keep the token index in memory.
+    :param cache_dir: Cache folder, or None to only keep the token index in memory.
+    :return: Definition token index.
+    """
+    cached = _definition_index_memory_cache.get(id(index))
+    # NB: The version is compared too, as the index is updated in place in watch mode.
+    if cached is not None and cached[0] is index and cached[1] == index.version:
+        _definition_index_memory_cache.move_to_end(id(index))
+        return cached[2]
+    # Look up the token index next to the parse cache entry, which is tied to the files that were parsed into the index
+    file_stats: Optional[Dict[str, Tuple[int, int]]] = None
+    if makefile_path is not None and cache_dir is not None:
+        memory_entry = _parse_memory_cache.get(makefile_path.resolve())
+        if memory_entry is not None and memory_entry.index is index:
+            file_stats = memory_entry.file_stats
+    definition_index = None
+    if makefile_path is not None and cache_dir is not None and file_stats is not None:
+        definition_index = load_cached_definition_index(makefile_path, cache_dir, file_stats)
+    if definition_index is None:
+        with profile_stage("definition_indexing"):
+            definition_index = DefinitionTokenIndex(get_target_list_definitions(index, index.targets))
+        if makefile_path is not None and cache_dir is not None and file_stats is not None:
+            store_definition_index_in_cache(makefile_path, cache_dir, definition_index, file_stats)
+    _definition_index_memory_cache[id(index)] = (index, index.version, definition_index)
+    while len(_definition_index_memory_cache) > PARSE_MEMORY_CACHE_ENTRIES:
+        _definition_index_memory_cache.popitem(last=False)
+    return definition_index
+
+
+def load_cached_definition_index(
+    makefile_path: Path, cache_dir: Path, file_stats: Dict[str, Tuple[int, int]]
+) -> Optional[DefinitionTokenIndex]:
+    import pickle
+
+    entry_path = get_definition_index_path(makefile_path, cache_dir)
+    try:
+        with entry_path.open("rb") as f:
+            entry = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    if not isinstance(entry, DefinitionIndexCacheEntry) or entry.version != DEFINITION_INDEX_FORMAT_VERSION:
+        return None
+    if entry.file_stats != file_stats:
+        return None
+    count_profile_event("definition_index_hits")
+    return entry.definition_index
+
+
+def store_definition_index_in_cache(
+    makefile_path: Path,
+    cache_dir: Path,
+    definition_index: DefinitionTokenIndex,
+    file_stats: Dict[str, Tuple[int, int]],
+    max_cache_size: int = DEFAULT_MAX_CACHE_SIZE,
+) -> None:
+    import pickle
+
+    entry = DefinitionIndexCacheEntry(DEFINITION_INDEX_FORMAT_VERSION, file_stats, definition_index)
+    # Write the entry atomically, like the parse cache entries
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        entry_path = get_definition_index_path(makefile_path, cache_dir)
+        tmp_path = entry_path.with_suffix(f".{os.getpid()}.tmp")
+        with tmp_path.open("wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, entry_path)
+        evict_cache_entries(cache_dir, max_cache_size)
+    except OSError:
+        pass  # NB: A read-only or full cache folder should never make makeshow fail.
+
+
+########################################################################################################################
+
+
+def get_highlight_cache_key(text: str, style_name: str, formatter_kind: str) -> str:
+    return compute_sha256("\0".join([formatter_kind, style_name, text]).encode())
+
+
+def load_cached_highlight(key: str, cache_dir: Optional[Path] = None) -> Optional[str]:
+    """
+    Look up a highlighted text in the in-memory cache, falling back to the on-disk cache if a cache folder is given.
+    :param key: Cache key from get_highlight_cache_key.
+    :param cache_dir: Cache folder, or None to only use the in-memory cache.
+    :return: Highlighted text or None on a cache miss.
+    """
+    colored = _highlight_memory_cache.get(key)
+    if colored is not None:
+        _highlight_memory_cache.move_to_end(key)
+        return colored
+    if cache_dir is None:
+        return None
+    entry_path = cache_dir / "highlights" / f"{key}.txt"
+    try:
+        colored = entry_path.read_text(encoding="utf-8")
+    except OSError:
+        return None
+    # Mark the entry as recently used for the size-based eviction
+    try:
+        os.utime(entry_path)
+    except OSError:
+        pass  # NB: A read-only cache folder should never make makeshow fail.
+    store_highlights_in_memory({key: colored})
+    return colored
+
+
+def store_highlights_in_cache(
+    colored_texts: Dict[str, str],
+    cache_dir: Optional[Path] = None,
+    max_cache_size: int = DEFAULT_MAX_HIGHLIGHT_CACHE_SIZE,
+) -> None:
+    """
+    Store highlighted texts in the in-memory cache, and in the on-disk cache if a cache folder is given.
+    :param colored_texts: Highlighted texts by their cache keys from get_highlight_cache_key.
+    :param cache_dir: Cache folder, or None to only use the in-memory cache.
+    :param max_cache_size: Maximum total size of the on-disk highlight cache in bytes.
+    """
+    store_highlights_in_memory(colored_texts)
+    if cache_dir is None or len(colored_texts) == 0:
+        return
+    highlights_dir = cache_dir / "highlights"
+    try:
+        highlights_dir.mkdir(parents=True, exist_ok=True)
+        for key, colored in colored_texts.items():
+            entry_path = highlights_dir / f"{key}.txt"
+            tmp_path = entry_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(colored, encoding="utf-8")
+            os.replace(tmp_path, entry_path)
+        evict_cache_entries(highlights_dir, max_cache_size, pattern="*.txt")
+    except OSError:
+        pass  # NB: A read-only or full cache folder should never make makeshow fail.
+
+
+def store_highlights_in_memory(colored_texts: Dict[str, str]) -> None:
+    for key, colored in colored_texts.items():
+        _highlight_memory_cache[key] = colored
+        _highlight_memory_cache.move_to_end(key)
+    while len(_highlight_memory_cache) > HIGHLIGHT_MEMORY_CACHE_ENTRIES:
+        _highlight_memory_cache.popitem(last=False)
+
+
+########################################################################################################################
@@ -4,15 +4,19 @@ Makeshow command-line interface utils
 
 """
 
-import argparse
 import dataclasses
+import os
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 
 ########################################################################################################################
 
 
+DEFAULT_MAKEFILE_PATH = Path("./Makefile")
+DEFAULT_COLOR_SCHEME = "one-dark"
+
+
 @dataclasses.dataclass
 class MakeshowParameters:
     makefile_path: Path
@@ -21,12 +25,49 @@ class MakeshowParameters:
     show_makefile_instead: bool
     disable_coloring: bool
     color_scheme: str
+    show_reverse_dependencies: bool = False
+    use_mmap: bool = False
+    use_cache: bool = False
+    clear_cache: bool = False
+    jobs: int = 0
+    tree_dir: Optional[Path] = None
+    run_daemon: bool = False
+    watch: bool = False
+    profile: bool = False
+    profile_format: str = "text"
+    profile_memory: bool = False
+    profile_cprofile_path: Optional[Path] = None
+    output_format: str = "text"
+    complete_prefix: Optional[str] = None
+    completion_shell: Optional[str] = None
+    expand: bool = False
+    search: Optional[str] = None
+    grep: Optional[str] = None
+    allow_shell: bool = False
 
 
 ########################################################################################################################
 
 
 def parse_args(arg_list: List[str]) -> MakeshowParameters:
+    # Without options, all arguments are target names, so skip importing and building the argument parser
+    if not any(arg.startswith("-") for arg in arg_list):
+        return MakeshowParameters(
+            makefile_path=DEFAULT_MAKEFILE_PATH,
+            desired_targets=list(arg_list),
+            show_dependencies=False,
+            show_makefile_instead=False,
+            disable_coloring=False,
+            color_scheme=DEFAULT_COLOR_SCHEME,
+            use_cache=is_cache_enabled(no_cache=False),
+        )
+    return parse_args_with_argument_parser(arg_list)
+
+
+def parse_args_with_argument_parser(arg_list: List[str]) -> MakeshowParameters:
+    # NB: The argparse module is imported here, as it is only needed when options are given.
+    import argparse
+
     # Parse given argument list
     parser = argparse.ArgumentParser(
         prog="makeshow",
@@ -38,7 +79,7 @@ def parse_args(arg_list: List[str]) -> MakeshowParameters:
         "-m",
         "--makefile_path",
         type=Path,
-        default=Path("./Makefile"),
+        default=DEFAULT_MAKEFILE_PATH,
         help="Path to Makefile to show definitions from.",
     )
     parser.add_argument(
@@ -47,6 +88,12 @@ def parse_args(arg_list: List[str]) -> MakeshowParameters:
         action="store_true",
         help="Also show definitions of the targets that the given target(s) depend on.",
     )
+    parser.add_argument(
+        "-r",
+        "--reverse_dependencies",
+        action="store_true",
+        help="Also show definitions of the targets that depend (directly or indirectly) on the given target(s).",
+    )
     parser.add_argument(
         "-s",
         "--show_makefile_instead",
@@ -63,10 +110,135 @@ def parse_args(arg_list: List[str]) -> MakeshowParameters:
         "-c",
         "--color_scheme",
         type=str,
-        default="one-dark",
+        default=DEFAULT_COLOR_SCHEME,
         help="Color scheme, e.g. 'one-dark', 'github-dark', or 'dracula', see https://pygments.org/styles."
         " Requires the 'pygments' package to be installed.",
     )
+    parser.add_argument(
+        "--format",
+        choices=["text", "json", "ndjson"],
+        default="text",
+        help="Output format. With 'json' or 'ndjson', the given target(s), or all targets if none are given, are"
+        " printed as records holding the target name, its prerequisites, its recipe lines and the file and line"
+        " number defining it, as a JSON array or one record per line (NDJSON), respectively. NDJSON records are"
+        " printed as soon as each target is resolved. Not used together with -s or --tree.",
+    )
+    parser.add_argument(
+        "--search",
+        type=str,
+        default=None,
+        metavar="SUBSTRING",
+        help="List the targets whose names contain the given substring (ignoring case) instead. Target names given"
+        " as shell-style patterns, e.g. 'docker_*', are always replaced by the targets matching them.",
+    )
+    parser.add_argument(
+        "--grep",
+        type=str,
+        default=None,
+        metavar="PATTERN",
+        help="List the targets whose definitions contain the given fixed string (matching case), e.g. 'docker push' or"
+        " '$(VENV)', with their matching lines highlighted instead. Uses a token index of the definitions, which is"
+        " stored next to the parse cache.",
+    )
+    parser.add_argument(
+        "--expand",
+        action="store_true",
+        help="Expand the variables and functions, e.g. $(call ...) and $(patsubst ...), in the shown target"
+        " definitions, without running make. References that can't be expanded offline, e.g. $(shell ...), are shown"
+        " as is."
+        " Not used together with -s, --mmap, --tree or --format json/ndjson.",
+    )
+    parser.add_argument(
+        "--allow_shell",
+        action="store_true",
+        help="With --expand, run the commands of $(shell ...) references and != assignments.",
+    )
+    parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help="Memory-map the Makefile and only decode the definitions of the given target(s)."
+        " Faster for very large Makefiles. Not used together with -d, -r, -s, --watch or --format json/ndjson.",
+    )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Do not use the parse cache, which is enabled by setting the environment variable MAKESHOW_CACHE=1.",
+    )
+    parser.add_argument(
+        "--clear_cache",
+        action="store_true",
+        help="Delete all entries of the parse cache before running.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=0,
+        help="Number of threads reading included files concurrently, useful for Makefiles including many files from"
+        " a slow (e.g. network-mounted) file system, or of processes parsing Makefiles with --tree."
+        " 0 reads included files one after another and uses one process per CPU with --tree.",
+    )
+    parser.add_argument(
+        "--tree",
+        type=Path,
+        default=None,
+        metavar="TREE_DIR",
+        help="Index all Makefiles (and *.mk files) under the given folder and show which of them define the given"
+        " target(s), or list the targets of all of them. Not used together with -d, -r or -s.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep showing the given target(s), and show them again whenever the Makefile or one of its included files"
+        " changes. Only the changed files are read again, and only the changed lines are indexed again.",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Run as a daemon that keeps parsed Makefiles and coloring state in memory and serves makeshow_client.py"
+        " on a Unix domain socket, given by the environment variable MAKESHOW_SOCKET (default: daemon.sock in the"
+        " cache folder).",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print the wall time and peak memory of each stage, and counts such as the number of lines, targets and"
+        " dependency edges, to stderr.",
+    )
+    parser.add_argument(
+        "--profile_json",
+        action="store_true",
+        help="Like --profile, but print the profile as JSON.",
+    )
+    parser.add_argument(
+        "--profile_memory",
+        action="store_true",
+        help="Like --profile, but trace the memory allocated in each stage with tracemalloc, which is slower.",
+    )
+    parser.add_argument(
+        "--profile_cprofile",
+        type=Path,
+        default=None,
+        metavar="STATS_PATH",
+        help="Like --profile, but also profile makeshow with cProfile, and write the statistics to the given file,"
+        " e.g. for 'python -m pstats STATS_PATH'.",
+    )
+    parser.add_argument(
+        "--complete",
+        type=str,
+        default=None,
+        metavar="PREFIX",
+        help="Print the names of the targets starting with the given prefix, one per line, for shell completion."
+        " The names are read from a target list in the cache folder, which is updated by scanning only the rule"
+        " headers of the Makefile and its included files whenever one of them changes.",
+    )
+    parser.add_argument(
+        "--completion_script",
+        choices=["bash", "zsh", "fish"],
+        default=None,
+        help="Print a script completing target names for the given shell, e.g. for"
+        " 'source <(./makeshow.py --completion_script bash)'.",
+    )
     parser.add_argument(
         "desired_targets",
         type=str,
@@ -83,8 +255,31 @@ def parse_args(arg_list: List[str]) -> MakeshowParameters:
         show_makefile_instead=args.show_makefile_instead,
         disable_coloring=args.no_colors,
         color_scheme=args.color_scheme,
+        show_reverse_dependencies=args.reverse_dependencies,
+        use_mmap=args.mmap,
+        use_cache=is_cache_enabled(no_cache=args.no_cache),
+        clear_cache=args.clear_cache,
+        jobs=args.jobs,
+        tree_dir=args.tree,
+        run_daemon=args.daemon,
+        watch=args.watch,
+        profile=args.profile or args.profile_json or args.profile_memory or args.profile_cprofile is not None,
+        profile_format="json" if args.profile_json else "text",
+        profile_memory=args.profile_memory,
+        profile_cprofile_path=args.profile_cprofile,
+        output_format=args.format,
+        complete_prefix=args.complete,
+        completion_shell=args.completion_script,
+        expand=args.expand,
+        search=args.search,
+        grep=args.grep,
+        allow_shell=args.allow_shell,
     )
     return params
 
 
+def is_cache_enabled(no_cache: bool) -> bool:
+    return os.environ.get("MAKESHOW_CACHE", "0") not in ("", "0") and not no_cache
+
+
 ########################################################################################################################
@@ -4,49 +4,178 @@ Makeshow coloring utils
 
 """
 
+import importlib.util
+import io
 import sys
-from typing import Callable, Optional
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .caching_utils import get_highlight_cache_key, load_cached_highlight, store_highlights_in_cache
+from .profiling_utils import profile_stage
+
+
+########################################################################################################################
+
+
+# Pygments lexers and formatters by style name, shared by all coloring functions of the process
+_pygments_lexers_and_formatters: Dict[str, Tuple[Any, Any]] = dict()
 
 
 ########################################################################################################################
 
 
-def get_optional_coloring_function(color_scheme: str, disable_coloring: bool) -> Optional[Callable[[str], str]]:
+def get_optional_coloring_function(
+    color_scheme: str, disable_coloring: bool, cache_dir: Optional[Path] = None
+) -> Optional[Callable[[str], str]]:
     """
     If the pygments library is installed, return a function that colors a given input text according to Makefile syntax.
-    If not, None will be returned.
+    If not, or if the color scheme isn't found, None will be returned.
+    Only the style is looked up right away, the pygments lexer and formatter are only imported once the returned
+    function is called for the first time, which keeps startup fast.
+    The returned function also supports coloring a batch of texts at once, see color_texts.
+    Colored texts are memoized in memory, and also on disk if a cache folder is given.
     :param color_scheme: The desired color scheme (i.e. pygments style, see https://pygments.org/styles).
     :param disable_coloring: Disable coloring by returning None, no matter if pygments is installed or not.
+    :param cache_dir: Cache folder for colored texts, or None to only memoize them in memory.
     :return: Coloring function or None.
     """
+    # Return an empty optional if coloring is disabled
+    if disable_coloring:
+        return None
+
     # Return an empty optional if the pygments library isn't available for coloring
-    try:
+    if importlib.util.find_spec("pygments") is None:
+        return None
+
+    # Return an empty optional if the provided color scheme (pygments style) isn't found
+    if color_scheme not in _pygments_lexers_and_formatters:
+        import pygments.styles
+        import pygments.util
+
+        try:
+            pygments.styles.get_style_by_name(color_scheme)
+        except pygments.util.ClassNotFound:
+            sys.stderr.write(f"WARNING: Style '{color_scheme}' not found. Coloring disabled.\n")
+            return None
+
+    # Create coloring function that sets up the pygments style, lexer and formatter on first use
+    return MakefileColoringFunction(color_scheme, cache_dir=cache_dir)
+
+
+########################################################################################################################
+
+
+class MakefileColoringFunction:
+    """
+    Function that colors Makefile text using a pygments style, importing pygments on first use.
+    Besides coloring a single text, it can color a batch of texts in a single lexer and formatter pass.
+    Colored texts are memoized, so pygments is never imported if all texts to color are found in the cache.
+    """
+
+    formatter_kind = "terminal256"
+
+    def __init__(self, style_name: str, cache_dir: Optional[Path] = None) -> None:
+        self.style_name = style_name
+        self.cache_dir = cache_dir
+        self._is_set_up = False
+        self._lexer: Any = None
+        self._formatter: Any = None
+
+    def __call__(self, text: str) -> str:
+        return self.color_batch([text])[0]
+
+    def color_batch(self, texts: List[str]) -> List[str]:
+        """
+        Color a list of texts, producing the same output as coloring each text separately.
+        Cached texts are looked up, and the remaining texts are colored in one batch and added to the cache.
+        :param texts: Texts to color.
+        :return: Colored texts.
+        """
+        with profile_stage("highlighting"):
+            return self._color_batch(texts)
+
+    def _color_batch(self, texts: List[str]) -> List[str]:
+        keys = [get_highlight_cache_key(text, self.style_name, self.formatter_kind) for text in texts]
+        colored_texts = [load_cached_highlight(key, self.cache_dir) for key in keys]
+        missing = [i for i, colored in enumerate(colored_texts) if colored is None]
+        if len(missing) == 0:
+            return [colored for colored in colored_texts if colored is not None]
+
+        self._set_up()
+        if self._formatter is None:
+            return list(texts)
+        newly_colored_texts: Dict[str, str] = dict()
+        for i, colored in zip(missing, self._highlight_batch([texts[i] for i in missing])):
+            colored_texts[i] = colored
+            newly_colored_texts[keys[i]] = colored
+        store_highlights_in_cache(newly_colored_texts, self.cache_dir)
+        return [colored for colored in colored_texts if colored is not None]
+
+    def _highlight_batch(self, texts: List[str]) -> List[str]:
+        """
+        Highlight a list of texts with pygments in a single pass.
+        Every text is tokenized with a fresh lexer state, and all tokens are formatted in one pass into a single buffer,
+        which is split back into per-text blocks at the offsets recorded between the texts.
+        :param texts: Texts to highlight.
+        :return: Highlighted texts.
+        """
+        buffer = io.StringIO()
+        offsets = [0]
+
+        def _tokens() -> Iterator[Tuple[Any, str]]:
+            for text in texts:
+                yield from self._lexer.get_tokens(text)
+                # NB: The formatter writes each token before requesting the next, so the buffer ends with this text now.
+                offsets.append(buffer.tell())
+
+        self._formatter.format(_tokens(), buffer)
+        colored = buffer.getvalue()
+        return [colored[start:end].rstrip("\n") for start, end in zip(offsets[:-1], offsets[1:])]
+
+    def _set_up(self) -> None:
+        if self._is_set_up:
+            return
+        self._is_set_up = True
+
+        # Reuse the lexer and formatter created for the same style earlier in the process
+        lexer_and_formatter = _pygments_lexers_and_formatters.get(self.style_name)
+        if lexer_and_formatter is not None:
+            self._lexer, self._formatter = lexer_and_formatter
+            return
+
         import pygments.formatters
         import pygments.lexers
         import pygments.styles
-    except ImportError:
-        return None
+        import pygments.util
 
-    # Return an empty optional if coloring is disabled
-    if disable_coloring:
-        return None
+        # Check if the provided color scheme (pygments style) is found
+        try:
+            style_obj = pygments.styles.get_style_by_name(self.style_name)
+        except pygments.util.ClassNotFound:
+            sys.stderr.write(f"WARNING: Style '{self.style_name}' not found. Coloring disabled.\n")
+            return
+
+        # Create lexer and formatter
+        self._lexer = pygments.lexers.MakefileLexer()
+        self._formatter = pygments.formatters.Terminal256Formatter(style=style_obj)
+        _pygments_lexers_and_formatters[self.style_name] = (self._lexer, self._formatter)
 
-    # Check if the provided color scheme (pygments style) is found
-    style_name = color_scheme
-    if style_name not in pygments.styles.get_all_styles():
-        sys.stderr.write(f"WARNING: Style '{style_name}' not found. Coloring disabled.\n")
-        return None
 
-    # Create style, lexer and formatter
-    style_obj = pygments.styles.get_style_by_name(style_name)
-    lexer = pygments.lexers.MakefileLexer()
-    formatter = pygments.formatters.Terminal256Formatter(style=style_obj)
+########################################################################################################################
 
-    # Create coloring function
-    def _coloring_func(text: str) -> str:
-        return pygments.highlight(text, lexer=lexer, formatter=formatter).rstrip("\n")
 
-    return _coloring_func
+def color_texts(texts: List[str], coloring_func: Optional[Callable[[str], str]]) -> List[str]:
+    """
+    Color a list of texts with the given coloring function, in a single batch if the coloring function supports it.
+    :param texts: Texts to color.
+    :param coloring_func: Coloring function or None to leave the texts uncolored.
+    :return: Colored texts.
+    """
+    if coloring_func is None:
+        return list(texts)
+    if isinstance(coloring_func, MakefileColoringFunction):
+        return coloring_func.color_batch(texts)
+    return [coloring_func(text) for text in texts]
 
 
 ########################################################################################################################
@@ -0,0 +1,223 @@
+"""
+
+Makeshow shell completion utils
+
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+
+
+# NB: Completion runs on every key press, so this module only imports what is needed to read a stored target list,
+#     and uses plain string paths, as importing typing and pathlib takes longer than the rest of a completion.
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict, List, Optional, Tuple
+
+
+########################################################################################################################
+
+
+TARGET_LIST_FORMAT_VERSION = 2
+COMPLETE_OPTION = "--complete="
+
+# Completion scripts by shell, which complete target names by running the typed makeshow command with --complete,
+# passing on the Makefile path given with -m, so they also work with makeshow_client.py
+COMPLETION_SCRIPTS: Dict[str, str] = {
+    "bash": r"""
+_makeshow_complete() {
+    local cur="${COMP_WORDS[COMP_CWORD]}" makefile_args=() i
+    for ((i = 1; i < COMP_CWORD; i++)); do
+        if [[ "${COMP_WORDS[i]}" == -m || "${COMP_WORDS[i]}" == --makefile_path ]]; then
+            makefile_args=(--makefile_path "${COMP_WORDS[i + 1]}")
+        fi
+    done
+    if [[ "$cur" == -* ]]; then
+        return
+    fi
+    local IFS=$'\n'
+    COMPREPLY=($("${COMP_WORDS[0]}" --complete="$cur" "${makefile_args[@]}" 2>/dev/null))
+}
+complete -F _makeshow_complete makeshow makeshow.py makeshow_client.py
+""",
+    "zsh": r"""
+_makeshow_complete() {
+    local -a makefile_args targets
+    local i
+    for ((i = 2; i < CURRENT; i++)); do
+        if [[ "${words[i]}" == -m || "${words[i]}" == --makefile_path ]]; then
+            makefile_args=(--makefile_path "${words[i + 1]}")
+        fi
+    done
+    if [[ "$PREFIX" == -* ]]; then
+        return 1
+    fi
+    targets=(${(f)"$("${words[1]}" --complete="$PREFIX" "${makefile_args[@]}" 2>/dev/null)"})
+    compadd -a targets
+}
+compdef _makeshow_complete makeshow makeshow.py makeshow_client.py
+""",
+    "fish": r"""
+function __makeshow_complete
+    set -l tokens (commandline -opc)
+    set -l makefile_args
+    for i in (seq 2 (math (count $tokens) - 1))
+        if contains -- $tokens[$i] -m --makefile_path
+            set makefile_args --makefile_path $tokens[(math $i + 1)]
+        end
+    end
+    $tokens[1] --complete=(commandline -ct) $makefile_args 2>/dev/null
+end
+for command in makeshow makeshow.py makeshow_client.py
+    complete -c $command -f -a '(__makeshow_complete)'
+end
+""",
+}
+
+
+########################################################################################################################
+
+
+def get_completion_script(shell: str) -> str:
+    return COMPLETION_SCRIPTS[shell].lstrip("\n")
+
+
+def parse_completion_args(arg_list: List[str]) -> Optional[Tuple[str, str]]:
+    """
+    Recognize the arguments passed by the completion scripts, i.e. "--complete=PREFIX [--makefile_path PATH]", so
+    target names can be completed without importing and building the argument parser.
+    :param arg_list: Argument list.
+    :return: Tuple of the prefix and the Makefile path, or None if the arguments have any other form.
+    """
+    if len(arg_list) == 1 and arg_list[0].startswith(COMPLETE_OPTION):
+        return arg_list[0][len(COMPLETE_OPTION) :], os.path.join(".", "Makefile")
+    if len(arg_list) == 3 and arg_list[0].startswith(COMPLETE_OPTION) and arg_list[1] == "--makefile_path":
+        return arg_list[0][len(COMPLETE_OPTION) :], arg_list[2]
+    return None
+
+
+def run_completion(prefix: str, makefile_path: str, use_cache: Optional[bool] = None) -> int:
+    """
+    Print the target names of a Makefile that start with a given prefix, for the completion scripts.
+    :param prefix: Prefix of the target names, e.g. the word being completed.
+    :param makefile_path: Path to the Makefile.
+    :param use_cache: Whether to keep the target list in the cache folder, or None to use it if the cache is enabled
+        by the environment variable MAKESHOW_CACHE, like the parse cache.
+    :return: Exit code.
+    """
+    # NB: Kept in sync with is_cache_enabled and get_cache_dir, which are not imported to keep completion fast.
+    if use_cache is None:
+        use_cache = os.environ.get("MAKESHOW_CACHE", "0") not in ("", "0")
+    cache_dir = None
+    if use_cache:
+        xdg_cache_home = os.environ.get("XDG_CACHE_HOME", "")
+        cache_home = xdg_cache_home if xdg_cache_home != "" else os.path.join(os.path.expanduser("~"), ".cache")
+        cache_dir = os.path.join(cache_home, "makeshow")
+    targets = complete_target_names(makefile_path, prefix, cache_dir)
+    sys.stdout.write("".join(f"{target}\n" for target in targets))
+    return 0
+
+
+def complete_target_names(makefile_path: str, prefix: str, cache_dir: Optional[str] = None) -> List[str]:
+    """
+    Find the target names of a Makefile that start with a given prefix, for shell completion.
+    With a cache folder, the names are read from the target list stored next to the parse cache, which is also written
+    by load_and_index_makefile. Otherwise, or if the list is outdated, the names are found by a header-only scan of
+    the Makefile and its included files, and the list is written for the next completion.
+    The Makefile is never fully indexed, so completion stays fast for Makefiles with thousands of targets.
+    :param makefile_path: Path to the Makefile.
+    :param prefix: Prefix of the target names, e.g. the word being completed.
+    :param cache_dir: Cache folder, or None to always scan the Makefile.
+    :return: Matching target names, in the order of their definition.
+    """
+    targets = load_cached_target_list(makefile_path, cache_dir) if cache_dir is not None else None
+    if targets is None:
+        # NB: The parsing and caching utils are only imported when the target list is missing or outdated.
+        from pathlib import Path
+
+        from .caching_utils import get_file_stat, get_loaded_file_paths
+        from .parsing_utils import scan_target_names
+
+        include_graph: Dict[Path, List[Path]] = dict()
+        try:
+            targets = scan_target_names(Path(makefile_path), include_graph)
+        except FileNotFoundError:
+            return []  # NB: A missing Makefile or included file just yields no completions.
+        if cache_dir is not None:
+            file_stats = {str(p.resolve()): get_file_stat(p) for p in get_loaded_file_paths(include_graph)}
+            try:
+                store_target_list_in_cache(makefile_path, cache_dir, targets, file_stats)
+            except OSError:
+                pass  # NB: A read-only or full cache folder should never make makeshow fail.
+    return [target for target in targets if target.startswith(prefix)]
+
+
+########################################################################################################################
+
+
+def get_target_list_path(makefile_path: str, cache_dir: str) -> str:
+    # NB: Named like the parse cache entry of the Makefile, see get_cache_entry_path, but with another suffix.
+    import hashlib
+
+    key = hashlib.sha256(os.path.realpath(makefile_path).encode()).hexdigest()[:32]
+    return os.path.join(cache_dir, f"{key}.targets")
+
+
+def load_cached_target_list(makefile_path: str, cache_dir: str) -> Optional[List[str]]:
+    """
+    Look up the target names of a Makefile in the compact target list stored next to its parse cache entry.
+    The list is only used if the size and modification time of the Makefile and all of its included files are
+    unchanged, which is much cheaper than loading and validating the parse cache entry.
+    :param makefile_path: Path to the Makefile.
+    :param cache_dir: Cache folder.
+    :return: Target names, or None on a cache miss.
+    """
+    try:
+        with open(get_target_list_path(makefile_path, cache_dir), encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    if len(lines) < 2 or lines[0] != f"makeshow-targets {TARGET_LIST_FORMAT_VERSION}":
+        return None
+    # The header is followed by the number of files, a line per file with its mtime, size and path, and the targets
+    try:
+        num_files = int(lines[1])
+        for line in lines[2 : 2 + num_files]:
+            mtime_ns, size, path = line.split(" ", 2)
+            try:
+                stat = os.stat(path)
+                file_stat = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                file_stat = (-1, -1)
+            if file_stat != (int(mtime_ns), int(size)):
+                return None
+    except ValueError:
+        return None  # NB: E.g. a list truncated by a full disk.
+    return lines[2 + num_files :]
+
+
+def store_target_list_in_cache(
+    makefile_path: str, cache_dir: str, targets: List[str], file_stats: Dict[str, Tuple[int, int]]
+) -> None:
+    """
+    Store the target names of a Makefile in a compact target list next to its parse cache entry.
+    :param makefile_path: Path to the Makefile.
+    :param cache_dir: Cache folder.
+    :param targets: Target names.
+    :param file_stats: Mtime and size of the Makefile and each of its included files, like get_file_stat returns them.
+    """
+    list_lines = [f"makeshow-targets {TARGET_LIST_FORMAT_VERSION}", str(len(file_stats))]
+    list_lines += [f"{mtime_ns} {size} {path}" for path, (mtime_ns, size) in file_stats.items()]
+    list_lines += list(dict.fromkeys(targets))
+    # Write the list atomically, like the parse cache entries
+    os.makedirs(cache_dir, exist_ok=True)
+    list_path = get_target_list_path(makefile_path, cache_dir)
+    tmp_path = f"{list_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("".join(f"{line}\n" for line in list_lines))
+    os.replace(tmp_path, list_path)
+
+
+########################################################################################################################
@@ -0,0 +1,35 @@
+"""
+
+Makeshow daemon protocol utils
+
+"""
+
+import os
+import struct
+
+
+# NB: This module is shared by the daemon and makeshow_client.py, so it only imports what the client needs to talk to
+#     the daemon, and uses plain string paths, as importing typing and pathlib would slow down every client request.
+
+
+########################################################################################################################
+
+
+# Channel (b"o" for stdout, b"e" for stderr, b"x" for the exit code, b"l" to run makeshow locally) and length
+FRAME_HEADER = struct.Struct(">cI")
+FORWARDED_ENV_VAR_PREFIXES = ("MAKESHOW_", "XDG_CACHE_HOME")
+
+
+def get_daemon_socket_path() -> str:
+    """
+    Get the path of the Unix domain socket of the makeshow daemon, i.e. $MAKESHOW_SOCKET, defaulting to
+    daemon.sock in the makeshow cache folder.
+    :return: Path to the socket.
+    """
+    socket_path = os.environ.get("MAKESHOW_SOCKET", "")
+    if socket_path != "":
+        return socket_path
+    # NB: Kept in sync with get_cache_dir, which is not imported to keep the client fast.
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME", "")
+    cache_home = xdg_cache_home if xdg_cache_home != "" else os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "makeshow", "daemon.sock")
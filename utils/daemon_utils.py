@@ -0,0 +1,242 @@
+"""
+
+Makeshow daemon utils
+
+"""
+
+import ast
+import contextlib
+import io
+import os
+import signal
+import socket
+import sys
+import threading
+import traceback
+from pathlib import Path
+from types import FrameType
+from typing import Callable, Dict, List, Optional
+
+from .daemon_protocol_utils import FORWARDED_ENV_VAR_PREFIXES, FRAME_HEADER
+
+
+########################################################################################################################
+
+
+FRAME_FLUSH_SIZE = 64 * 1024
+
+
+class DaemonStopped(SystemExit):
+    """
+    Raised by the SIGTERM handler of the daemon, which stops the daemon even while it handles a request, unlike the
+    SystemExit of argparse, which only ends the request.
+    """
+
+
+class LocalRunRequested(Exception):
+    """
+    Raised when handling a request that the daemon can't serve, e.g. with --watch, which would never end and block
+    all other clients, so the client runs makeshow locally instead.
+    """
+
+
+########################################################################################################################
+
+
+class FramedOutput:
+    """
+    Output to a client socket, sent in frames tagged with a channel.
+    Frames are buffered until FRAME_FLUSH_SIZE bytes are pending, and the stdout and stderr frames share this buffer,
+    so the client receives the output of both streams in the order it was written.
+    The buffer is guarded by a lock, as streamed colored definitions are written by a background thread while the
+    calling thread writes e.g. warnings.
+    """
+
+    def __init__(self, conn: socket.socket) -> None:
+        self.conn = conn
+        self.frames: List[bytes] = []
+        self.pending_size = 0
+        self.lock = threading.Lock()
+
+    def send(self, channel: bytes, payload: bytes) -> None:
+        with self.lock:
+            self.frames.append(FRAME_HEADER.pack(channel, len(payload)) + payload)
+            self.pending_size += FRAME_HEADER.size + len(payload)
+            if self.pending_size >= FRAME_FLUSH_SIZE:
+                self._send_pending_frames()
+
+    def flush(self) -> None:
+        with self.lock:
+            self._send_pending_frames()
+
+    def _send_pending_frames(self) -> None:
+        # NB: The frames are taken out of the buffer before sending them, and are sent while holding the lock, so
+        #     frames are neither lost nor sent twice, and are sent in the order they were written.
+        frames, self.frames = self.frames, []
+        self.pending_size = 0
+        if len(frames) > 0:
+            self.conn.sendall(b"".join(frames))
+
+
+class FramedOutputStream(io.TextIOBase):
+    def __init__(self, output: FramedOutput, channel: bytes) -> None:
+        super().__init__()
+        self.output = output
+        self.channel = channel
+
+    def write(self, text: str) -> int:
+        if text != "":
+            self.output.send(self.channel, text.encode("utf-8"))
+        return len(text)
+
+    def flush(self) -> None:
+        # NB: Streamed output, e.g. NDJSON records, is flushed as it is printed, so it reaches the client right away.
+        self.output.flush()
+
+
+########################################################################################################################
+
+
+def run_daemon(socket_path: str, handler: Callable[[List[str]], int]) -> int:
+    """
+    Serve makeshow requests on a Unix domain socket until interrupted.
+    :param socket_path: Path to the socket, e.g. from get_daemon_socket_path.
+    :param handler: Function running makeshow with the given argument list and returning its exit code.
+    :return: Exit code.
+    """
+    socket_file_path = Path(socket_path)
+    server_socket = create_daemon_socket(socket_file_path)
+    if server_socket is None:
+        sys.stderr.write(f"makeshow: The daemon is already running on '{socket_path}'.\n")
+        return 1
+    sys.stderr.write(f"makeshow: Daemon listening on '{socket_path}'. Press Ctrl+C to stop it.\n")
+    # Remove the socket file when stopped by Ctrl+C or by a SIGTERM, e.g. from kill
+    signal.signal(signal.SIGTERM, stop_daemon)
+    try:
+        serve_requests(server_socket, handler)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server_socket.close()
+        socket_file_path.unlink(missing_ok=True)
+    return 0
+
+
+def stop_daemon(signal_number: int, frame: Optional[FrameType]) -> None:
+    raise DaemonStopped(0)
+
+
+def create_daemon_socket(socket_path: Path) -> Optional[socket.socket]:
+    """
+    Create the listening socket of the daemon, replacing a stale socket file left behind by a stopped daemon.
+    :param socket_path: Path to the socket.
+    :return: Listening socket, or None if another daemon is listening on the socket already.
+    """
+    if socket_path.exists():
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe_socket:
+            try:
+                probe_socket.connect(str(socket_path))
+                return None
+            except OSError:
+                socket_path.unlink()
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Only allow the current user to connect
+    old_umask = os.umask(0o077)
+    try:
+        server_socket.bind(str(socket_path))
+    finally:
+        os.umask(old_umask)
+    server_socket.listen()
+    return server_socket
+
+
+def serve_requests(
+    server_socket: socket.socket, handler: Callable[[List[str]], int], max_requests: Optional[int] = None
+) -> None:
+    """
+    Serve makeshow requests one at a time, so the parsed Makefiles and coloring state stay warm in this process.
+    :param server_socket: Listening socket.
+    :param handler: Function running makeshow with the given argument list and returning its exit code.
+    :param max_requests: Number of requests to serve before returning, or None to serve forever.
+    """
+    num_requests = 0
+    while max_requests is None or num_requests < max_requests:
+        conn, _ = server_socket.accept()
+        with conn:
+            try:
+                handle_request(conn, handler)
+            except OSError:
+                pass  # NB: A client that disconnects early should never stop the daemon.
+        num_requests += 1
+
+
+def handle_request(conn: socket.socket, handler: Callable[[List[str]], int]) -> None:
+    """
+    Run makeshow for a single request and stream its output back to the client, or ask the client to run makeshow
+    locally if the daemon can't serve the request.
+    The request is a dict literal, written with ascii(), holding the argument list, the working directory and the
+    environment variables of the client, which are applied while the request is handled.
+    :param conn: Connection to the client.
+    :param handler: Function running makeshow with the given argument list and returning its exit code.
+    """
+    request_bytes = b""
+    while True:
+        chunk = conn.recv(65536)
+        if chunk == b"":
+            break
+        request_bytes += chunk
+    request = ast.literal_eval(request_bytes.decode("ascii"))
+
+    output = FramedOutput(conn)
+    stdout = FramedOutputStream(output, b"o")
+    stderr = FramedOutputStream(output, b"e")
+    old_cwd = os.getcwd()
+    old_environ = dict(os.environ)
+    try:
+        os.chdir(request["cwd"])
+        update_forwarded_env_vars(request["env"])
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            exit_code = run_handler(handler, request["argv"])
+    finally:
+        os.chdir(old_cwd)
+        os.environ.clear()
+        os.environ.update(old_environ)
+    if exit_code is None:
+        output.send(b"l", b"")
+    else:
+        output.send(b"x", str(exit_code).encode("utf-8"))
+    output.flush()
+
+
+def update_forwarded_env_vars(env: Dict[str, str]) -> None:
+    for name in list(os.environ):
+        if name.startswith(FORWARDED_ENV_VAR_PREFIXES):
+            del os.environ[name]
+    os.environ.update({name: value for name, value in env.items() if name.startswith(FORWARDED_ENV_VAR_PREFIXES)})
+
+
+def run_handler(handler: Callable[[List[str]], int], arg_list: List[str]) -> Optional[int]:
+    """
+    :param handler: Function running makeshow with the given argument list and returning its exit code.
+    :param arg_list: Argument list.
+    :return: Exit code, or None if the request has to be run locally.
+    """
+    try:
+        exit_code = handler(arg_list)
+    except DaemonStopped:
+        raise
+    except LocalRunRequested:
+        return None
+    except SystemExit as e:
+        # E.g. argparse exits on --help and on invalid arguments
+        if isinstance(e.code, str):
+            print(e.code, file=sys.stderr)
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception:
+        traceback.print_exc()
+        exit_code = 1
+    return exit_code if isinstance(exit_code, int) else 0
+
+
+########################################################################################################################
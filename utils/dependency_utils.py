@@ -5,48 +5,197 @@ Makeshow dependency resolver utils
 """
 
 import sys
-from typing import Dict, List, Optional
+from array import array
+from typing import Dict, Iterator, List, Set
 
 
 ########################################################################################################################
 
 
-def compute_dependency_chain_for_list_of_desired_targets(
-    desired_targets: List[str], all_target_dependencies: Dict[str, List[str]]
-) -> List[str]:
-    # Add dummy target that depends on all the desired targets
-    dummy_target = "____DUMMY____"
-    assert (
-        dummy_target not in all_target_dependencies.keys()
-    ), f"ERROR: Dummy target '{dummy_target}' found in Makefile."
-    extended_target_dependencies = all_target_dependencies.copy()  # NB: Shallow copy, so the lists are reused.
-    extended_target_dependencies[dummy_target] = desired_targets
-    dependency_chain_with_dummy = compute_dependency_chain(dummy_target, extended_target_dependencies)
-    assert dependency_chain_with_dummy[-1] == dummy_target
-    dependency_chain = dependency_chain_with_dummy[:-1]
-    assert dummy_target not in dependency_chain
-    return dependency_chain
+class DependencyGraph:
+    """
+    Compiled dependency graph of the targets of a Makefile.
+    Targets are numbered, and the edges are stored in compressed sparse row (CSR) arrays in both directions,
+    so the dependencies and the dependents of a target are found in time proportional to their number.
+    """
+
+    def __init__(self, all_target_dependencies: Dict[str, List[str]]) -> None:
+        # Number all targets, including prerequisites without a rule of their own
+        self.names: List[str] = list(all_target_dependencies.keys())
+        self.ids: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        for deps in all_target_dependencies.values():
+            for dep in deps:
+                if dep not in self.ids:
+                    self.ids[dep] = len(self.names)
+                    self.names.append(dep)
+        n = len(self.names)
+
+        # Forward edges, i.e. from each target to the targets it depends on
+        self.forward_offsets = array("l", [0])
+        self.forward_edges = array("l")
+        for name in self.names:
+            self.forward_edges.extend(self.ids[dep] for dep in all_target_dependencies.get(name, []))
+            self.forward_offsets.append(len(self.forward_edges))
+
+        # Reverse edges, i.e. from each target to the targets that depend on it, sorted using a counting sort
+        self.reverse_offsets = array("l", [0] * (n + 1))
+        for j in self.forward_edges:
+            self.reverse_offsets[j + 1] += 1
+        for j in range(n):
+            self.reverse_offsets[j + 1] += self.reverse_offsets[j]
+        self.reverse_edges = array("l", [0] * len(self.forward_edges))
+        next_slot = self.reverse_offsets[:-1]
+        for i in range(n):
+            for k in range(self.forward_offsets[i], self.forward_offsets[i + 1]):
+                j = self.forward_edges[k]
+                self.reverse_edges[next_slot[j]] = i
+                next_slot[j] += 1
+
+    def get_dependencies(self, target: str) -> List[str]:
+        """
+        :param target: Target name.
+        :return: The targets that the given target depends on directly.
+        """
+        i = self.ids.get(target)
+        if i is None:
+            return []
+        return [self.names[j] for j in self.forward_edges[self.forward_offsets[i] : self.forward_offsets[i + 1]]]
+
+    def get_dependents(self, target: str) -> List[str]:
+        """
+        :param target: Target name.
+        :return: The targets that depend directly on the given target.
+        """
+        i = self.ids.get(target)
+        if i is None:
+            return []
+        return [self.names[j] for j in self.reverse_edges[self.reverse_offsets[i] : self.reverse_offsets[i + 1]]]
+
+    def get_all_dependents(self, targets: List[str]) -> List[str]:
+        """
+        Find all targets that depend directly or indirectly on the given targets, nearest dependents first.
+        :param targets: Target names.
+        :return: The dependent targets, excluding the given targets.
+        """
+        start_ids = [self.ids[target] for target in targets if target in self.ids]
+        visited = set(start_ids)
+        queue = list(start_ids)
+        dependents: List[str] = []
+        for i in queue:
+            for j in self.reverse_edges[self.reverse_offsets[i] : self.reverse_offsets[i + 1]]:
+                if j not in visited:
+                    visited.add(j)
+                    queue.append(j)
+                    dependents.append(self.names[j])
+        return dependents
+
+    def is_reachable(self, target: str, from_target: str) -> bool:
+        """
+        :param target: Target name.
+        :param from_target: Target name.
+        :return: True if from_target depends directly or indirectly on target (or is target), otherwise False.
+        """
+        if target == from_target:
+            return True
+        i, goal = self.ids.get(from_target), self.ids.get(target)
+        if i is None or goal is None:
+            return False
+        visited = {i}
+        stack = [i]
+        while len(stack) > 0:
+            i = stack.pop()
+            for j in self.forward_edges[self.forward_offsets[i] : self.forward_offsets[i + 1]]:
+                if j == goal:
+                    return True
+                if j not in visited:
+                    visited.add(j)
+                    stack.append(j)
+        return False
+
+    def compute_dependency_chain(self, targets: List[str]) -> List[str]:
+        """
+        Compute the chain of the given targets and the targets they depend on, in depth-first post-order,
+        i.e. every target comes after its dependencies.
+        Dependencies on targets that were already visited, e.g. cycles, are dropped with a warning.
+        The graph is traversed iteratively, so deep chains do not hit the recursion limit, in linear time.
+        :param targets: Target names.
+        :return: Dependency chain.
+        """
+        return list(self.iter_dependency_chain(targets))
+
+    def iter_dependency_chain(self, targets: List[str]) -> Iterator[str]:
+        """
+        Stream the dependency chain of compute_dependency_chain, yielding each target as soon as it is resolved.
+        :param targets: Target names.
+        :return: Iterator over the dependency chain.
+        """
+        unknown_targets: Set[str] = set()
+        state = bytearray(len(self.names))  # 0: Not seen, 1: Being resolved, 2: Resolved
+        for target in targets:
+            # Targets that are not in the graph have no dependencies
+            x = self.ids.get(target)
+            if x is None:
+                if target in unknown_targets:
+                    warn_about_dropped_dependency(DUMMY_TARGET, target)
+                else:
+                    unknown_targets.add(target)
+                    yield target
+                continue
+            if state[x] != 0:
+                warn_about_dropped_dependency(DUMMY_TARGET, target)
+                continue
+            state[x] = 1
+            stack = [x]
+            positions = [self.forward_offsets[x]]
+            while len(stack) > 0:
+                i = stack[-1]
+                k = positions[-1]
+                end = self.forward_offsets[i + 1]
+                while k < end:
+                    j = self.forward_edges[k]
+                    k += 1
+                    if state[j] == 0:
+                        break
+                    warn_about_dropped_dependency(self.names[i], self.names[j])
+                else:
+                    # All dependencies of the target are resolved, so it can be added to the chain
+                    stack.pop()
+                    positions.pop()
+                    state[i] = 2
+                    yield self.names[i]
+                    continue
+                positions[-1] = k
+                state[j] = 1
+                stack.append(j)
+                positions.append(self.forward_offsets[j])
 
 
 ########################################################################################################################
 
 
-def compute_dependency_chain(x: str, dependencies: Dict[str, List[str]], seen: Optional[List[str]] = None) -> List[str]:
-    chain = []
-    if seen is None:
-        seen = []
-    seen.append(x)
-    for dep in dependencies.get(x, []):
-        if dep in seen:
-            sys.stderr.write(f"makeshow: Circular dependency dropped: {x} <- {dep} (meaning '{x}' requires '{dep}')\n")
-            continue
-        dep_chain = compute_dependency_chain(dep, dependencies, seen)
-        for y in dep_chain:
-            if y not in chain:
-                chain.append(y)
-    if x not in chain:
-        chain.append(x)
-    return chain
+# NB: Dependencies between the desired targets are reported as dependencies of this target, like when the desired
+#     targets were resolved as the dependencies of a dummy target.
+DUMMY_TARGET = "____DUMMY____"
+
+
+def warn_about_dropped_dependency(x: str, dep: str) -> None:
+    sys.stderr.write(f"makeshow: Circular dependency dropped: {x} <- {dep} (meaning '{x}' requires '{dep}')\n")
+
+
+def compute_dependency_chain_for_list_of_desired_targets(
+    desired_targets: List[str], all_target_dependencies: Dict[str, List[str]]
+) -> List[str]:
+    return DependencyGraph(all_target_dependencies).compute_dependency_chain(desired_targets)
+
+
+def compute_dependency_chain(x: str, dependencies: Dict[str, List[str]]) -> List[str]:
+    """
+    Compute the chain of targets that target x depends on, ending with x itself, in depth-first post-order.
+    :param x: Target name.
+    :param dependencies: Dependencies of each target.
+    :return: Dependency chain.
+    """
+    return DependencyGraph(dependencies).compute_dependency_chain([x])
 
 
 ########################################################################################################################
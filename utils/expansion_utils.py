@@ -0,0 +1,564 @@
+"""
+
+Makeshow variable expansion utils
+
+"""
+
+import dataclasses
+import glob
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .parsing_utils import MakefileIndex, get_rule
+from .tokenizing_utils import MakefileAssignment, MakefileDirective, iter_makefile_statements, skip_variable_reference
+from .tokenizing_utils import split_words
+
+
+########################################################################################################################
+
+
+# Automatic variables that are set for the recipe of a rule, see
+# https://www.gnu.org/software/make/manual/html_node/Automatic-Variables.html
+AUTOMATIC_VARIABLE_NAMES = frozenset(["@", "%", "<", "?", "^", "+", "|", "*"])
+CONDITIONAL_DIRECTIVE_NAMES = frozenset(["ifeq", "ifneq", "ifdef", "ifndef"])
+
+
+@dataclasses.dataclass
+class MakefileVariable:
+    __slots__ = ["recursive", "value"]
+    recursive: bool  # Whether the value is expanded whenever the variable is referenced, i.e. it was assigned with "="
+    value: str
+
+
+class VariableTable:
+    """
+    Table of the variables of a Makefile, which expands text like make does, but without running any commands.
+    Recursive variables are only expanded when they are referenced, and their values are memoized, so each variable is
+    expanded at most once however many recipes reference it. Values that depend on automatic variables or on the
+    arguments of "call" and "foreach" are not memoized.
+    References that can't be expanded offline, e.g. "$(shell ...)" unless allowed, and "$(eval ...)", are kept as is.
+    """
+
+    def __init__(self, base_dir: Path, allow_shell: bool = False) -> None:
+        """
+        :param base_dir: Folder that make would run in, for "$(wildcard ...)", "$(shell ...)" and "$(CURDIR)".
+        :param allow_shell: Whether "$(shell ...)" and "!=" assignments run their commands.
+        """
+        self.base_dir = base_dir
+        self.allow_shell = allow_shell
+        self.variables: Dict[str, MakefileVariable] = {
+            "CURDIR": MakefileVariable(False, str(base_dir.absolute())),
+            "MAKE": MakefileVariable(False, "make"),
+        }
+        self.target_assignments: Dict[str, List[MakefileAssignment]] = dict()
+        self.memo: Dict[str, str] = dict()
+        self.num_expansions = 0  # Number of expanded recursive variables, i.e. memo misses
+        self.automatic_variables: Dict[str, str] = dict()
+        self.local_scopes: List[Dict[str, str]] = []  # Arguments of "call" and "foreach" being expanded
+        self.context_reads = 0  # Number of references to automatic variables or arguments, see expand_variable
+        self.expanding: List[str] = []  # Recursive variables being expanded, to detect self-references
+
+    ####################################################################################################################
+
+    def read_lines(self, lines: Iterable[str]) -> None:
+        """
+        Define the variables assigned in the given Makefile lines, in order, skipping the branches of conditionals
+        that are false, like make does while reading a Makefile.
+        :param lines: Makefile lines, e.g. MakefileIndex.lines.
+        """
+        # Each open conditional holds whether its parent is active and whether one of its branches was taken
+        conditionals: List[Tuple[bool, bool]] = []
+        active = True
+        for statement in iter_makefile_statements(lines):
+            if isinstance(statement, MakefileDirective):
+                name, argument = statement.name, statement.argument
+                if name in CONDITIONAL_DIRECTIVE_NAMES:
+                    conditionals.append((active, False))
+                    active = active and self.evaluate_condition(name, argument)
+                    conditionals[-1] = (conditionals[-1][0], active)
+                elif name == "else" and len(conditionals) > 0:
+                    parent_active, taken = conditionals[-1]
+                    # NB: An "else" can be followed by another conditional, e.g. "else ifeq (...)".
+                    words = argument.split(None, 1)
+                    if len(words) > 0 and words[0] in CONDITIONAL_DIRECTIVE_NAMES:
+                        condition = parent_active and not taken
+                        active = condition and self.evaluate_condition(words[0], words[1] if len(words) > 1 else "")
+                    else:
+                        active = parent_active and not taken
+                    conditionals[-1] = (parent_active, taken or active)
+                elif name == "endif" and len(conditionals) > 0:
+                    active = conditionals.pop()[0]
+                elif name == "undefine" and active:
+                    self.variables.pop(self.expand(argument).strip(), None)
+                    self.memo.clear()
+            elif isinstance(statement, MakefileAssignment) and active:
+                if len(statement.targets) == 0:
+                    self.assign(statement)
+                else:
+                    for target in statement.targets:
+                        self.target_assignments.setdefault(target, []).append(statement)
+
+    def assign(self, assignment: MakefileAssignment) -> None:
+        name = self.expand(assignment.name).strip()
+        operator = assignment.operator
+        existing = self.variables.get(name)
+        if operator == "?=" and (existing is not None or name in os.environ):
+            return
+        if operator == "+=" and existing is not None:
+            if existing.recursive:
+                value = f"{existing.value} {assignment.value}" if existing.value != "" else assignment.value
+            else:
+                expanded_value = self.expand(assignment.value)
+                value = f"{existing.value} {expanded_value}" if existing.value != "" else expanded_value
+            variable = MakefileVariable(existing.recursive, value)
+        elif operator in (":=", "::=", ":::="):
+            variable = MakefileVariable(False, self.expand(assignment.value))
+        elif operator == "!=":
+            # NB: Without running the command, the variable holds the "$(shell ...)" reference it is equivalent to.
+            command = self.expand(assignment.value)
+            variable = MakefileVariable(True, self.run_shell(command) if self.allow_shell else f"$(shell {command})")
+        else:
+            variable = MakefileVariable(True, assignment.value)
+        self.variables[name] = variable
+        # NB: Memoized values may depend on the previous value, so they are only kept once all lines have been read.
+        self.memo.clear()
+
+    def get_target_table(self, target: str) -> "VariableTable":
+        """
+        :param target: Target name.
+        :return: Table with the target-specific variables of the target, or this table if it has none.
+        """
+        assignments = self.target_assignments.get(target)
+        if assignments is None:
+            return self
+        table = VariableTable(self.base_dir, self.allow_shell)
+        table.variables = dict(self.variables)
+        for assignment in assignments:
+            table.assign(assignment)
+        return table
+
+    ####################################################################################################################
+
+    def evaluate_condition(self, name: str, argument: str) -> bool:
+        if name in ("ifdef", "ifndef"):
+            variable_name = self.expand(argument).strip()
+            variable = self.variables.get(variable_name)
+            value = variable.value if variable is not None else os.environ.get(variable_name, "")
+            return (value != "") == (name == "ifdef")
+        operands = parse_conditional_operands(argument)
+        if operands is None:
+            return False
+        equal = self.expand(operands[0]) == self.expand(operands[1])
+        return equal == (name == "ifeq")
+
+    def expand(self, text: str) -> str:
+        """
+        Expand the variable and function references in the given text.
+        :param text: Makefile text, e.g. a recipe line.
+        :return: Expanded text.
+        """
+        if "$" not in text:
+            return text
+        parts: List[str] = []
+        pos = 0
+        while True:
+            dollar_pos = text.find("$", pos)
+            if dollar_pos < 0 or dollar_pos == len(text) - 1:
+                parts.append(text[pos:])
+                break
+            parts.append(text[pos:dollar_pos])
+            char = text[dollar_pos + 1]
+            if char == "$":
+                parts.append("$")
+                pos = dollar_pos + 2
+            elif char == "(" or char == "{":
+                end = skip_variable_reference(text, dollar_pos)
+                if text[end - 1] != (")" if char == "(" else "}"):
+                    parts.append(text[dollar_pos:])  # NB: An unterminated reference is kept as is.
+                    break
+                parts.append(self.expand_reference(text[dollar_pos + 2 : end - 1], text[dollar_pos:end]))
+                pos = end
+            else:
+                parts.append(self.expand_variable(char, text[dollar_pos : dollar_pos + 2]))
+                pos = dollar_pos + 2
+        return "".join(parts)
+
+    def expand_reference(self, inner: str, reference: str) -> str:
+        # A function call, i.e. a function name followed by whitespace and the arguments
+        words = inner.split(None, 1)
+        function = FUNCTIONS.get(words[0]) if len(words) > 0 and inner[len(words[0]) :][:1].isspace() else None
+        if function is not None:
+            num_args, func = function
+            args = split_function_args(words[1] if len(words) > 1 else "", num_args)
+            result = func(self, args)
+            return reference if result is None else result
+        # A substitution reference, e.g. "$(OBJS:.o=.c)" or "$(OBJS:%.o=%.c)"
+        colon_pos = find_top_level_char(inner, ":")
+        if colon_pos >= 0:
+            equals_pos = find_top_level_char(inner, "=", colon_pos)
+            if equals_pos >= 0:
+                value = self.expand_variable(self.expand(inner[:colon_pos]), reference)
+                pattern = self.expand(inner[colon_pos + 1 : equals_pos])
+                replacement = self.expand(inner[equals_pos + 1 :])
+                if "%" not in pattern:
+                    pattern, replacement = f"%{pattern}", f"%{replacement}"
+                return substitute_patterns(pattern, replacement, split_words(value))
+        return self.expand_variable(self.expand(inner), reference)
+
+    def expand_variable(self, name: str, reference: str) -> str:
+        """
+        :param name: Variable name.
+        :param reference: Reference to the variable, which is kept as is if its value isn't known offline.
+        :return: Value of the variable, or an empty string if it is not defined, like in make.
+        """
+        for scope in reversed(self.local_scopes):
+            if name in scope:
+                self.context_reads += 1
+                return scope[name]
+        if name[:1] in AUTOMATIC_VARIABLE_NAMES and (len(name) == 1 or name[1:] in ("D", "F")):
+            self.context_reads += 1
+            value = self.automatic_variables.get(name)
+            return reference if value is None else value
+        if name.isdigit():
+            self.context_reads += 1  # NB: E.g. "$(1)" outside of a "call", which depends on the caller.
+        memoized_value = self.memo.get(name)
+        if memoized_value is not None and len(self.local_scopes) == 0:
+            return memoized_value
+        variable = self.variables.get(name)
+        if variable is None:
+            return os.environ.get(name, "")
+        if not variable.recursive:
+            return variable.value
+        if name in self.expanding:
+            return reference  # NB: A variable referencing itself can't be expanded, make would stop with an error.
+        # Expand the value, and memoize it unless it depends on the context of the reference
+        self.expanding.append(name)
+        context_reads = self.context_reads
+        self.num_expansions += 1
+        value = self.expand(variable.value)
+        self.expanding.pop()
+        if self.context_reads == context_reads and len(self.local_scopes) == 0:
+            self.memo[name] = value
+        return value
+
+    def expand_with_scope(self, text: str, scope: Dict[str, str]) -> str:
+        self.local_scopes.append(scope)
+        try:
+            return self.expand(text)
+        finally:
+            self.local_scopes.pop()
+
+    def run_shell(self, command: str) -> str:
+        # NB: The subprocess module is only imported if commands are allowed to run.
+        import subprocess
+
+        result = subprocess.run(
+            ["/bin/sh", "-c", command], cwd=self.base_dir, stdout=subprocess.PIPE, universal_newlines=True
+        )
+        # Like make, remove the trailing newlines and replace the other newlines by spaces
+        return result.stdout.rstrip("\n").replace("\n", " ")
+
+
+########################################################################################################################
+
+
+def build_variable_table(lines: Iterable[str], base_dir: Path, allow_shell: bool = False) -> VariableTable:
+    """
+    :param lines: Makefile lines, e.g. MakefileIndex.lines.
+    :param base_dir: Folder of the Makefile.
+    :param allow_shell: Whether "$(shell ...)" and "!=" assignments run their commands.
+    :return: Table of the variables assigned in the lines.
+    """
+    table = VariableTable(base_dir, allow_shell)
+    table.read_lines(lines)
+    return table
+
+
+def expand_target_definition(table: VariableTable, index: MakefileIndex, target: str) -> str:
+    """
+    Expand the variables and functions in the definition of a target, with its automatic and target-specific variables.
+    :param table: Variable table of the Makefile.
+    :param index: Makefile index.
+    :param target: Target name.
+    :return: Expanded definition, or an empty string if the target is not found.
+    """
+    rule = get_rule(index, target)
+    if rule is None:
+        return ""
+    target_table = table.get_target_table(target)
+    target_name = target_table.expand(target)
+    prerequisites = split_words(target_table.expand(" ".join(rule.prerequisites)))
+    target_table.automatic_variables = {
+        "@": target_name,
+        "@D": os.path.dirname(target_name) or ".",
+        "@F": os.path.basename(target_name),
+        "<": prerequisites[0] if len(prerequisites) > 0 else "",
+        "^": " ".join(dict.fromkeys(prerequisites)),
+        "+": " ".join(prerequisites),
+    }
+    try:
+        # NB: Header lines are expanded with all variables defined too, while make expands them as they are read.
+        return "\n".join(target_table.expand(line) for line in rule.definition.split("\n"))
+    finally:
+        target_table.automatic_variables = dict()
+
+
+########################################################################################################################
+
+
+def parse_conditional_operands(argument: str) -> Optional[Tuple[str, str]]:
+    """
+    :param argument: Argument of "ifeq" or "ifneq", i.e. "(a,b)", "'a' 'b'" or '"a" "b"'.
+    :return: Tuple of the two (unexpanded) operands, or None if the argument has neither form.
+    """
+    argument = argument.strip()
+    if argument.startswith("(") and argument.endswith(")"):
+        comma_pos = find_top_level_char(argument[1:-1], ",")
+        if comma_pos < 0:
+            return None
+        return argument[1 : comma_pos + 1].strip(), argument[comma_pos + 2 : -1].strip()
+    operands: List[str] = []
+    rest = argument
+    while rest[:1] in ("'", '"') and len(operands) < 2:
+        end = rest.find(rest[0], 1)
+        if end < 0:
+            return None
+        operands.append(rest[1:end])
+        rest = rest[end + 1 :].lstrip()
+    return (operands[0], operands[1]) if len(operands) == 2 and rest == "" else None
+
+
+def find_top_level_char(text: str, char: str, start: int = 0) -> int:
+    """
+    :param text: Makefile text.
+    :param char: Character to find.
+    :param start: Position to start searching from.
+    :return: Position of the first occurrence of the character outside of parentheses and braces, or -1.
+    """
+    depth = 0
+    for i in range(start, len(text)):
+        c = text[i]
+        if c == "(" or c == "{":
+            depth += 1
+        elif c == ")" or c == "}":
+            depth -= 1
+        elif c == char and depth == 0:
+            return i
+    return -1
+
+
+def split_function_args(text: str, num_args: int) -> List[str]:
+    """
+    Split the arguments of a function on the commas outside of parentheses and braces.
+    :param text: Arguments of the function.
+    :param num_args: Maximum number of arguments, where the last argument holds any further commas, or 0 for no limit.
+    :return: Arguments.
+    """
+    args: List[str] = []
+    start = 0
+    while num_args == 0 or len(args) < num_args - 1:
+        comma_pos = find_top_level_char(text, ",", start)
+        if comma_pos < 0:
+            break
+        args.append(text[start:comma_pos])
+        start = comma_pos + 1
+    args.append(text[start:])
+    return args
+
+
+def match_pattern(pattern: str, word: str) -> Optional[str]:
+    """
+    :param pattern: Pattern with at most one "%", e.g. "%.c".
+    :param word: Word.
+    :return: The part of the word matched by the "%", or None if the word doesn't match the pattern.
+    """
+    percent_pos = pattern.find("%")
+    if percent_pos < 0:
+        return "" if word == pattern else None
+    prefix, suffix = pattern[:percent_pos], pattern[percent_pos + 1 :]
+    if len(word) < len(prefix) + len(suffix) or not word.startswith(prefix) or not word.endswith(suffix):
+        return None
+    return word[len(prefix) : len(word) - len(suffix)]
+
+
+def substitute_patterns(pattern: str, replacement: str, words: List[str]) -> str:
+    results: List[str] = []
+    for word in words:
+        stem = match_pattern(pattern, word)
+        if stem is None:
+            results.append(word)
+        elif "%" in replacement:
+            results.append(replacement.replace("%", stem, 1))
+        else:
+            results.append(replacement)
+    return " ".join(results)
+
+
+########################################################################################################################
+
+
+# Functions, see https://www.gnu.org/software/make/manual/html_node/Functions.html, which return None for calls that
+# are kept as is. Most functions take their arguments expanded, the others expand them as needed.
+
+
+def _expanded(func: Callable[..., str]) -> Callable[[VariableTable, List[str]], Optional[str]]:
+    return lambda table, args: func(*[table.expand(arg) for arg in args])
+
+
+def _word(n: str, text: str) -> str:
+    words = text.split()
+    i = int(n.strip()) if n.strip().isdigit() else 0
+    return words[i - 1] if 0 < i <= len(words) else ""
+
+
+def _wordlist(start: str, end: str, text: str) -> str:
+    words = text.split()
+    i = int(start.strip()) if start.strip().isdigit() else 1
+    j = int(end.strip()) if end.strip().isdigit() else 0
+    return " ".join(words[max(i, 1) - 1 : j])
+
+
+def _filter(patterns: str, text: str, keep: bool) -> str:
+    pattern_list = patterns.split()
+    return " ".join(w for w in text.split() if any(match_pattern(p, w) is not None for p in pattern_list) == keep)
+
+
+def _dir(text: str) -> str:
+    return " ".join(os.path.dirname(w) + "/" if "/" in w else "./" for w in text.split())
+
+
+def _suffix(text: str) -> str:
+    return " ".join(os.path.splitext(w)[1] for w in text.split() if os.path.splitext(w)[1] != "")
+
+
+def _join(a: str, b: str) -> str:
+    words_a, words_b = a.split(), b.split()
+    n = max(len(words_a), len(words_b))
+    words_a += [""] * (n - len(words_a))
+    words_b += [""] * (n - len(words_b))
+    return " ".join(x + y for x, y in zip(words_a, words_b))
+
+
+def _wildcard(table: VariableTable, args: List[str]) -> Optional[str]:
+    paths: List[str] = []
+    for pattern in table.expand(args[0]).split():
+        matches = glob.glob(os.path.join(str(table.base_dir), pattern))
+        paths += sorted(os.path.relpath(p, str(table.base_dir)) if not os.path.isabs(pattern) else p for p in matches)
+    return " ".join(paths)
+
+
+def _abspath(table: VariableTable, args: List[str], resolve: bool) -> Optional[str]:
+    paths = [table.base_dir / w for w in table.expand(args[0]).split()]
+    if resolve:
+        return " ".join(str(p.resolve()) for p in paths if p.exists())
+    return " ".join(os.path.normpath(str(p.absolute())) for p in paths)
+
+
+def _if(table: VariableTable, args: List[str]) -> Optional[str]:
+    if table.expand(args[0]).strip() != "":
+        return table.expand(args[1]) if len(args) > 1 else ""
+    return table.expand(args[2]) if len(args) > 2 else ""
+
+
+def _or(table: VariableTable, args: List[str]) -> Optional[str]:
+    for arg in args:
+        value = table.expand(arg).strip()
+        if value != "":
+            return value
+    return ""
+
+
+def _and(table: VariableTable, args: List[str]) -> Optional[str]:
+    value = ""
+    for arg in args:
+        value = table.expand(arg).strip()
+        if value == "":
+            return ""
+    return value
+
+
+def _foreach(table: VariableTable, args: List[str]) -> Optional[str]:
+    if len(args) < 3:
+        return None
+    name = table.expand(args[0]).strip()
+    words = table.expand(args[1]).split()
+    return " ".join(table.expand_with_scope(args[2], {name: word}) for word in words)
+
+
+def _call(table: VariableTable, args: List[str]) -> Optional[str]:
+    name = table.expand(args[0]).strip()
+    scope = {"0": name}
+    scope.update({str(i): table.expand(arg) for i, arg in enumerate(args[1:], start=1)})
+    variable = table.variables.get(name)
+    if variable is None:
+        return "" if name not in FUNCTIONS else None
+    return table.expand_with_scope(variable.value, scope) if variable.recursive else variable.value
+
+
+def _value(table: VariableTable, args: List[str]) -> Optional[str]:
+    variable = table.variables.get(table.expand(args[0]).strip())
+    return "" if variable is None else variable.value
+
+
+def _origin(table: VariableTable, args: List[str]) -> Optional[str]:
+    name = table.expand(args[0]).strip()
+    if name in table.variables:
+        return "file"
+    return "environment" if name in os.environ else "undefined"
+
+
+def _flavor(table: VariableTable, args: List[str]) -> Optional[str]:
+    variable = table.variables.get(table.expand(args[0]).strip())
+    if variable is None:
+        return "undefined"
+    return "recursive" if variable.recursive else "simple"
+
+
+def _shell(table: VariableTable, args: List[str]) -> Optional[str]:
+    return table.run_shell(table.expand(args[0])) if table.allow_shell else None
+
+
+# Maps each function name to its maximum number of arguments (0 for any number) and its implementation
+FUNCTIONS: Dict[str, Tuple[int, Callable[[VariableTable, List[str]], Optional[str]]]] = {
+    "subst": (3, _expanded(lambda a, b, text: text.replace(a, b))),
+    "patsubst": (3, _expanded(lambda a, b, text: substitute_patterns(a, b, text.split()))),
+    "strip": (1, _expanded(lambda text: " ".join(text.split()))),
+    "findstring": (2, _expanded(lambda a, text: a if a in text else "")),
+    "filter": (2, _expanded(lambda patterns, text: _filter(patterns, text, keep=True))),
+    "filter-out": (2, _expanded(lambda patterns, text: _filter(patterns, text, keep=False))),
+    "sort": (1, _expanded(lambda text: " ".join(sorted(set(text.split()))))),
+    "word": (2, _expanded(_word)),
+    "wordlist": (3, _expanded(_wordlist)),
+    "words": (1, _expanded(lambda text: str(len(text.split())))),
+    "firstword": (1, _expanded(lambda text: (text.split() or [""])[0])),
+    "lastword": (1, _expanded(lambda text: (text.split() or [""])[-1])),
+    "dir": (1, _expanded(_dir)),
+    "notdir": (1, _expanded(lambda text: " ".join(os.path.basename(w) for w in text.split()))),
+    "suffix": (1, _expanded(_suffix)),
+    "basename": (1, _expanded(lambda text: " ".join(os.path.splitext(w)[0] for w in text.split()))),
+    "addsuffix": (2, _expanded(lambda suffix, text: " ".join(w + suffix for w in text.split()))),
+    "addprefix": (2, _expanded(lambda prefix, text: " ".join(prefix + w for w in text.split()))),
+    "join": (2, _expanded(_join)),
+    "wildcard": (1, _wildcard),
+    "abspath": (1, lambda table, args: _abspath(table, args, resolve=False)),
+    "realpath": (1, lambda table, args: _abspath(table, args, resolve=True)),
+    "if": (3, _if),
+    "or": (0, _or),
+    "and": (0, _and),
+    "foreach": (3, _foreach),
+    "call": (0, _call),
+    "value": (1, _value),
+    "origin": (1, _origin),
+    "flavor": (1, _flavor),
+    "info": (1, lambda table, args: ""),
+    "warning": (1, lambda table, args: ""),
+    "shell": (1, _shell),
+    # NB: Functions with side effects on make itself, e.g. "$(eval ...)" and "$(error ...)", are kept as is.
+    "eval": (1, lambda table, args: None),
+    "error": (1, lambda table, args: None),
+    "file": (2, lambda table, args: None),
+}
+
+
+########################################################################################################################
@@ -0,0 +1,182 @@
+"""
+
+Makeshow memory-mapped Makefile utils
+
+"""
+
+import dataclasses
+import itertools
+import locale
+import mmap
+import re
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple, Union
+
+from .parsing_utils import INCLUDE_DIRECTIVE_PREFIXES, collapse_blank_lines, handle_backslashes, is_goal_target
+from .parsing_utils import parse_include_directive
+from .tokenizing_utils import MakefileDirective, MakefileRuleHeader, MakefileTokenizer
+
+
+########################################################################################################################
+
+
+# Matches the newline before every line that starts with something else than whitespace, i.e. every rule header
+NON_INDENTED_LINE_PATTERN = re.compile(rb"\n[^ \t\r\n][^\n]*")
+# Prefixes of the lines without a colon that are decoded, i.e. include directives and the lines around "define" bodies
+DECODED_LINE_PREFIXES = tuple(prefix.encode() for prefix in INCLUDE_DIRECTIVE_PREFIXES) + (
+    b"define",
+    b"endef",
+    b"export",
+    b"override",
+    b"private",
+)
+
+
+@dataclasses.dataclass
+class MmapMakefileIndex:
+    file_paths: List[Path]
+    targets: List[str]
+    spans: Dict[str, Tuple[int, int, int]]  # Maps each target to its file number and the byte span of its rule
+
+
+def build_mmap_makefile_index(makefile_path: Path) -> MmapMakefileIndex:
+    """
+    Index the rules of a Makefile and its (recursively) included files by byte offsets, without decoding the recipes.
+    :param makefile_path: Path to the Makefile.
+    :return: Byte-offset index, from which definitions are read with get_mmap_target_definition.
+    """
+    # Verify that the given file exists
+    if not makefile_path.is_file():
+        raise FileNotFoundError(f"Makefile not found: '{makefile_path}'")
+    index = MmapMakefileIndex(file_paths=[], targets=[], spans=dict())
+    _index_file(makefile_path, index, makefile_path.parent, [makefile_path.resolve()], dict())
+    return index
+
+
+def _index_file(
+    file_path: Path,
+    index: MmapMakefileIndex,
+    base_dir: Path,
+    include_stack: List[Path],
+    indexed_files: Dict[Path, List[Union[str, Tuple[bool, List[str]]]]],
+) -> None:
+    # Record the targets and include directives of the file, so it is only scanned once however often it is included
+    items: List[Union[str, Tuple[bool, List[str]]]] = []
+    indexed_files[include_stack[-1]] = items
+    file_number = len(index.file_paths)
+    index.file_paths.append(file_path)
+    with file_path.open("rb") as f:
+        if file_path.stat().st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # A rule spans from its header line to the next non-indented line, ignoring blank and indented lines
+            tokenizer = MakefileTokenizer()
+            open_targets: List[str] = []
+            for start, header in _iter_non_indented_lines(mm):
+                for target in open_targets:
+                    index.spans[target] = (file_number, index.spans[target][1], start)
+                open_targets = []
+                statement = tokenizer.feed(header, start)
+                directive = parse_include_directive(header) if isinstance(statement, MakefileDirective) else None
+                if directive is not None:
+                    items.append(directive)
+                    _index_included_files(file_path, directive, index, base_dir, include_stack, indexed_files)
+                    continue
+                if not isinstance(statement, MakefileRuleHeader):
+                    continue
+                for target in filter(is_goal_target, statement.targets):
+                    items.append(target)
+                    index.targets.append(target)
+                    if target not in index.spans:
+                        index.spans[target] = (file_number, start, len(mm))
+                        open_targets.append(target)
+
+
+def _index_included_files(
+    file_path: Path,
+    directive: Tuple[bool, List[str]],
+    index: MmapMakefileIndex,
+    base_dir: Path,
+    include_stack: List[Path],
+    indexed_files: Dict[Path, List[Union[str, Tuple[bool, List[str]]]]],
+) -> None:
+    optional, include_file_args = directive
+    for include_file_arg in include_file_args:
+        include_file_path = base_dir / include_file_arg
+        resolved_path = include_file_path.resolve()
+        if resolved_path in include_stack:
+            sys.stderr.write(f"makeshow: Circular include dropped: {file_path} <- {include_file_path}\n")
+            continue
+        items = indexed_files.get(resolved_path)
+        if items is None:
+            if not include_file_path.is_file():
+                if optional:
+                    continue
+                raise FileNotFoundError(f"Include file not found: '{include_file_path}'")
+            _index_file(include_file_path, index, base_dir, include_stack + [resolved_path], indexed_files)
+            continue
+        # Replay the targets and include directives of a file that has already been scanned
+        for item in items:
+            if isinstance(item, str):
+                index.targets.append(item)
+            else:
+                _index_included_files(
+                    include_file_path, item, index, base_dir, include_stack + [resolved_path], indexed_files
+                )
+
+
+def _iter_non_indented_lines(mm: mmap.mmap) -> Iterator[Tuple[int, str]]:
+    """
+    Find the non-indented logical lines of a memory-mapped file, only decoding lines that can be rule headers.
+    :param mm: Memory-mapped file.
+    :return: Iterator over the byte offset and the decoded line (or an empty string for lines that can't be headers,
+             directives or the start or end of a "define" body).
+    """
+    encoding = locale.getpreferredencoding(False)
+    # NB: Searching for a newline followed by a line is much faster than searching for multi-line "^" matches.
+    first_line = [] if mm[:1] in [b" ", b"\t", b"\r", b"\n"] else [(-1, mm.find(b"\n"))]
+    spans = itertools.chain(first_line, (match.span() for match in NON_INDENTED_LINE_PATTERN.finditer(mm)))
+    for start, end in spans:
+        start += 1
+        end = len(mm) if end < 0 else end
+        # Skip lines that continue the previous line
+        if mm[max(start - 2, 0) : start] == b"\\\n" or mm[max(start - 3, 0) : start] == b"\\\r\n":
+            continue
+        # Extend the line with the lines continuing it
+        while end < len(mm) and (mm[end - 1 : end] == b"\\" or mm[end - 2 : end] == b"\\\r"):
+            next_end = mm.find(b"\n", end + 1)
+            end = len(mm) if next_end < 0 else next_end
+        line_bytes = mm[start:end]
+        if b":" not in line_bytes and not line_bytes.startswith(DECODED_LINE_PREFIXES):
+            yield start, ""
+            continue
+        yield start, handle_backslashes(line_bytes.decode(encoding).replace("\r\n", "\n") + "\n").rstrip("\n")
+
+
+########################################################################################################################
+
+
+def get_mmap_target_definition(index: MmapMakefileIndex, target: str) -> str:
+    """
+    Read the definition of a target, decoding only the bytes of its rule.
+    :param index: Byte-offset index created by build_mmap_makefile_index.
+    :param target: Target name.
+    :return: Definition of the target or an empty string if the target is not found.
+    """
+    span = index.spans.get(target)
+    if span is None:
+        return ""
+    file_number, start, end = span
+    with index.file_paths[file_number].open("rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            text = mm[start:end].decode(locale.getpreferredencoding(False)).replace("\r\n", "\n")
+    lines = handle_backslashes(text).splitlines(keepends=False)
+    return "\n".join(collapse_blank_lines(lines)).strip("\n")
+
+
+def get_mmap_target_list_definitions(index: MmapMakefileIndex, targets: List[str]) -> Dict[str, str]:
+    return {target: get_mmap_target_definition(index, target) for target in targets if target in index.spans}
+
+
+########################################################################################################################
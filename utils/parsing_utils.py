@@ -5,83 +5,679 @@ Makeshow parsing utils
 """
 
 
+import bisect
+import dataclasses
+import sys
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .profiling_utils import profile_stage
+from .tokenizing_utils import MakefileRuleHeader, MakefileTokenizer, iter_makefile_statements, tokenize_line
+
+
+if TYPE_CHECKING:
+    import concurrent.futures
 
 
 ########################################################################################################################
 
 
+READ_CHUNK_SIZE = 1024 * 1024
+
+
 def load_lines_from_makefile_and_its_included_files(makefile_path: Path) -> List[str]:
-    # Load Makefile
-    original_lines = read_lines_and_handle_backslashes(makefile_path, err_msg="Makefile not found:")
-
-    # Handle include statements
-    lines = []
-    last_include_line = -1
-    for i, line in enumerate(original_lines):
-        if line.startswith("include "):
-            # First add the lines since last include line
-            lines.extend(original_lines[(last_include_line + 1) : i])
-            # Then gather lines from each include argument and add them
-            incl_args = line[len("include ") :].split(" ")
-            for include_file_arg in incl_args:
-                lines_to_add = load_lines_from_included_file(makefile_path, include_file_arg)
-                lines.append("")  # Add an empty line before the included lines
-                lines.extend(lines_to_add)
-                lines.append("")  # Add an empty line after the included lines
-            # Keep track of the last include line in order to add remaining original lines
-            last_include_line = i
-    # Add remaning original lines
-    lines.extend(original_lines[(last_include_line + 1) :])
-
-    # Append a potentially missing newline at the end
-    if len(lines) > 0 and lines[-1] != "":
-        lines.append("")
-
-    # Eliminate all instances of three or more consequitive newlines (to avoid excessive spacing)
-    text = "\n".join(lines)
-    while "\n\n\n" in text:
-        text = text.replace("\n\n\n", "\n\n")
-    lines = text.splitlines(keepends=False)
+    lines, _ = load_lines_and_include_graph(makefile_path)
     return lines
 
 
-def load_lines_from_included_file(makefile_path: Path, include_file: str) -> List[str]:
-    # Obtain path to the include file
-    include_file_path = makefile_path.parent / include_file
-    lines = read_lines_and_handle_backslashes(include_file_path, err_msg="Include file not found:")
-    return lines
+def load_lines_and_include_graph(makefile_path: Path) -> Tuple[List[str], Dict[Path, List[Path]]]:
+    """
+    Load the lines of a Makefile with the lines of its included files spliced in.
+    :param makefile_path: Path to the Makefile.
+    :return: Tuple of the lines and the include graph, mapping each loaded file to the files it includes.
+    """
+    include_graph: Dict[Path, List[Path]] = dict()
+    lines = list(iter_lines_from_makefile_and_its_included_files(makefile_path, include_graph))
+    return lines, include_graph
+
+
+def iter_lines_from_makefile_and_its_included_files(
+    makefile_path: Path,
+    include_graph: Optional[Dict[Path, List[Path]]] = None,
+    jobs: int = 1,
+    source_positions: bool = False,
+    file_stats: Optional[Dict[Path, Tuple[int, int]]] = None,
+) -> Iterator[str]:
+    """
+    Stream the lines of a Makefile with the lines of its included files spliced in and excessive blank lines removed.
+    Files are read line by line, so memory use is bounded by the longest (continued) line rather than the file size.
+    :param makefile_path: Path to the Makefile.
+    :param include_graph: Optional dict that is filled with the include graph while the lines are streamed.
+    :param jobs: Number of threads reading included files concurrently, or 1 to read them one after another.
+    :param source_positions: Whether to read the lines as SourceLine objects, see splice_included_files.
+    :param file_stats: Optional dict that is filled with the stats of the files read, see splice_included_files.
+    :return: Iterator over the lines.
+    """
+    spliced_lines = splice_included_files(
+        makefile_path, include_graph, jobs=jobs, source_positions=source_positions, file_stats=file_stats
+    )
+    return collapse_blank_lines(spliced_lines)
+
+
+INCLUDE_DIRECTIVES = {"include": False, "-include": True, "sinclude": True}  # Maps each directive to its optionality
+INCLUDE_DIRECTIVE_PREFIXES = tuple(INCLUDE_DIRECTIVES)
+
+
+def splice_included_files(
+    makefile_path: Path,
+    include_graph: Optional[Dict[Path, List[Path]]] = None,
+    jobs: int = 1,
+    source_positions: bool = False,
+    file_stats: Optional[Dict[Path, Tuple[int, int]]] = None,
+) -> Iterator[str]:
+    """
+    Stream the lines of a Makefile with the lines of its included files spliced in, recursively.
+    Included files are resolved relative to the folder of the Makefile, like make does when run from that folder.
+    Missing files of "-include" and "sinclude" directives are skipped, and includes that would form a cycle are
+    dropped with a warning.
+    Each included file is read once, and its lines are reused at every other place where it is included.
+    :param makefile_path: Path to the Makefile.
+    :param include_graph: Optional dict that is filled with the include graph while the lines are streamed.
+    :param jobs: Number of threads reading included files concurrently, or 1 to read them one after another.
+    :param source_positions: Whether to read the lines as SourceLine objects, which hold the file and line number they
+        were read from, except for the empty lines added around included files. The files are then read whole, one
+        after another.
+    :param file_stats: Optional dict that is filled with the modification time and size of each file read, keyed by
+        its resolved path, which are taken before the file is read, so a file changed while it is read never matches.
+    :return: Iterator over the lines.
+    """
+    include_stack = [makefile_path.resolve()]
+    graph = include_graph if include_graph is not None else dict()
+    if source_positions:
+        source_line_loader = SourceLineLoader(makefile_path.parent, file_stats)
+        source_lines = source_line_loader.read_file(makefile_path, err_msg="Makefile not found:")
+        return _splice_included_files(makefile_path, source_lines, source_line_loader, include_stack, graph)
+    record_file_stat(makefile_path, file_stats)
+    if jobs <= 1:
+        streamed_lines = iter_lines_and_handle_backslashes(makefile_path, err_msg="Makefile not found:")
+        loader = IncludedFileLoader(makefile_path.parent, file_stats)
+        return _splice_included_files(makefile_path, streamed_lines, loader, include_stack, graph)
+    # NB: The Makefile is read as a whole, so the files it includes can all be requested before splicing starts.
+    read_lines = read_lines_and_handle_backslashes(makefile_path, err_msg="Makefile not found:")
+    return _splice_included_files_in_parallel(makefile_path, read_lines, jobs, include_stack, graph, file_stats)
+
+
+def splice_loaded_files(
+    makefile_path: Path, loader: "IncludedFileLoader", include_graph: Dict[Path, List[Path]]
+) -> Iterator[str]:
+    """
+    Stream the lines of a Makefile with the lines of its included files spliced in, like splice_included_files,
+    but reading the Makefile through the given loader too, so no file is read again when splicing it again later.
+    :param makefile_path: Path to the Makefile.
+    :param loader: Loader of the Makefile and its included files, which keeps their lines.
+    :param include_graph: Dict that is filled with the include graph while the lines are streamed.
+    :return: Iterator over the lines.
+    """
+    resolved_path = makefile_path.resolve()
+    lines = loader.loaded_files.get(resolved_path)
+    if lines is None:
+        lines = loader.read_file(makefile_path, err_msg="Makefile not found:")
+        loader.loaded_files[resolved_path] = lines
+    return _splice_included_files(makefile_path, lines, loader, [resolved_path], include_graph)
+
+
+def _splice_included_files_in_parallel(
+    makefile_path: Path,
+    lines: List[str],
+    jobs: int,
+    include_stack: List[Path],
+    include_graph: Dict[Path, List[Path]],
+    file_stats: Optional[Dict[Path, Tuple[int, int]]] = None,
+) -> Iterator[str]:
+    # NB: The thread pool is imported here, as it is slow to import and only used to read included files in parallel.
+    import concurrent.futures
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="makeshow") as executor:
+        loader = ParallelIncludedFileLoader(makefile_path.parent, executor, file_stats)
+        loader.prefetch(lines)
+        yield from _splice_included_files(makefile_path, lines, loader, include_stack, include_graph)
+
+
+def _splice_included_files(
+    file_path: Path,
+    lines: Iterable[str],
+    loader: "IncludedFileLoader",
+    include_stack: List[Path],
+    include_graph: Dict[Path, List[Path]],
+) -> Iterator[str]:
+    # NB: A file that is included several times is only added to the include graph the first time.
+    included_file_paths: List[Path] = []
+    if file_path not in include_graph:
+        include_graph[file_path] = included_file_paths
+    for line in lines:
+        # NB: Checking the prefix first avoids a function call for most lines.
+        directive = parse_include_directive(line) if line.startswith(INCLUDE_DIRECTIVE_PREFIXES) else None
+        if directive is None:
+            yield line
+            continue
+        # Gather lines from each include argument and add them
+        optional, include_file_args = directive
+        for include_file_arg in include_file_args:
+            include_file_path = loader.base_dir / include_file_arg
+            included_file_paths.append(include_file_path)
+            resolved_path = include_file_path.resolve()
+            if resolved_path in include_stack:
+                sys.stderr.write(f"makeshow: Circular include dropped: {file_path} <- {include_file_path}\n")
+                continue
+            lines_to_add = loader.load(include_file_path, optional)
+            if lines_to_add is None:
+                continue
+            yield ""  # Add an empty line before the included lines
+            yield from _splice_included_files(
+                include_file_path, lines_to_add, loader, include_stack + [resolved_path], include_graph
+            )
+            yield ""  # Add an empty line after the included lines
+
+
+class IncludedFileLoader:
+    """
+    Loader of included files, which reads each file once and returns the same lines wherever it is included.
+    """
+
+    def __init__(self, base_dir: Path, file_stats: Optional[Dict[Path, Tuple[int, int]]] = None) -> None:
+        self.base_dir = base_dir
+        self.loaded_files: Dict[Path, List[str]] = dict()  # Keyed by resolved path, so each file is read once
+        self.file_stats = file_stats
+
+    def load(self, include_file_path: Path, optional: bool) -> Optional[List[str]]:
+        """
+        :param include_file_path: Path to the included file.
+        :param optional: Whether a missing file is skipped rather than raising a FileNotFoundError.
+        :return: Lines of the included file, or None if the file is optional and missing.
+        """
+        resolved_path = include_file_path.resolve()
+        lines = self.loaded_files.get(resolved_path)
+        if lines is None:
+            if optional and not include_file_path.is_file():
+                return None
+            with profile_stage("include_expansion"):
+                lines = self.read_file(include_file_path, err_msg="Include file not found:")
+            self.loaded_files[resolved_path] = lines
+        return lines
+
+    def read_file(self, file_path: Path, err_msg: str) -> List[str]:
+        record_file_stat(file_path, self.file_stats)
+        return self.read_lines(file_path, err_msg)
+
+    def read_lines(self, file_path: Path, err_msg: str) -> List[str]:
+        return read_lines_and_handle_backslashes(file_path, err_msg=err_msg)
+
+
+class SourceLineLoader(IncludedFileLoader):
+    """
+    Loader of included files, which reads their lines as SourceLine objects.
+    """
+
+    def read_lines(self, file_path: Path, err_msg: str) -> List[str]:
+        return read_source_lines_and_handle_backslashes(file_path, err_msg=err_msg)
+
+
+class HeaderLineLoader(IncludedFileLoader):
+    """
+    Loader of included files, which only keeps their non-indented lines, i.e. the rule headers, variable assignments
+    and directives, so their targets can be scanned without splicing their recipes.
+    """
+
+    def read_lines(self, file_path: Path, err_msg: str) -> List[str]:
+        return [line for line in iter_lines_and_handle_backslashes(file_path, err_msg=err_msg) if _is_block_start(line)]
+
+
+class ParallelIncludedFileLoader(IncludedFileLoader):
+    """
+    Loader of included files, which reads the files on a thread pool ahead of time.
+    Whenever a file has been read, the files it includes are requested too, so a whole tree of included files is read
+    concurrently, while the lines are still spliced in their original order.
+    """
+
+    def __init__(
+        self,
+        base_dir: Path,
+        executor: "concurrent.futures.Executor",
+        file_stats: Optional[Dict[Path, Tuple[int, int]]] = None,
+    ) -> None:
+        import threading
+
+        super().__init__(base_dir, file_stats)
+        self.executor = executor
+        self.futures: Dict[Path, "concurrent.futures.Future[List[str]]"] = dict()
+        self.lock = threading.Lock()
+
+    def prefetch(self, lines: List[str]) -> None:
+        for line in lines:
+            directive = parse_include_directive(line)
+            if directive is not None:
+                for include_file_arg in directive[1]:
+                    self._submit(self.base_dir / include_file_arg)
+
+    def load(self, include_file_path: Path, optional: bool) -> Optional[List[str]]:
+        future = self._submit(include_file_path)
+        try:
+            with profile_stage("include_expansion"):
+                return future.result()
+        except FileNotFoundError:
+            if optional:
+                return None
+            raise
+
+    def _submit(self, include_file_path: Path) -> "concurrent.futures.Future[List[str]]":
+        resolved_path = include_file_path.resolve()
+        with self.lock:
+            future = self.futures.get(resolved_path)
+            if future is None:
+                future = self.executor.submit(self._read, include_file_path)
+                self.futures[resolved_path] = future
+            return future
+
+    def _read(self, include_file_path: Path) -> List[str]:
+        lines = self.read_file(include_file_path, err_msg="Include file not found:")
+        self.prefetch(lines)
+        return lines
+
+
+def record_file_stat(file_path: Path, file_stats: Optional[Dict[Path, Tuple[int, int]]]) -> None:
+    if file_stats is None:
+        return
+    try:
+        stat = file_path.stat()
+    except OSError:
+        return  # NB: The missing file is reported when it is read.
+    file_stats[file_path.resolve()] = (stat.st_mtime_ns, stat.st_size)
+
+
+def parse_include_directive(line: str) -> Optional[Tuple[bool, List[str]]]:
+    """
+    Parse an "include", "-include" or "sinclude" directive.
+    :param line: Makefile line.
+    :return: Tuple of whether missing files are allowed and the included file names, or None for other lines.
+    """
+    if not line.startswith(INCLUDE_DIRECTIVE_PREFIXES):
+        return None
+    parts = line.split()
+    optional = INCLUDE_DIRECTIVES.get(parts[0])
+    if optional is None:
+        return None
+    return optional, parts[1:]
+
+
+def collapse_blank_lines(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Eliminate all instances of three or more consecutive newlines (to avoid excessive spacing), when the lines are
+    joined by newlines and terminated by a newline.
+    I.e. at most one empty line is kept between two non-empty lines, two at the beginning and none at the end.
+    :param lines: Lines.
+    :return: Iterator over the remaining lines.
+    """
+    pending_empty_lines = 0
+    max_empty_lines = 2
+    found_non_empty_line = False
+    for line in lines:
+        if line == "":
+            pending_empty_lines += 1
+            continue
+        if pending_empty_lines > 0:
+            yield from [""] * min(pending_empty_lines, max_empty_lines)
+            pending_empty_lines = 0
+        max_empty_lines = 1
+        found_non_empty_line = True
+        yield line
+    if found_non_empty_line:
+        yield from [""] * (min(pending_empty_lines, 2) - 1 if pending_empty_lines > 0 else 0)
+    else:
+        # NB: With no newline appended, the n empty lines are joined by n - 1 newlines.
+        yield from [""] * min(max(pending_empty_lines - 1, 0), 2)
 
 
 def read_lines_and_handle_backslashes(file_path: Path, err_msg: str = "File not found:") -> List[str]:
+    return list(iter_lines_and_handle_backslashes(file_path, err_msg=err_msg))
+
+
+def iter_lines_and_handle_backslashes(file_path: Path, err_msg: str = "File not found:") -> Iterator[str]:
+    """
+    Stream the lines of a file, joining lines continued by a backslash.
+    A backslash-newline followed by a tab is removed, and any other backslash-newline is replaced by a space.
+    The file is read in chunks that are cut after a newline, so memory use doesn't grow with the file size.
+    :param file_path: Path to the file.
+    :param err_msg: Error message for the FileNotFoundError raised if the file is not found.
+    :return: Iterator over the lines.
+    """
     # Verify that the given file exists
     if not file_path.is_file():
         raise FileNotFoundError(f"{err_msg} '{file_path}'")
+    return _iter_lines_and_handle_backslashes(file_path)
 
-    # Load all lines of the file
-    text = file_path.read_text()
 
-    # Handle backslashes
+def _iter_lines_and_handle_backslashes(file_path: Path) -> Iterator[str]:
+    with file_path.open() as f:
+        remainder = ""
+        while True:
+            chunk = f.read(READ_CHUNK_SIZE)
+            text = remainder + chunk
+            if chunk == "":
+                break
+            # Cut the text after the last newline that isn't continued, so no backslash-newline is cut in half.
+            # NB: Removing a backslash-newline-tab right before a newline can make that newline a continued one too.
+            # NB: The remainder holds no safe newline, so only newlines in the new chunk need to be searched.
+            cut = text.rfind("\n", len(remainder))
+            while cut > 0 and (text[cut - 1] == "\\" or text[cut - 3 : cut] == "\\\n\t"):
+                cut = text.rfind("\n", len(remainder), cut - 1)
+            if cut < 0:
+                remainder = text
+                continue
+            remainder = text[cut + 1 :]
+            yield from handle_backslashes(text[: cut + 1]).splitlines(keepends=False)
+        yield from handle_backslashes(text).splitlines(keepends=False)
+
+
+class SourceLine(str):
+    """
+    Makefile line, which also holds the path of the file it was read from and its line number in that file.
+    """
+
+    file_path: Path
+    line_number: int  # Line number of the first line, if the line was continued with backslashes
+
+
+def read_source_lines_and_handle_backslashes(file_path: Path, err_msg: str = "File not found:") -> List[str]:
+    """
+    Read the lines of a file like read_lines_and_handle_backslashes, but as SourceLine objects.
+    :param file_path: Path to the file.
+    :param err_msg: Error message for the FileNotFoundError raised if the file is not found.
+    :return: Lines.
+    """
+    if not file_path.is_file():
+        raise FileNotFoundError(f"{err_msg} '{file_path}'")
+    with file_path.open() as f:
+        text = f.read()
+    lines: List[str] = []
+    line_number = 1
+    start = 0
+    while start < len(text):
+        # Cut the text after the next newline that isn't continued, like _iter_lines_and_handle_backslashes does
+        cut = text.find("\n", start)
+        while cut > 0 and (text[cut - 1] == "\\" or text[cut - 3 : cut] == "\\\n\t"):
+            cut = text.find("\n", cut + 1)
+        end = cut + 1 if cut >= 0 else len(text)
+        for line in handle_backslashes(text[start:end]).splitlines(keepends=False):
+            source_line = SourceLine(line)
+            source_line.file_path = file_path
+            source_line.line_number = line_number
+            lines.append(source_line)
+        line_number += text.count("\n", start, end)
+        start = end
+    return lines
+
+
+def handle_backslashes(text: str) -> str:
     text = text.replace("\\\n\t", "")
     text = text.replace("\\\n", " ")
     # NB: This is backslash handling is not complete, but it covers all the cases that I've encountered in practice.
+    return text
 
-    # Split into lines and return them
-    lines = text.splitlines(keepends=False)
-    return lines
+
+########################################################################################################################
+
+
+@dataclasses.dataclass
+class MakefileRule:
+    target: str
+    start: int  # Index of the rule header line
+    end: int  # Index of the first line after the rule, i.e. the rule spans lines[start:end]
+    prerequisites: List[str]
+    recipe: List[str]
+    definition: str
+
+
+@dataclasses.dataclass
+class MakefileIndex:
+    lines: List[str]
+    targets: List[str]
+    target_line_numbers: List[int]  # Index of the line defining each target
+    rules: Dict[str, MakefileRule]
+    header_line_numbers: Dict[str, int]  # First rule header line of every target, including special targets
+    block_ends: Dict[int, int]  # Maps each non-indented line to the index of the first line after its block
+    define_spans: List[Tuple[int, int]]  # Lines of every "define" directive, up to the line after its "endef"
+    version: int = dataclasses.field(default=0, compare=False)  # Incremented by every update_makefile_index
+
+
+def build_makefile_index(lines: Iterable[str]) -> MakefileIndex:
+    """
+    Index the given Makefile lines in a single pass, recording targets, rule line spans, prerequisites and recipes.
+    :param lines: Makefile lines, e.g. streamed by iter_lines_from_makefile_and_its_included_files.
+    :return: Makefile index from which targets, definitions and dependencies can be looked up without rescanning.
+    """
+    return _scan_lines(lines)
+
+
+def _scan_lines(lines: Iterable[str]) -> MakefileIndex:
+    # Store streamed lines while indexing them, but reuse a given list of lines
+    stored_lines: List[str] = lines if isinstance(lines, list) else []
+    store_lines = stored_lines is not lines
+    targets: List[str] = []
+    target_line_numbers: List[int] = []
+    header_line_numbers: Dict[str, int] = dict()
+    block_ends: Dict[int, int] = dict()
+    rules: Dict[str, MakefileRule] = dict()
+    define_spans: List[Tuple[int, int]] = []
+    tokenizer = MakefileTokenizer()
+    block_start = -1
+    block_header: Optional[MakefileRuleHeader] = None
+    define_start = -1
+    for i, line in enumerate(lines):
+        if store_lines:
+            stored_lines.append(line)
+        # Indented and empty lines belong to the block of the preceding non-indented line
+        if line.startswith(" ") or line.startswith("\t") or line == "":
+            continue
+        if block_start >= 0:
+            block_ends[block_start] = i
+            if block_header is not None:
+                _add_rules(stored_lines, block_header, block_start, i, header_line_numbers, rules)
+        block_start = i
+        # Register the targets of rule headers, keeping only the first header of every target
+        statement = tokenizer.feed(line, i)
+        # Record where "define" directives open and close, as their bodies depend on the lines before them
+        if define_start < 0 and tokenizer.define is not None:
+            define_start = i
+        elif define_start >= 0 and tokenizer.define is None:
+            define_spans.append((define_start, i + 1))
+            define_start = -1
+        block_header = statement if isinstance(statement, MakefileRuleHeader) else None
+        if block_header is None:
+            continue
+        for target in block_header.targets:
+            header_line_numbers.setdefault(target, i)
+            if is_goal_target(target):
+                targets.append(target)
+                target_line_numbers.append(i)
+    if block_start >= 0:
+        block_ends[block_start] = len(stored_lines)
+        if block_header is not None:
+            _add_rules(stored_lines, block_header, block_start, len(stored_lines), header_line_numbers, rules)
+    if define_start >= 0:
+        define_spans.append((define_start, len(stored_lines)))
+    return MakefileIndex(
+        lines=stored_lines,
+        targets=targets,
+        target_line_numbers=target_line_numbers,
+        rules=rules,
+        header_line_numbers=header_line_numbers,
+        block_ends=block_ends,
+        define_spans=define_spans,
+    )
+
+
+def _add_rules(
+    lines: List[str],
+    header: MakefileRuleHeader,
+    start: int,
+    end: int,
+    header_line_numbers: Dict[str, int],
+    rules: Dict[str, MakefileRule],
+) -> None:
+    # Create the rules of the targets whose first header is the given one, as soon as the end of its block is known
+    for target in header.targets:
+        if header_line_numbers[target] == start and is_goal_target(target) and target not in rules:
+            rules[target] = _create_rule(lines, target, header, start, end)
+
+
+def _create_rule(lines: List[str], target: str, header: MakefileRuleHeader, start: int, end: int) -> MakefileRule:
+    return MakefileRule(
+        target=target,
+        start=start,
+        end=end,
+        prerequisites=header.prerequisites + header.order_only_prerequisites,
+        recipe=[line for line in lines[start + 1 : end] if line != ""],
+        definition="\n".join(lines[start:end]).strip("\n"),
+    )
+
+
+def is_goal_target(target: str) -> bool:
+    # NB: Targets starting with a dot, e.g. special targets like ".PHONY", are not shown as targets.
+    return not target.startswith(".")
+
+
+def _get_header_targets(line: str) -> List[str]:
+    statement = tokenize_line(line)
+    return statement.targets if isinstance(statement, MakefileRuleHeader) else []
+
+
+def _is_block_start(line: str) -> bool:
+    return line != "" and not line.startswith(" ") and not line.startswith("\t")
+
+
+def update_makefile_index(index: MakefileIndex, start: int, end: int, new_lines: List[str]) -> None:
+    """
+    Update an index in place after replacing the lines index.lines[start:end] by new_lines.
+    Only the blocks around the replaced lines are indexed again, the line numbers of the other blocks are shifted.
+    :param index: Makefile index created by build_makefile_index.
+    :param start: Index of the first replaced line.
+    :param end: Index of the first line after the replaced lines.
+    :param new_lines: Lines replacing the replaced lines.
+    """
+    lines = index.lines
+    # Extend the replaced lines to whole blocks, from the last block start before them to the first block start after
+    region_start = start - 1
+    while region_start > 0 and not _is_block_start(lines[region_start]):
+        region_start -= 1
+    region_start = max(region_start, 0)
+    region_end = end
+    while region_end < len(lines) and not _is_block_start(lines[region_end]):
+        region_end += 1
+    region = _scan_lines(lines[region_start:start] + new_lines + lines[end:region_end])
+    delta = len(new_lines) - (end - start)
+    new_region_end = region_end + delta
+    lines[start:end] = new_lines
+    index.version += 1
+    # NB: Whether a line belongs to the body of a "define" depends on all lines before it, so the region can't be
+    # indexed on its own once it touches a "define" directive, in which case the whole index is rebuilt.
+    if len(region.define_spans) > 0 or any(
+        define_start <= region_end and region_start <= define_end for define_start, define_end in index.define_spans
+    ):
+        rebuilt_index = _scan_lines(lines)
+        for field in dataclasses.fields(MakefileIndex):
+            if field.name != "version":
+                setattr(index, field.name, getattr(rebuilt_index, field.name))
+        return
+    index.define_spans = [
+        (define_start + delta, define_end + delta) if define_start >= region_end else (define_start, define_end)
+        for define_start, define_end in index.define_spans
+    ]
+
+    # Replace the targets of the region and shift the line numbers of the targets after it
+    i = bisect.bisect_left(index.target_line_numbers, region_start)
+    j = bisect.bisect_left(index.target_line_numbers, region_end)
+    index.targets[i:j] = region.targets
+    index.target_line_numbers[i:] = [region_start + n for n in region.target_line_numbers] + [
+        n + delta for n in index.target_line_numbers[j:]
+    ]
+
+    # Replace the blocks of the region and shift the blocks after it
+    block_ends = {b: e for b, e in index.block_ends.items() if b < region_start}
+    block_ends.update({region_start + b: region_start + e for b, e in region.block_ends.items()})
+    block_ends.update({b + delta: e + delta for b, e in index.block_ends.items() if b >= region_end})
+    index.block_ends = block_ends
+
+    # Replace the header names of the region, keeping the first occurrence of every name
+    header_line_numbers: Dict[str, int] = dict()
+    removed_names = []
+    for name, n in index.header_line_numbers.items():
+        if n < region_start:
+            header_line_numbers[name] = n
+        elif n >= region_end:
+            header_line_numbers[name] = n + delta
+        else:
+            removed_names.append(name)
+    for name, n in region.header_line_numbers.items():
+        existing = header_line_numbers.get(name)
+        if existing is None or existing >= new_region_end:
+            header_line_numbers[name] = region_start + n
+    # NB: A name that was removed from the region might occur again further down, which wasn't its first occurrence.
+    missing_names = {name for name in removed_names if name not in header_line_numbers}
+    if len(missing_names) > 0:
+        for b in sorted(b for b in block_ends if b >= new_region_end):
+            if any(define_start <= b < define_end for define_start, define_end in index.define_spans):
+                continue
+            for name in _get_header_targets(lines[b]):
+                if name in missing_names:
+                    header_line_numbers[name] = b
+                    missing_names.remove(name)
+            if len(missing_names) == 0:
+                break
+    index.header_line_numbers = header_line_numbers
+
+    # Keep the rules that are still defined by the same (possibly shifted) block, and create the missing ones
+    rules: Dict[str, MakefileRule] = dict()
+    for target, rule in index.rules.items():
+        if rule.start < region_start and header_line_numbers.get(target) == rule.start:
+            rules[target] = rule
+        elif rule.start >= region_end and header_line_numbers.get(target) == rule.start + delta:
+            rule.start += delta
+            rule.end += delta
+            rules[target] = rule
+    index.rules = rules
+    for target in index.targets:
+        get_rule(index, target)
+
+
+def get_rule(index: MakefileIndex, target: str) -> Optional[MakefileRule]:
+    """
+    Look up the rule of the given target in the index, or None if no line of the Makefile defines it.
+    :param index: Makefile index created by build_makefile_index.
+    :param target: Target name.
+    :return: Makefile rule or None.
+    """
+    rule = index.rules.get(target)
+    if rule is not None:
+        return rule
+    start = index.header_line_numbers.get(target)
+    if start is None:
+        return None
+    # NB: The header is tokenized again for rules that weren't created by the scan, e.g. after update_makefile_index.
+    header = tokenize_line(index.lines[start], start)
+    if not isinstance(header, MakefileRuleHeader):
+        return None
+    rule = _create_rule(index.lines, target, header, start, index.block_ends[start])
+    index.rules[target] = rule
+    return rule
 
 
 ########################################################################################################################
 
 
 def extract_targets_and_target_definitions(lines: List[str]) -> Tuple[List[str], Dict[str, str]]:
-    # TODO(jmb): Potentially parse properly, https://www.gnu.org/software/make/manual/html_node/Parsing-Makefiles.html
-    all_targets = find_targets(lines)
-    all_target_definitions = find_target_list_definitions(lines, all_targets)
-    # TODO(jmb): Optimize the extraction of target list and target definitions later to reduce looping through 'lines'.
-    # TODO(jmb): Test these functions on some test data (e.g. Makefile or two)
-    # TODO(jmb): Maybe only return all_target_definitions and obtain all_targets as list(all_target_definitions.keys())
+    index = build_makefile_index(lines)
+    all_targets = index.targets
+    all_target_definitions = get_target_list_definitions(index, all_targets)
     return all_targets, all_target_definitions
 
 
@@ -89,79 +685,99 @@ def extract_targets_and_target_definitions(lines: List[str]) -> Tuple[List[str],
 
 
 def find_target_list_dependencies(lines: List[str], targets: List[str]) -> Dict[str, List[str]]:
-    # TODO(jmb): Add tests of this function. And maybe optimize it to reduce looping through 'lines'.
-    target_dependencies: Dict[str, List[str]] = dict()
-    for target in targets:
-        target_dependencies[target] = find_single_target_dependencies(lines, target)
-    return target_dependencies
+    return get_target_list_dependencies(build_makefile_index(lines), targets)
 
 
 def find_single_target_dependencies(lines: List[str], target: str) -> List[str]:
-    dependency_list: List[str] = []
-    tail = ""
-    found = False
-    for line in lines:
-        if line.startswith(target + ":"):
-            tail = line[len(target + ":") :]
-            found = True
-        elif line.startswith(target + " :"):
-            tail = line[len(target + " :") :]
-            found = True
-        if found:
-            dependency_list = [t for t in tail.split(" ") if t != ""]
-            break
-    return dependency_list
+    return get_single_target_dependencies(build_makefile_index(lines), target)
+
+
+def get_target_list_dependencies(index: MakefileIndex, targets: List[str]) -> Dict[str, List[str]]:
+    return {target: get_single_target_dependencies(index, target) for target in targets}
+
+
+def get_single_target_dependencies(index: MakefileIndex, target: str) -> List[str]:
+    rule = get_rule(index, target)
+    return [] if rule is None else rule.prerequisites
 
 
 ########################################################################################################################
 
 
 def find_target_list_definitions(lines: List[str], targets: List[str]) -> Dict[str, str]:
-    target_definitions: Dict[str, str] = dict()
-    for target in targets:
-        target_definitions[target] = find_single_target_definition(lines, target)
-    return target_definitions
+    return get_target_list_definitions(build_makefile_index(lines), targets)
 
 
 def find_single_target_definition(lines: List[str], target: str) -> str:
-    definition = ""
-    include = False
-    for line in lines:
-        if line.startswith(target + ":"):
-            include = True
-            definition = line + "\n"
-        elif line.startswith(target + " :"):
-            include = True
-            definition = line + "\n"
-        elif include:
-            if line.startswith(" ") or line.startswith("\t") or line == "":
-                definition += line + "\n"
-            else:
-                break
-    return definition.strip("\n")
+    return get_single_target_definition(build_makefile_index(lines), target)
+
+
+def get_target_list_definitions(index: MakefileIndex, targets: List[str]) -> Dict[str, str]:
+    return {target: get_single_target_definition(index, target) for target in targets}
+
+
+def get_single_target_definition(index: MakefileIndex, target: str) -> str:
+    rule = get_rule(index, target)
+    return "" if rule is None else rule.definition
+
+
+def get_target_record(index: MakefileIndex, target: str) -> Dict[str, Any]:
+    """
+    Describe a target as a JSON-serializable record.
+    :param index: Makefile index.
+    :param target: Target name.
+    :return: Record with the target name, whether it was found, the file and line number defining it (or None if the
+        lines weren't loaded with their source positions), its prerequisites and its non-empty recipe lines.
+    """
+    rule = get_rule(index, target)
+    if rule is None:
+        return {"target": target, "found": False, "file": None, "line": None, "prerequisites": [], "recipe": []}
+    line = index.lines[rule.start]
+    source_line = line if isinstance(line, SourceLine) else None
+    return {
+        "target": target,
+        "found": True,
+        "file": None if source_line is None else str(source_line.file_path),
+        "line": None if source_line is None else source_line.line_number,
+        "prerequisites": rule.prerequisites,
+        "recipe": rule.recipe,
+    }
 
 
 ########################################################################################################################
 
 
-def find_targets(lines: List[str]) -> List[str]:
-    targets_and_blanks = [identify_target_in_line(line) for line in lines]
-    targets = [t for t in targets_and_blanks if t != ""]
+def scan_target_names(makefile_path: Path, include_graph: Optional[Dict[Path, List[Path]]] = None) -> List[str]:
+    """
+    Find the target names of a Makefile and its included files with a header-only scan, which skips the recipes and
+    doesn't index the rules, e.g. for shell completion.
+    :param makefile_path: Path to the Makefile.
+    :param include_graph: Optional dict that is filled with the include graph while the files are scanned.
+    :return: Target names in the order of their first definition, like the targets of build_makefile_index without
+             duplicates.
+    """
+    loader = HeaderLineLoader(makefile_path.parent)
+    lines = loader.read_lines(makefile_path, err_msg="Makefile not found:")
+    graph = include_graph if include_graph is not None else dict()
+    header_lines = _splice_included_files(makefile_path, lines, loader, [makefile_path.resolve()], graph)
+    return list(dict.fromkeys(find_targets(header_lines)))
+
+
+def find_targets(lines: Iterable[str]) -> List[str]:
+    """
+    :param lines: Makefile lines.
+    :return: Targets of the rule headers, in their order, i.e. like the targets of build_makefile_index.
+    """
+    targets: List[str] = []
+    # NB: Like in build_makefile_index, indented lines are part of the preceding block rather than headers.
+    for statement in iter_makefile_statements(filter(_is_block_start, lines)):
+        if isinstance(statement, MakefileRuleHeader):
+            targets += [target for target in statement.targets if is_goal_target(target)]
     return targets
 
 
-def identify_target_in_line(line: str) -> str:
-    parts = line.split(" ")
-    first = parts[0]
-    if first.startswith("."):
-        target = ""
-    elif first.endswith(":"):
-        target = first[:-1]
-    elif len(parts) >= 2 and parts[1] == ":":
-        target = first
-    else:
-        target = ""
-    return target
+def identify_targets_in_line(line: str) -> List[str]:
+    return [target for target in _get_header_targets(line) if is_goal_target(target)]
 
 
 ########################################################################################################################
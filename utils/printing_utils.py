@@ -6,7 +6,19 @@ Makeshow printing utils
 
 import sys
 from pathlib import Path
-from typing import Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .coloring_utils import color_texts
+
+
+########################################################################################################################
+
+
+# Color of the matches highlighted by print_grep_results, i.e. bold red like the default of "grep --color"
+GREP_MATCH_COLOR = "\033[1;31m"
+RESET_COLOR = "\033[0m"
+# Maximum number of target definitions colored and written at once by stream_target_definitions
+MAX_STREAM_BATCH_SIZE = 256
 
 
 ########################################################################################################################
@@ -29,12 +41,15 @@ def banner_string() -> str:
 
 
 def print_banner() -> None:
-    print(banner_string())
+    sys.stdout.write(banner_string() + "\n")
 
 
 def print_list(my_list: List[str], sep: str = "*") -> None:
-    print(f"{sep} ", end="")
-    print(f"\n{sep} ".join(my_list))
+    sys.stdout.write(format_list(my_list, sep=sep))
+
+
+def format_list(my_list: List[str], sep: str = "*") -> str:
+    return f"{sep} " + f"\n{sep} ".join(my_list) + "\n"
 
 
 def print_usage(
@@ -42,26 +57,30 @@ def print_usage(
     all_targets: Optional[List[str]] = None,
     coloring_func: Optional[Callable[[str], str]] = None,
 ) -> None:
-    print("Usage: python makeshow.py <target_name> [<target_name> ...]")
-    print("")
-    print("This will print the definition of the provided Makefile targets.")
-    print("")
-    print("Highlighted options:")
-    print("* Add -d to also print the definitions of the targets that the provided targets depend on.")
-    print("* Use -s to print the entire Makefile (including includes) instead of specific targets.")
+    # NB: The usage is rendered into a single string and written at once, which is faster than a print per line.
+    usage_lines = [
+        "Usage: python makeshow.py <target_name> [<target_name> ...]",
+        "",
+        "This will print the definition of the provided Makefile targets.",
+        "",
+        "Highlighted options:",
+        "* Add -d to also print the definitions of the targets that the provided targets depend on.",
+        "* Add -r to also print the definitions of the targets that depend on the provided targets.",
+        "* Use -s to print the entire Makefile (including includes) instead of specific targets.",
+    ]
     if coloring_func is None:
-        print("* Install 'pygments' to show Makefile contents and targets in color.")
+        usage_lines.append("* Install 'pygments' to show Makefile contents and targets in color.")
     else:
-        print("* Makefile targets will be shown in color now that 'pygments' in installed. Use -n to disable coloring.")
-    print("")
+        usage_lines.append(
+            "* Makefile targets will be shown in color now that 'pygments' in installed. Use -n to disable coloring."
+        )
+    usage_lines.append("")
     if makefile_path is not None:
-        print("Makefile:")
-        print(f"  {makefile_path.absolute()}")
-        print("")
+        usage_lines += ["Makefile:", f"  {makefile_path.absolute()}", ""]
+    usage = "\n".join(usage_lines) + "\n"
     if all_targets is not None:
-        print("Targets found in Makefile:")
-        print_list(all_targets)
-        print("")
+        usage += "Targets found in Makefile:\n" + format_list(all_targets) + "\n"
+    sys.stdout.write(usage)
 
 
 def print_makefile_not_found_error(makefile_path: Path) -> None:
@@ -73,16 +92,43 @@ def print_makefile_not_found_error(makefile_path: Path) -> None:
     )
 
 
+def print_tree_dir_not_found_error(tree_dir: Path) -> None:
+    print(f'ERROR: Folder not found:\n  "{tree_dir.resolve()}"\n', file=sys.stderr)
+    print("Please use `--tree` to specify a folder containing Makefiles.\n", file=sys.stderr)
+
+
+def print_tree_targets(tree_dir: Path, num_makefiles: int, target_files: Dict[str, List[str]]) -> None:
+    output = f"Folder:\n  {tree_dir.absolute()}\n\nTargets found in {num_makefiles} Makefiles:\n"
+    if len(target_files) > 0:
+        output += format_list([f"{target}  ({', '.join(rel_paths)})" for target, rel_paths in target_files.items()])
+    sys.stdout.write(output + "\n")
+
+
+def print_search_results(substring: str, matching_targets: List[str]) -> None:
+    output = f"Targets matching '{substring}' found in Makefile:\n"
+    output += format_list(matching_targets) if len(matching_targets) > 0 else "(None)\n"
+    sys.stdout.write(output + "\n")
+
+
+def print_grep_results(pattern: str, matching_lines: Dict[str, List[str]], highlight: bool = True) -> None:
+    output = f"Targets with definitions containing '{pattern}' found in Makefile:\n\n"
+    for target, lines in matching_lines.items():
+        if highlight and pattern != "":
+            lines = [line.replace(pattern, f"{GREP_MATCH_COLOR}{pattern}{RESET_COLOR}") for line in lines]
+        output += f"* {target}\n" + "".join(f"{line}\n" for line in lines) + "\n"
+    if len(matching_lines) == 0:
+        output += "(None)\n\n"
+    sys.stdout.write(output)
+
+
 def print_entire_makefile(lines: List[str], coloring_func: Optional[Callable[[str], str]]) -> None:
     # Make sure there is exactly one newline before and after the actual makefile contents
     makefile_contents = "\n".join(lines).strip("\n")
     # Print makefile contents, possibly in color
-    print("")
     if coloring_func is not None:
-        print(coloring_func(makefile_contents))
-    else:
-        print(makefile_contents)
-    print("")
+        makefile_contents = coloring_func(makefile_contents)
+    # NB: The contents are written without concatenating them, which would copy the entire Makefile once more.
+    sys.stdout.writelines(["\n", makefile_contents, "\n\n"])
 
 
 ########################################################################################################################
@@ -91,14 +137,17 @@ def print_entire_makefile(lines: List[str], coloring_func: Optional[Callable[[st
 def print_target_definition(
     target_definition: str, desired_target: str, coloring_func: Optional[Callable[[str], str]] = None
 ) -> None:
-    if target_definition != "":
-        if coloring_func is not None:
-            print(coloring_func(target_definition))
-            # print_target_definition_in_color(target_definition)
-        else:
-            print(target_definition)
-    else:
-        print(f"Target '{desired_target}' not found in Makefile.")
+    sys.stdout.write(format_target_definition(target_definition, desired_target, coloring_func=coloring_func))
+
+
+def format_target_definition(
+    target_definition: str, desired_target: str, coloring_func: Optional[Callable[[str], str]] = None
+) -> str:
+    if target_definition == "":
+        return f"Target '{desired_target}' not found in Makefile.\n"
+    if coloring_func is not None:
+        target_definition = coloring_func(target_definition)
+    return target_definition + "\n"
 
 
 def print_target_definitions(
@@ -106,13 +155,148 @@ def print_target_definitions(
     targets_to_show: List[str],
     sep: str = "",
     coloring_func: Optional[Callable[[str], str]] = None,
+    suggestions: Optional[Dict[str, List[str]]] = None,
 ) -> None:
-    print(sep)
-    for target in targets_to_show:
-        target_definition = all_target_definitions.get(target, f"(No definition found for target '{target}')")
-        print_target_definition(target_definition, target, coloring_func=coloring_func)
-        print(sep)
-    return
+    target_definitions = [
+        (target, all_target_definitions.get(target, f"(No definition found for target '{target}')"))
+        for target in targets_to_show
+    ]
+    # Render all the definitions, separated by sep, and write them at once rather than with two prints per target
+    output = sep + "\n" + format_target_definition_batch(target_definitions, sep, coloring_func, suggestions)
+    sys.stdout.write(output)
+
+
+def format_target_definition_batch(
+    target_definitions: List[Tuple[str, str]],
+    sep: str = "",
+    coloring_func: Optional[Callable[[str], str]] = None,
+    suggestions: Optional[Dict[str, List[str]]] = None,
+) -> str:
+    # Color all the found target definitions in one batch
+    colored_definitions = iter(color_texts([d for _, d in target_definitions if d != ""], coloring_func))
+    output_parts = []
+    for target, target_definition in target_definitions:
+        if target_definition != "":
+            target_definition = next(colored_definitions)
+        output_parts.append(format_target_definition(target_definition, target))
+        suggested_targets = suggestions.get(target, []) if suggestions is not None else []
+        if len(suggested_targets) > 0:
+            output_parts.append(f"Did you mean: {', '.join(suggested_targets)}?\n")
+        output_parts.append(sep + "\n")
+    return "".join(output_parts)
+
+
+def stream_target_definitions(
+    target_definitions: Iterable[Tuple[str, str]],
+    sep: str = "",
+    coloring_func: Optional[Callable[[str], str]] = None,
+    suggestions: Optional[Dict[str, List[str]]] = None,
+) -> None:
+    """
+    Print target definitions while they are produced, e.g. while the dependency chain is resolved, in the same format
+    as print_target_definitions.
+    With a coloring function, the definitions are colored and written by a background thread, in batches of the
+    definitions produced since the previous batch, so producing the next definitions overlaps with coloring the
+    previous ones, and the first definitions are shown before the last ones are produced.
+    :param target_definitions: Pairs of a target and its definition, or an empty string if it is not found.
+    :param sep: Separator line, printed before and after each definition.
+    :param coloring_func: Coloring function or None to print the definitions uncolored.
+    :param suggestions: Suggested target names for the targets that are not found.
+    """
+    # NB: The stream is looked up once, so the background thread writes to the stdout of the caller, e.g. the daemon.
+    stream = sys.stdout
+    stream.write(sep + "\n")
+    stream.flush()
+    if coloring_func is None:
+        for batch in iter_growing_batches(target_definitions, MAX_STREAM_BATCH_SIZE):
+            stream.write(format_target_definition_batch(batch, sep, None, suggestions))
+            stream.flush()
+        return
+
+    # NB: The threading modules are imported here, as they are only needed to stream colored definitions.
+    import queue
+    import threading
+
+    pending: "queue.SimpleQueue[Optional[Tuple[str, str]]]" = queue.SimpleQueue()
+    errors: List[BaseException] = []
+
+    def _color_and_write_pending_definitions() -> None:
+        batch_size = 1
+        is_done = False
+        while not is_done:
+            # Wait for the next definition, and take the ones produced meanwhile too, up to the batch size
+            batch: List[Tuple[str, str]] = []
+            target_definition = pending.get()
+            while target_definition is not None:
+                batch.append(target_definition)
+                if len(batch) >= batch_size or pending.empty():
+                    break
+                target_definition = pending.get()
+            # NB: None marks the end of the definitions.
+            is_done = target_definition is None
+            # NB: The first batches are small, so the first definitions are shown without waiting to color many more.
+            batch_size = min(2 * batch_size, MAX_STREAM_BATCH_SIZE)
+            if len(errors) == 0 and len(batch) > 0:
+                try:
+                    stream.write(format_target_definition_batch(batch, sep, coloring_func, suggestions))
+                    stream.flush()
+                except BaseException as e:  # NB: E.g. a closed pipe, which is raised again in the calling thread.
+                    errors.append(e)
+
+    worker = threading.Thread(target=_color_and_write_pending_definitions, name="makeshow-output", daemon=True)
+    worker.start()
+    try:
+        for target_definition in target_definitions:
+            if len(errors) > 0:
+                break
+            pending.put(target_definition)
+    except BaseException as e:
+        errors.append(e)  # NB: E.g. Ctrl+C, so the pending definitions are dropped rather than colored.
+    finally:
+        pending.put(None)
+        worker.join()
+    if len(errors) > 0:
+        raise errors[0]
+
+
+def iter_growing_batches(items: Iterable[Tuple[str, str]], max_batch_size: int) -> Iterator[List[Tuple[str, str]]]:
+    """
+    Split items into batches of 1, 2, 4, etc. items, up to the maximum batch size, while the items are produced.
+    :param items: Items.
+    :param max_batch_size: Maximum number of items per batch.
+    :return: Iterator over the batches.
+    """
+    batch: List[Tuple[str, str]] = []
+    batch_size = 1
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+            batch_size = min(2 * batch_size, max_batch_size)
+    if len(batch) > 0:
+        yield batch
+
+
+########################################################################################################################
+
+
+def print_target_records(records: Iterable[Dict[str, Any]], output_format: str) -> None:
+    """
+    Print target records as a JSON array, or as newline-delimited JSON (NDJSON) with one record per line.
+    NDJSON records are printed and flushed one by one while the given records are produced, so consumers can process
+    the first records before the last ones are resolved.
+    :param records: Target records, e.g. from get_target_record.
+    :param output_format: Either "json" or "ndjson".
+    """
+    import json
+
+    if output_format == "ndjson":
+        for record in records:
+            print(json.dumps(record))
+            sys.stdout.flush()
+    else:
+        print(json.dumps(list(records), indent=2))
 
 
 ########################################################################################################################
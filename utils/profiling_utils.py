@@ -0,0 +1,210 @@
+"""
+
+Makeshow profiling utils
+
+"""
+
+import contextlib
+import dataclasses
+import io
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+
+
+########################################################################################################################
+
+
+@dataclasses.dataclass
+class StageProfile:
+    calls: int = 0
+    wall_time: float = 0.0  # Total wall time of all calls in seconds
+    peak_memory: int = 0  # Peak memory in bytes, see Profiler
+
+
+class Profiler:
+    """
+    Recorder of the wall time and peak memory of each stage of a makeshow run, and of counts such as the number of
+    lines and targets.
+    Stages are recorded by profile_stage while the profiler is active, and may be nested, in which case they are named
+    by their path, e.g. "loading/include_expansion", and their time is included in the time of the enclosing stage.
+    Stages are nested per thread, so a stage of a background thread, e.g. highlighting the streamed output, is named
+    from the outermost stage of that thread.
+    The peak memory of a stage is the maximum resident set size of the process at the end of the stage, or with
+    trace_memory, the peak size of the memory allocated by Python during the stage, as traced by tracemalloc.
+    """
+
+    def __init__(self, trace_memory: bool = False, cprofile_path: Optional[Path] = None) -> None:
+        self.trace_memory = trace_memory
+        self.cprofile_path = cprofile_path
+        self.stages: Dict[str, StageProfile] = dict()
+        self.counts: Dict[str, int] = dict()
+        self._stacks: Dict[int, List[str]] = dict()  # Names of the enclosing stages, by thread
+        self._peaks: Dict[int, List[int]] = dict()  # Traced peak memory of each enclosing stage, before nested stages
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        # NB: The threading and tracemalloc modules are imported on first use, as this module is imported by every run,
+        #     even unprofiled.
+        import threading
+        import tracemalloc
+
+        stack = self._stacks.setdefault(threading.get_ident(), [])
+        peaks = self._peaks.setdefault(threading.get_ident(), [])
+        path = "/".join(stack + [name])
+        # NB: The stage is registered when entered, so enclosing stages are listed before their nested stages.
+        self.stages.setdefault(path, StageProfile())
+        if self.trace_memory and len(peaks) > 0:
+            peaks[-1] = max(peaks[-1], tracemalloc.get_traced_memory()[1])
+        self._reset_traced_memory_peak()
+        stack.append(name)
+        peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - start
+            stack.pop()
+            peak_memory = max(peaks.pop(), tracemalloc.get_traced_memory()[1]) if self.trace_memory else 0
+            if self.trace_memory and len(peaks) > 0:
+                peaks[-1] = max(peaks[-1], peak_memory)
+            self._reset_traced_memory_peak()
+            self.record_stage(path, wall_time, peak_memory if self.trace_memory else get_max_rss())
+
+    def record_stage(self, path: str, wall_time: float, peak_memory: int) -> None:
+        stage = self.stages.setdefault(path, StageProfile())
+        stage.calls += 1
+        stage.wall_time += wall_time
+        stage.peak_memory = max(stage.peak_memory, peak_memory)
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    @contextlib.contextmanager
+    def activate(self) -> Iterator[None]:
+        """
+        Make this the profiler recording the stages of profile_stage, and count the bytes printed to stdout.
+        With a cProfile path, the activated code is also profiled by cProfile, and its statistics are written to the
+        path when deactivated.
+        """
+        import tracemalloc
+
+        global _active_profiler
+        previous_profiler = _active_profiler
+        _active_profiler = self
+        stdout = ByteCountingStream(sys.stdout)
+        cprofile: Any = None
+        if self.cprofile_path is not None:
+            import cProfile
+
+            cprofile = cProfile.Profile()
+        start_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if start_tracing:
+            tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(stdout):
+                if cprofile is not None:
+                    cprofile.enable()
+                try:
+                    yield
+                finally:
+                    if cprofile is not None:
+                        cprofile.disable()
+        finally:
+            _active_profiler = previous_profiler
+            if start_tracing:
+                tracemalloc.stop()
+            self.count("bytes_printed", stdout.num_bytes)
+            if cprofile is not None:
+                cprofile.dump_stats(self.cprofile_path)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stages": {path: dataclasses.asdict(stage) for path, stage in self.stages.items()},
+            "counts": dict(self.counts),
+            "peak_memory": "tracemalloc" if self.trace_memory else "max_rss",
+        }
+
+    def format_summary(self) -> str:
+        memory_header = "peak traced" if self.trace_memory else "max RSS"
+        width = max([len("stage")] + [2 * path.count("/") + len(path.split("/")[-1]) for path in self.stages])
+        summary_lines = [
+            "makeshow profile:",
+            f"  {'stage':<{width}}  {'calls':>5}  {'wall time':>11}  {memory_header:>11}",
+        ]
+        for path, stage in self.stages.items():
+            name = "  " * path.count("/") + path.split("/")[-1]
+            summary_lines.append(
+                f"  {name:<{width}}  {stage.calls:>5}  {1000 * stage.wall_time:>8.2f} ms"
+                f"  {stage.peak_memory / 2**20:>8.1f} MB"
+            )
+        summary_lines.append("  " + ", ".join(f"{name}: {value}" for name, value in self.counts.items()))
+        return "\n".join(summary_lines)
+
+    def _reset_traced_memory_peak(self) -> None:
+        import tracemalloc
+
+        # NB: Before Python 3.9, the traced peak can't be reset, so it is the peak since the profiler was activated.
+        if self.trace_memory and hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+
+
+class ByteCountingStream(io.TextIOBase):
+    def __init__(self, stream: TextIO) -> None:
+        super().__init__()
+        self.stream = stream
+        self.num_bytes = 0
+
+    def write(self, text: str) -> int:
+        self.num_bytes += len(text.encode("utf-8"))
+        return self.stream.write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+def get_max_rss() -> int:
+    try:
+        import resource
+    except ImportError:
+        return 0  # NB: The resource module is only available on Unix.
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # NB: The maximum resident set size is in kilobytes on Linux, but in bytes on macOS.
+    return max_rss if sys.platform == "darwin" else 1024 * max_rss
+
+
+########################################################################################################################
+
+
+_active_profiler: Optional[Profiler] = None
+# NB: A null context can be entered repeatedly, so a single one is shared by all stages recorded without a profiler.
+_null_stage = contextlib.nullcontext()
+
+
+def profile_stage(name: str) -> "contextlib.AbstractContextManager[None]":
+    """
+    Record the wall time and peak memory of a stage with the active profiler, if any.
+    :param name: Name of the stage.
+    :return: Context manager enclosing the stage.
+    """
+    if _active_profiler is None:
+        return _null_stage
+    return _active_profiler.stage(name)
+
+
+def count_profile_event(name: str, value: int = 1) -> None:
+    if _active_profiler is not None:
+        _active_profiler.count(name, value)
+
+
+def print_profile_summary(profiler: Profiler, profile_format: str) -> None:
+    if profile_format == "json":
+        import json
+
+        sys.stderr.write(json.dumps(profiler.to_dict(), indent=2) + "\n")
+    else:
+        sys.stderr.write(profiler.format_summary() + "\n")
+
+
+########################################################################################################################
@@ -0,0 +1,295 @@
+"""
+
+Makeshow target search utils
+
+"""
+
+import bisect
+import fnmatch
+import math
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+
+########################################################################################################################
+
+
+# Characters that make a desired target a pattern, like in shell globbing
+TARGET_PATTERN_CHARS = "*?["
+# Minimum trigram similarity of a suggested target name, like the default threshold of PostgreSQL's pg_trgm
+SUGGESTION_SIMILARITY_THRESHOLD = 0.3
+MAX_SUGGESTIONS = 3
+# Minimum length of a name for which the target names starting with it are suggested
+MIN_PREFIX_SUGGESTION_LENGTH = 3
+# Tokens of the target definitions in the definition token index, e.g. "docker", "push" and "VENV"
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class PrefixTrieNode:
+    """
+    Node of a compressed prefix trie (radix tree), whose edges are labeled by strings, so it has at most two nodes per
+    target name.
+    """
+
+    __slots__ = ["label", "children", "target_id"]
+
+    def __init__(self, label: str) -> None:
+        self.label = label  # Label of the edge from the parent node
+        self.children: Dict[str, PrefixTrieNode] = dict()  # Maps the first character of each child's label to it
+        self.target_id = -1  # Number of the target name ending at this node, or -1 if none does
+
+
+class TargetSearchIndex:
+    """
+    Search index of the target names of a Makefile, with a prefix trie for patterns like "docker_*", and a trigram
+    index for substring search and for suggesting names similar to a misspelled one.
+    A lookup only visits the trie nodes and trigram postings of the names that share a prefix or trigrams with the
+    query, rather than every target name.
+    """
+
+    def __init__(self, targets: Iterable[str]) -> None:
+        self.names: List[str] = list(dict.fromkeys(targets))
+        self.ids: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        self.root = PrefixTrieNode("")
+        self.postings: Dict[str, List[int]] = dict()  # Maps each trigram to the numbers of the names containing it
+        self.num_trigrams: List[int] = []
+        for target_id, name in enumerate(self.names):
+            self._insert(name, target_id)
+            trigrams = get_trigrams(name)
+            for trigram in trigrams:
+                self.postings.setdefault(trigram, []).append(target_id)
+            self.num_trigrams.append(len(trigrams))
+
+    def _insert(self, name: str, target_id: int) -> None:
+        node = self.root
+        rest = name
+        while rest != "":
+            child = node.children.get(rest[0])
+            if child is None:
+                child = PrefixTrieNode(rest)
+                node.children[rest[0]] = child
+                node = child
+                break
+            common = len(os.path.commonprefix([child.label, rest]))
+            if common < len(child.label):
+                # Split the edge at the end of the common prefix
+                middle = PrefixTrieNode(child.label[:common])
+                child.label = child.label[common:]
+                middle.children[child.label[0]] = child
+                node.children[rest[0]] = middle
+                child = middle
+            node = child
+            rest = rest[common:]
+        node.target_id = target_id
+
+    ####################################################################################################################
+
+    def find_prefix(self, prefix: str) -> List[str]:
+        """
+        :param prefix: Prefix.
+        :return: Target names starting with the prefix, in the order of their definition.
+        """
+        node = self.root
+        rest = prefix
+        while rest != "":
+            child = node.children.get(rest[0])
+            if child is None:
+                return []
+            if rest.startswith(child.label):
+                rest = rest[len(child.label) :]
+            elif child.label.startswith(rest):
+                rest = ""
+            else:
+                return []
+            node = child
+        # Collect the names of the subtree of the node
+        target_ids: List[int] = []
+        stack = [node]
+        while len(stack) > 0:
+            node = stack.pop()
+            if node.target_id >= 0:
+                target_ids.append(node.target_id)
+            stack += node.children.values()
+        return [self.names[i] for i in sorted(target_ids)]
+
+    def match_pattern(self, pattern: str) -> List[str]:
+        """
+        :param pattern: Shell-style pattern, e.g. "docker_*" or "test_?".
+        :return: Target names matching the pattern, in the order of their definition.
+        """
+        # NB: Only the names starting with the literal prefix of the pattern are matched against the whole pattern.
+        prefix_end = min([pattern.find(c) for c in TARGET_PATTERN_CHARS if c in pattern] + [len(pattern)])
+        return [name for name in self.find_prefix(pattern[:prefix_end]) if fnmatch.fnmatchcase(name, pattern)]
+
+    def search(self, substring: str) -> List[str]:
+        """
+        :param substring: Substring, which is matched case-insensitively.
+        :return: Target names containing the substring, in the order of their definition.
+        """
+        query = substring.lower()
+        if len(query) >= 3:
+            # A name containing the substring contains all of its trigrams, so intersect their postings, shortest first
+            postings = sorted((self.postings.get(query[i : i + 3], []) for i in range(len(query) - 2)), key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates.intersection_update(posting)
+        else:
+            # NB: Every character of a name is part of one of its padded trigrams, so those postings cover all matches.
+            candidates = set()
+            for trigram, posting in self.postings.items():
+                if query in trigram:
+                    candidates.update(posting)
+        return [self.names[i] for i in sorted(candidates) if query in self.names[i].lower()]
+
+    def suggest(self, name: str, max_suggestions: int = MAX_SUGGESTIONS) -> List[str]:
+        """
+        Suggest target names for a name that is not found, e.g. for "Did you mean ...?".
+        :param name: Target name that is not found.
+        :param max_suggestions: Maximum number of suggestions.
+        :return: Target names starting with the name (unless it is very short), followed by the names most similar to
+                 it by trigram similarity.
+        """
+        suggestions: List[str] = []
+        if len(name) >= MIN_PREFIX_SUGGESTION_LENGTH:
+            suggestions = self.find_prefix(name)[:max_suggestions]
+        # A name with a similarity above the threshold shares at least a given number of trigrams with the given name,
+        # so it contains one of its rarest trigrams, and only the postings of those need to be visited
+        trigrams = get_trigrams(name)
+        min_shared = math.ceil(SUGGESTION_SIMILARITY_THRESHOLD * len(trigrams))
+        rarest_trigrams = sorted(trigrams, key=lambda trigram: len(self.postings.get(trigram, [])))
+        candidates: Set[int] = set()
+        for trigram in rarest_trigrams[: len(trigrams) - min_shared + 1]:
+            candidates.update(self.postings.get(trigram, []))
+        similarities = []
+        for i in candidates:
+            shared = len(trigrams.intersection(get_trigrams(self.names[i])))
+            similarities.append((shared / (len(trigrams) + self.num_trigrams[i] - shared), i))
+        for similarity, i in sorted(similarities, key=lambda s: (-s[0], s[1])):
+            if len(suggestions) >= max_suggestions or similarity < SUGGESTION_SIMILARITY_THRESHOLD:
+                break
+            if self.names[i] not in suggestions:
+                suggestions.append(self.names[i])
+        return suggestions
+
+
+class DefinitionTokenIndex:
+    """
+    Inverted index of the tokens (runs of word characters) in the target definitions of a Makefile, for finding the
+    targets whose definitions contain a fixed string, e.g. "docker push" or "$(VENV)", without scanning every recipe.
+    A definition containing the string contains every token of it, except that the first and last tokens of the string
+    might only be the end or the start of a longer token, which are found in the sorted (reversed) token vocabulary,
+    and a string that is a single token might only be part of a longer token, which is found by the trigrams of the
+    tokens.
+    The index only holds target numbers, so it is small enough to be stored next to the parse cache.
+    """
+
+    def __init__(self, target_definitions: Dict[str, str]) -> None:
+        self.names: List[str] = list(target_definitions)
+        self.postings: Dict[str, List[int]] = dict()  # Maps each token to the numbers of the definitions containing it
+        for target_id, definition in enumerate(target_definitions.values()):
+            for token in set(TOKEN_PATTERN.findall(definition)):
+                self.postings.setdefault(token, []).append(target_id)
+        self.tokens = sorted(self.postings)
+        self.reversed_tokens = sorted(token[::-1] for token in self.postings)
+        self.token_postings: Dict[
+            str, List[int]
+        ] = dict()  # Maps each trigram to the numbers of the tokens containing it
+        for token_id, token in enumerate(self.tokens):
+            for trigram in {token[i : i + 3] for i in range(len(token) - 2)}:
+                self.token_postings.setdefault(trigram, []).append(token_id)
+
+    def find_candidates(self, fixed_string: str) -> List[str]:
+        """
+        :param fixed_string: Fixed string, which is matched case-sensitively.
+        :return: Target names whose definitions might contain the string, in the order of their definition. Every
+                 target whose definition contains it is included, but the definitions have to be checked.
+        """
+        candidates: Optional[Set[int]] = None
+        for match in TOKEN_PATTERN.finditer(fixed_string):
+            is_start_partial = match.start() == 0
+            is_end_partial = match.end() == len(fixed_string)
+            token = match.group()
+            if is_start_partial and is_end_partial:
+                tokens = self._find_tokens_containing(token)
+            elif is_start_partial:
+                tokens = [t[::-1] for t in _find_sorted_prefix(self.reversed_tokens, token[::-1])]
+            elif is_end_partial:
+                tokens = _find_sorted_prefix(self.tokens, token)
+            else:
+                tokens = [token] if token in self.postings else []
+            target_ids: Set[int] = set()
+            for t in tokens:
+                target_ids.update(self.postings[t])
+            candidates = target_ids if candidates is None else candidates.intersection(target_ids)
+        # NB: A string without any word characters, e.g. "$(", doesn't narrow down the targets.
+        if candidates is None:
+            return list(self.names)
+        return [self.names[i] for i in sorted(candidates)]
+
+    def _find_tokens_containing(self, substring: str) -> List[str]:
+        if len(substring) < 3:
+            # NB: Substrings shorter than a trigram are rare in queries, so the token vocabulary is scanned for them.
+            return [t for t in self.tokens if substring in t]
+        # A token containing the substring contains all of its trigrams, so intersect their postings, shortest first
+        postings = sorted(
+            (self.token_postings.get(substring[i : i + 3], []) for i in range(len(substring) - 2)), key=len
+        )
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+        return [self.tokens[i] for i in sorted(candidates) if substring in self.tokens[i]]
+
+
+def _find_sorted_prefix(sorted_strings: List[str], prefix: str) -> List[str]:
+    start = bisect.bisect_left(sorted_strings, prefix)
+    end = start
+    while end < len(sorted_strings) and sorted_strings[end].startswith(prefix):
+        end += 1
+    return sorted_strings[start:end]
+
+
+########################################################################################################################
+
+
+def get_trigrams(name: str) -> Set[str]:
+    # NB: The name is padded like in pg_trgm, so short names have trigrams too, and the first characters weigh more.
+    padded = f"  {name.lower()} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def is_target_pattern(target: str) -> bool:
+    return any(c in target for c in TARGET_PATTERN_CHARS)
+
+
+def expand_target_patterns(search_index: TargetSearchIndex, desired_targets: List[str]) -> List[str]:
+    """
+    Replace each desired target that is a pattern, rather than the name of a target, by the target names matching it.
+    :param search_index: Search index of the target names.
+    :param desired_targets: Desired targets, e.g. ["docker_*", "test"].
+    :return: Desired targets with the patterns expanded, where patterns without matches are kept as is.
+    """
+    expanded_targets: List[str] = []
+    for target in desired_targets:
+        is_pattern = is_target_pattern(target) and target not in search_index.ids
+        matches = search_index.match_pattern(target) if is_pattern else []
+        expanded_targets += matches if len(matches) > 0 else [target]
+    return expanded_targets
+
+
+def find_matching_lines(target_definitions: Dict[str, str], fixed_string: str) -> Dict[str, List[str]]:
+    """
+    Find the lines of the given target definitions that contain a fixed string, like "grep -F".
+    :param target_definitions: Target definitions, e.g. of the candidates from DefinitionTokenIndex.find_candidates.
+    :param fixed_string: Fixed string, which is matched case-sensitively.
+    :return: Matching lines by target, leaving out the targets without any.
+    """
+    matching_lines: Dict[str, List[str]] = dict()
+    for target, definition in target_definitions.items():
+        lines = [line for line in definition.split("\n") if fixed_string in line]
+        if len(lines) > 0:
+            matching_lines[target] = lines
+    return matching_lines
+
+
+########################################################################################################################
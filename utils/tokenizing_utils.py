@@ -0,0 +1,416 @@
+"""
+
+Makeshow Makefile tokenizing utils
+
+"""
+
+import dataclasses
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+
+########################################################################################################################
+
+
+# Characters that can separate the parts of a Makefile line, found outside of variable references,
+# see https://www.gnu.org/software/make/manual/html_node/Parsing-Makefiles.html
+SEPARATOR_PATTERN = re.compile(r"[:=;|#$\\]")
+# Matches the most common rule headers, i.e. targets and prerequisites without any variable references or other
+# separators, which are tokenized without searching the separators one by one
+SIMPLE_RULE_HEADER_PATTERN = re.compile(r"([^:=;|#$\\]*[^:=;|#$\\\s])\s*:(?![:=])([^:=;|#$\\]*)")
+# Opening and closing characters of variable references, e.g. "$(VAR)" and "${VAR}"
+REFERENCE_BRACKETS = {"(": ")", "{": "}"}
+
+# Words that can precede a variable assignment
+ASSIGNMENT_MODIFIERS = frozenset(["export", "override", "private", "unexport"])
+# Directives other than "define", which are recognized by their first word
+DIRECTIVE_NAMES = frozenset(
+    [
+        "ifeq",
+        "ifneq",
+        "ifdef",
+        "ifndef",
+        "else",
+        "endif",
+        "include",
+        "-include",
+        "sinclude",
+        "vpath",
+        "undefine",
+        "export",
+        "unexport",
+    ]
+)
+# First words that make a line something else than a rule header
+KEYWORDS = ASSIGNMENT_MODIFIERS | DIRECTIVE_NAMES | frozenset(["define", "endef"])
+# Assignment operators that end with "=", by the character before the "="
+ASSIGNMENT_OPERATORS = {"?": "?=", "+": "+=", "!": "!="}
+
+
+@dataclasses.dataclass
+class MakefileRuleHeader:
+    # NB: The records have no default values, so they can be slotted dataclasses, which are smaller and faster.
+    __slots__ = [
+        "line_number",
+        "targets",
+        "prerequisites",
+        "order_only_prerequisites",
+        "double_colon",
+        "target_pattern",
+        "inline_recipe",
+    ]
+    line_number: int
+    targets: List[str]
+    prerequisites: List[str]
+    order_only_prerequisites: List[str]  # Prerequisites after a "|"
+    double_colon: bool  # Whether the rule is a "::" rule
+    target_pattern: Optional[str]  # Target pattern of a static pattern rule, e.g. "%.o" in "a.o b.o: %.o: %.c"
+    inline_recipe: Optional[str]  # Recipe after a ";" on the header line
+
+
+@dataclasses.dataclass
+class MakefileAssignment:
+    __slots__ = ["line_number", "name", "operator", "value", "targets", "modifiers"]
+    line_number: int
+    name: str
+    operator: str  # One of "=", ":=", "::=", ":::=", "?=", "+=" and "!=", where "define" defaults to "="
+    value: str
+    targets: List[str]  # Targets of a target-specific assignment, or an empty list for a global one
+    modifiers: List[str]  # E.g. ["export"] or ["override"]
+
+
+@dataclasses.dataclass
+class MakefileDirective:
+    __slots__ = ["line_number", "name", "argument"]
+    line_number: int
+    name: str  # E.g. "ifeq", "include" or "vpath"
+    argument: str
+
+
+MakefileStatement = Union[MakefileRuleHeader, MakefileAssignment, MakefileDirective]
+
+
+########################################################################################################################
+
+
+class MakefileTokenizer:
+    """
+    One-pass tokenizer of Makefile lines, which turns each logical line into a rule header, variable assignment or
+    directive record, following the parsing rules of GNU make.
+    The tokenizer is a state machine, which is either reading normal lines or the body of a "define" directive, whose
+    lines are collected into a single assignment that is emitted at the matching "endef".
+    Recipe lines, i.e. lines starting with a tab, and lines that are none of the above, e.g. comments, yield no record.
+    """
+
+    def __init__(self) -> None:
+        self.define: Optional[MakefileAssignment] = None  # Assignment of the open "define" directive
+        self.define_depth = 0  # Number of open "define" directives, as they can be nested
+        self.define_lines: List[str] = []
+
+    def feed(self, line: str, line_number: int) -> Optional[MakefileStatement]:
+        """
+        :param line: Logical Makefile line, i.e. with backslash-newlines already handled.
+        :param line_number: Index of the line, which is stored in the record.
+        :return: Record of the line, or None if the line yields no record (yet).
+        """
+        if self.define is not None:
+            return self._feed_define_body(line)
+        if line == "" or line[0] == "\t":
+            return None
+        return self._tokenize_line(line.lstrip(" "), line_number)
+
+    def _feed_define_body(self, line: str) -> Optional[MakefileStatement]:
+        words = line.split(None, 2)
+        keyword = words[1] if len(words) >= 2 and words[0] in ASSIGNMENT_MODIFIERS else words[0] if words else ""
+        if keyword == "define":
+            self.define_depth += 1
+        elif keyword == "endef":
+            self.define_depth -= 1
+            if self.define_depth == 0:
+                assignment = self.define
+                assert assignment is not None
+                assignment.value = "\n".join(self.define_lines)
+                self.define = None
+                self.define_lines = []
+                return assignment
+        self.define_lines.append(line)
+        return None
+
+    def _tokenize_line(self, line: str, line_number: int) -> Optional[MakefileStatement]:
+        if line[0] == "#":
+            return None
+        match = SIMPLE_RULE_HEADER_PATTERN.fullmatch(line)
+        if match is not None:
+            targets = match.group(1).split()
+            if targets[0] not in KEYWORDS:
+                return MakefileRuleHeader(line_number, targets, match.group(2).split(), [], False, None, None)
+        # Strip the modifiers in front of an assignment, and recognize the directives by their first word
+        modifiers: List[str] = []
+        text = line
+        word, rest = split_first_word(text)
+        while word in ASSIGNMENT_MODIFIERS and rest != "" and not starts_with_assignment_operator(rest):
+            modifiers.append(word)
+            text = rest
+            word, rest = split_first_word(rest)
+        if word == "define":
+            name, operator = parse_define_arguments(rest)
+            self.define = MakefileAssignment(line_number, name, operator, "", [], modifiers)
+            self.define_depth = 1
+            return None
+        if word in DIRECTIVE_NAMES and len(modifiers) == 0 and not starts_with_assignment_operator(rest):
+            return MakefileDirective(line_number, word, strip_comment(rest).strip())
+        statement = tokenize_rule_or_assignment(text, line_number)
+        if isinstance(statement, MakefileAssignment):
+            statement.modifiers = modifiers
+        elif len(modifiers) > 0:
+            # NB: E.g. "export VAR1 VAR2", which exports variables without assigning them.
+            return MakefileDirective(line_number, modifiers[0], strip_comment(text).strip())
+        return statement
+
+
+def iter_makefile_statements(lines: Iterable[str]) -> Iterator[MakefileStatement]:
+    """
+    Tokenize Makefile lines into a stream of rule header, variable assignment and directive records.
+    :param lines: Logical Makefile lines, e.g. streamed by iter_lines_from_makefile_and_its_included_files.
+    :return: Iterator over the records, whose line numbers are the indices of their (first) lines.
+    """
+    tokenizer = MakefileTokenizer()
+    for i, line in enumerate(lines):
+        statement = tokenizer.feed(line, i)
+        if statement is not None:
+            yield statement
+
+
+def tokenize_line(line: str, line_number: int = 0) -> Optional[MakefileStatement]:
+    """
+    Tokenize a single Makefile line, without the context of the lines before it.
+    :param line: Logical Makefile line.
+    :param line_number: Line number to store in the record.
+    :return: Record of the line, or None if it yields no record.
+    """
+    return MakefileTokenizer().feed(line, line_number)
+
+
+########################################################################################################################
+
+
+def tokenize_rule_or_assignment(text: str, line_number: int) -> Optional[MakefileStatement]:
+    """
+    Tokenize a line that is not a directive, based on the first separator found outside of variable references.
+    I.e. a "=" makes the line an assignment, and a ":" makes it a rule header, unless it is part of ":=" or "::=".
+    :param text: Makefile line without leading whitespace and assignment modifiers.
+    :param line_number: Line number to store in the record.
+    :return: Rule header or assignment record, or None if the line is neither.
+    """
+    # NB: Only the first separator is needed, so it is found without creating an iterator.
+    pos = find_separator(text, 0)
+    separator = text[pos] if pos >= 0 else ""
+    if separator == "=":
+        return parse_assignment_at(text, pos, line_number)
+    if separator == ":":
+        assignment = parse_assignment_at(text, pos, line_number)
+        return assignment if assignment is not None else parse_rule_header(text, pos, line_number)
+    return None
+
+
+def parse_assignment_at(text: str, pos: int, line_number: int) -> Optional[MakefileAssignment]:
+    # An assignment operator is either "=" with an optional "?", "+" or "!" before it, or ":=", "::=" or ":::="
+    if text[pos] == "=":
+        operator = ASSIGNMENT_OPERATORS.get(text[pos - 1], "=") if pos > 0 else "="
+        name_end = pos - len(operator) + 1
+        value_start = pos + 1
+    else:
+        colons = len(text) - pos - len(text[pos:].lstrip(":"))
+        if not text.startswith("=", pos + colons) or colons > 3:
+            return None
+        operator = ":" * colons + "="
+        name_end = pos
+        value_start = pos + colons + 1
+    name = text[:name_end].strip()
+    if name == "":
+        return None
+    return MakefileAssignment(line_number, name, operator, strip_comment(text[value_start:]).strip(), [], [])
+
+
+def parse_rule_header(text: str, colon_pos: int, line_number: int) -> Optional[MakefileStatement]:
+    """
+    Parse a rule header, i.e. "<targets> :[:] [<target pattern>:] <prerequisites> [| <order-only prerequisites>]",
+    optionally followed by a "; <recipe>", or a target-specific assignment "<targets> : <assignment>".
+    :param text: Makefile line without leading whitespace.
+    :param colon_pos: Position of the colon that ends the targets.
+    :param line_number: Line number to store in the record.
+    :return: Rule header or target-specific assignment record, or None if the line has no targets.
+    """
+    targets = split_words(text[:colon_pos])
+    if len(targets) == 0:
+        return None
+    double_colon = text.startswith("::", colon_pos)
+    tail = text[colon_pos + (2 if double_colon else 1) :]
+    target_pattern: Optional[str] = None
+    inline_recipe: Optional[str] = None
+    prerequisites_start = 0
+    order_only_pos = -1
+    end = len(tail)
+    for pos, separator in iter_separators(tail):
+        if separator == "#" or separator == ";":
+            inline_recipe = tail[pos + 1 :].strip() if separator == ";" else None
+            end = pos
+            break
+        if separator == "=" or separator == ":":
+            assignment = _parse_target_specific_assignment(tail, pos, line_number)
+            if assignment is not None:
+                assignment.targets = targets
+                return assignment
+        if separator == ":" and target_pattern is None:
+            target_pattern = tail[:pos].strip()
+            prerequisites_start = pos + 1
+        elif separator == "|" and order_only_pos < 0:
+            order_only_pos = pos
+    prerequisites_end = order_only_pos if order_only_pos >= 0 else end
+    return MakefileRuleHeader(
+        line_number=line_number,
+        targets=targets,
+        prerequisites=split_words(tail[prerequisites_start:prerequisites_end]),
+        order_only_prerequisites=split_words(tail[order_only_pos + 1 : end]) if order_only_pos >= 0 else [],
+        double_colon=double_colon,
+        target_pattern=target_pattern,
+        inline_recipe=inline_recipe,
+    )
+
+
+def _parse_target_specific_assignment(tail: str, pos: int, line_number: int) -> Optional[MakefileAssignment]:
+    # NB: Target-specific assignments can have modifiers too, e.g. "a: private VAR = x".
+    modifiers: List[str] = []
+    text = tail.lstrip()
+    word, rest = split_first_word(text)
+    while word in ASSIGNMENT_MODIFIERS and rest != "":
+        modifiers.append(word)
+        text = rest
+        word, rest = split_first_word(rest)
+    offset = len(tail) - len(text)
+    if pos < offset:
+        return None
+    assignment = parse_assignment_at(text, pos - offset, line_number)
+    if assignment is not None:
+        assignment.modifiers = modifiers
+    return assignment
+
+
+def parse_define_arguments(text: str) -> Tuple[str, str]:
+    # I.e. "define NAME" or "define NAME <operator>"
+    text = strip_comment(text).strip()
+    for operator in [":::=", "::=", ":=", "?=", "+=", "!=", "="]:
+        if text.endswith(operator):
+            return text[: -len(operator)].strip(), operator
+    return text, "="
+
+
+def starts_with_assignment_operator(text: str) -> bool:
+    # NB: E.g. "export := x" assigns the variable "export", rather than being an "export" directive.
+    return text[:1] in ["=", ":"] or text[:2] in ["?=", "+=", "!="]
+
+
+########################################################################################################################
+
+
+def iter_separators(text: str) -> Iterator[Tuple[int, str]]:
+    """
+    Find the separators of a Makefile line, i.e. the characters ":", "=", ";", "|" and "#", skipping the characters
+    inside of variable references like "$(VAR)" and "${VAR}", and characters escaped by a backslash.
+    :param text: Makefile text.
+    :return: Iterator over the position and the character of each separator.
+    """
+    pos = find_separator(text, 0)
+    while pos >= 0:
+        yield pos, text[pos]
+        pos = find_separator(text, pos + 1)
+
+
+def find_separator(text: str, pos: int) -> int:
+    """
+    :param text: Makefile text.
+    :param pos: Position to start searching from.
+    :return: Position of the next separator, like iter_separators finds them, or -1 if there is none.
+    """
+    while True:
+        match = SEPARATOR_PATTERN.search(text, pos)
+        if match is None:
+            return -1
+        pos = match.start()
+        char = text[pos]
+        if char == "$":
+            pos = skip_variable_reference(text, pos)
+        elif char == "\\":
+            pos += 2
+        else:
+            return pos
+
+
+def skip_variable_reference(text: str, pos: int) -> int:
+    """
+    :param text: Makefile text.
+    :param pos: Position of a "$".
+    :return: Position after the variable reference starting at the "$", e.g. after the ")" that closes "$(VAR)".
+    """
+    closing = REFERENCE_BRACKETS.get(text[pos + 1 : pos + 2])
+    if closing is None:
+        return pos + 2  # NB: E.g. "$@" or "$$".
+    opening = text[pos + 1]
+    depth = 0
+    for i in range(pos + 1, len(text)):
+        char = text[i]
+        if char == opening:
+            depth += 1
+        elif char == closing:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return len(text)
+
+
+def split_words(text: str) -> List[str]:
+    """
+    Split Makefile text on whitespace, except for whitespace inside of variable references, e.g. in "$(call f, x)".
+    :param text: Makefile text.
+    :return: Words.
+    """
+    if "$" not in text:
+        return text.split()
+    words: List[str] = []
+    start = -1
+    pos = 0
+    while pos < len(text):
+        char = text[pos]
+        if char.isspace():
+            if start >= 0:
+                words.append(text[start:pos])
+                start = -1
+            pos += 1
+            continue
+        if start < 0:
+            start = pos
+        pos = skip_variable_reference(text, pos) if char == "$" else pos + 1
+    if start >= 0:
+        words.append(text[start:])
+    return words
+
+
+def split_first_word(text: str) -> Tuple[str, str]:
+    """
+    :param text: Makefile text without leading whitespace.
+    :return: Tuple of the first word, i.e. up to the first whitespace, and the rest without leading whitespace.
+    """
+    parts = text.split(None, 1)
+    if len(parts) == 0:
+        return "", ""
+    return parts[0], parts[1] if len(parts) == 2 else ""
+
+
+def strip_comment(text: str) -> str:
+    for pos, separator in iter_separators(text):
+        if separator == "#":
+            return text[:pos]
+    return text
+
+
+########################################################################################################################
@@ -0,0 +1,191 @@
+"""
+
+Makeshow monorepo tree utils
+
+"""
+
+import concurrent.futures
+import dataclasses
+import hashlib
+import os
+import pickle
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .parsing_utils import build_makefile_index, get_single_target_definition, iter_lines_and_handle_backslashes
+
+
+########################################################################################################################
+
+
+TREE_INDEX_FORMAT_VERSION = 2
+MAKEFILE_NAMES = ["GNUmakefile", "makefile", "Makefile"]
+MAKEFILE_SUFFIX = ".mk"
+# Below this number of files to parse, starting a process pool costs more time than it saves
+MIN_FILES_FOR_PROCESS_POOL = 32
+
+
+@dataclasses.dataclass
+class TreeFileEntry:
+    mtime_ns: int
+    size: int
+    targets: List[str]
+
+
+@dataclasses.dataclass
+class TreeIndex:
+    version: int
+    root_dir: Path
+    files: Dict[str, TreeFileEntry]  # Maps the path of each Makefile, relative to the root folder, to its entry
+    target_files: Dict[str, List[str]]  # Maps each target to the relative paths of the Makefiles defining it
+
+
+########################################################################################################################
+
+
+def discover_makefiles(root_dir: Path) -> List[str]:
+    """
+    Find all Makefiles (i.e. files named GNUmakefile, makefile, Makefile or *.mk) under a folder, skipping hidden
+    folders such as .git.
+    :param root_dir: Root folder.
+    :return: Sorted paths of the Makefiles relative to the root folder, using forward slashes.
+    """
+    makefile_paths: List[str] = []
+    for dir_path, dir_names, file_names in os.walk(root_dir):
+        dir_names[:] = sorted(d for d in dir_names if not d.startswith("."))
+        rel_dir = Path(dir_path).relative_to(root_dir)
+        for file_name in sorted(file_names):
+            if file_name in MAKEFILE_NAMES or file_name.endswith(MAKEFILE_SUFFIX):
+                makefile_paths.append((rel_dir / file_name).as_posix())
+    return makefile_paths
+
+
+def find_makefile_targets(makefile_path: Path) -> Optional[List[str]]:
+    """
+    Find the targets defined in a single Makefile, without the targets of the files it includes.
+    :param makefile_path: Path to the Makefile.
+    :return: Targets, or None if the file could not be read.
+    """
+    try:
+        return build_makefile_index(iter_lines_and_handle_backslashes(makefile_path)).targets
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def find_makefile_target_definition(makefile_path: Path, target: str) -> Optional[str]:
+    """
+    Find the definition of a target in a single Makefile, without the files it includes.
+    :param makefile_path: Path to the Makefile.
+    :param target: Target name.
+    :return: Definition, or an empty string if the target isn't defined, or None if the file could not be read.
+    """
+    try:
+        index = build_makefile_index(iter_lines_and_handle_backslashes(makefile_path))
+    except (OSError, UnicodeDecodeError):
+        return None
+    return get_single_target_definition(index, target)
+
+
+########################################################################################################################
+
+
+def build_tree_index(root_dir: Path, previous_index: Optional[TreeIndex] = None, jobs: int = 0) -> TreeIndex:
+    """
+    Index the targets of every Makefile under a folder.
+    Makefiles whose size and modification time are unchanged since the previous index are not parsed again,
+    and the remaining Makefiles are parsed across a process pool.
+    :param root_dir: Root folder.
+    :param previous_index: Previous index of the same folder, or None to parse every Makefile.
+    :param jobs: Number of processes, or 0 to use one per CPU.
+    :return: Tree index.
+    """
+    previous_files = previous_index.files if previous_index is not None else dict()
+    files: Dict[str, TreeFileEntry] = dict()
+    paths_to_parse: List[str] = []
+    for rel_path in discover_makefiles(root_dir):
+        try:
+            stat = (root_dir / rel_path).stat()
+        except OSError:
+            continue
+        # Reuse the entries of Makefiles whose size and modification time are unchanged
+        entry = previous_files.get(rel_path)
+        if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+            files[rel_path] = entry
+        else:
+            files[rel_path] = TreeFileEntry(mtime_ns=stat.st_mtime_ns, size=stat.st_size, targets=[])
+            paths_to_parse.append(rel_path)
+
+    # Parse the new and changed Makefiles
+    makefile_paths = [root_dir / rel_path for rel_path in paths_to_parse]
+    num_processes = jobs if jobs > 0 else os.cpu_count() or 1
+    if num_processes == 1 or len(makefile_paths) < MIN_FILES_FOR_PROCESS_POOL:
+        parsed_targets = [find_makefile_targets(p) for p in makefile_paths]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=num_processes) as executor:
+            chunksize = max(1, len(makefile_paths) // (4 * num_processes))
+            parsed_targets = list(executor.map(find_makefile_targets, makefile_paths, chunksize=chunksize))
+    for rel_path, targets in zip(paths_to_parse, parsed_targets):
+        if targets is None:
+            sys.stderr.write(f"makeshow: Could not read Makefile: {root_dir / rel_path}\n")
+            targets = []
+        files[rel_path].targets = targets
+
+    # Merge the targets of all Makefiles, in the order of the Makefile paths
+    target_files: Dict[str, List[str]] = dict()
+    for rel_path, entry in files.items():
+        for target in entry.targets:
+            defining_files = target_files.setdefault(target, [])
+            if len(defining_files) == 0 or defining_files[-1] != rel_path:
+                defining_files.append(rel_path)
+    return TreeIndex(version=TREE_INDEX_FORMAT_VERSION, root_dir=root_dir, files=files, target_files=target_files)
+
+
+########################################################################################################################
+
+
+def get_tree_index_cache_path(root_dir: Path, cache_dir: Path) -> Path:
+    key = hashlib.sha256(str(root_dir.resolve()).encode()).hexdigest()[:32]
+    return cache_dir / "trees" / f"{key}.pickle"
+
+
+def load_cached_tree_index(root_dir: Path, cache_dir: Path) -> Optional[TreeIndex]:
+    try:
+        with get_tree_index_cache_path(root_dir, cache_dir).open("rb") as f:
+            index = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    if not isinstance(index, TreeIndex) or index.version != TREE_INDEX_FORMAT_VERSION:
+        return None
+    return index
+
+
+def store_tree_index_in_cache(index: TreeIndex, cache_dir: Path) -> None:
+    # Write the index atomically, so concurrent makeshow runs never see a partially written index
+    entry_path = get_tree_index_cache_path(index.root_dir, cache_dir)
+    entry_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = entry_path.with_suffix(f".{os.getpid()}.tmp")
+    with tmp_path.open("wb") as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, entry_path)
+
+
+def update_tree_index(root_dir: Path, cache_dir: Optional[Path] = None, jobs: int = 0) -> TreeIndex:
+    """
+    Index the targets of every Makefile under a folder, only parsing the Makefiles that changed since the cached index.
+    :param root_dir: Root folder.
+    :param cache_dir: Cache folder, or None to disable caching.
+    :param jobs: Number of processes, or 0 to use one per CPU.
+    :return: Tree index.
+    """
+    previous_index = load_cached_tree_index(root_dir, cache_dir) if cache_dir is not None else None
+    index = build_tree_index(root_dir, previous_index, jobs=jobs)
+    if cache_dir is not None and (previous_index is None or previous_index.files != index.files):
+        try:
+            store_tree_index_in_cache(index, cache_dir)
+        except OSError:
+            pass  # NB: A read-only or full cache folder should never make makeshow fail.
+    return index
+
+
+########################################################################################################################
@@ -0,0 +1,110 @@
+"""
+
+Makeshow watch utils
+
+"""
+
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .caching_utils import get_file_stat, get_loaded_file_paths
+from .dependency_utils import DependencyGraph
+from .parsing_utils import IncludedFileLoader, MakefileIndex, SourceLineLoader, build_makefile_index
+from .parsing_utils import collapse_blank_lines, get_target_list_dependencies, splice_loaded_files
+from .parsing_utils import update_makefile_index
+
+
+########################################################################################################################
+
+
+WATCH_POLL_INTERVAL = 0.2  # Seconds between checking the Makefile and its included files for changes
+CLEAR_TERMINAL = "\033[H\033[2J"
+
+
+class MakefileWatcher:
+    """
+    Index of a Makefile and its included files that is kept up to date while they change.
+    The lines of every file are kept, so only the files that changed are read again, and only the blocks around the
+    lines that changed are indexed again.
+    NB: The kept lines are still spliced and compared again after every change, which takes time linear in the total
+    number of lines, but is much faster than reading and indexing them again.
+    With source_positions, the lines are kept as SourceLine objects, e.g. for the records of get_target_record.
+    """
+
+    def __init__(self, makefile_path: Path, source_positions: bool = False) -> None:
+        self.makefile_path = makefile_path
+        self.loader = (
+            SourceLineLoader(makefile_path.parent) if source_positions else IncludedFileLoader(makefile_path.parent)
+        )
+        self.file_stats: Dict[Path, Tuple[int, int]] = dict()
+        self.index: MakefileIndex = build_makefile_index(self._load_lines())
+        self._dependency_graph: Optional[DependencyGraph] = None
+
+    def get_dependency_graph(self) -> DependencyGraph:
+        # NB: The index is updated in place, so the graph is compiled again after every change.
+        if self._dependency_graph is None:
+            self._dependency_graph = DependencyGraph(get_target_list_dependencies(self.index, self.index.targets))
+        return self._dependency_graph
+
+    def poll(self) -> bool:
+        """
+        Check the size and modification time of the Makefile and its included files, and update the index if needed.
+        :return: True if the index was updated, otherwise False.
+        """
+        changed_file_paths = [p for p, file_stat in self.file_stats.items() if get_file_stat(p) != file_stat]
+        if len(changed_file_paths) == 0:
+            return False
+        for p in changed_file_paths:
+            self.loader.loaded_files.pop(p.resolve(), None)
+        new_lines = self._load_lines()
+        start, end, new_end = find_changed_line_range(self.index.lines, new_lines)
+        update_makefile_index(self.index, start, end, new_lines[start:new_end])
+        # NB: Unchanged lines might have moved within their file, so their source positions come from the new lines.
+        self.index.lines[:] = new_lines
+        self._dependency_graph = None
+        return True
+
+    def _load_lines(self) -> List[str]:
+        include_graph: Dict[Path, List[Path]] = dict()
+        lines = list(collapse_blank_lines(splice_loaded_files(self.makefile_path, self.loader, include_graph)))
+        # NB: The files are stat'ed after they are read, so a file changed while it is read is only noticed once the
+        #  file changes again.
+        self.file_stats = {p: get_file_stat(p) for p in get_loaded_file_paths(include_graph)}
+        return lines
+
+
+def poll_makefile_watcher(watcher: MakefileWatcher) -> bool:
+    """
+    Poll a Makefile watcher, warning about files that can't be read (e.g. while an editor replaces them) instead of
+    failing, in which case they are read again at the next poll.
+    :param watcher: Makefile watcher.
+    :return: True if the index was updated, otherwise False.
+    """
+    try:
+        return watcher.poll()
+    except (OSError, UnicodeDecodeError) as e:
+        sys.stderr.write(f"makeshow: {e}\n")
+        return False
+
+
+def find_changed_line_range(old_lines: List[str], new_lines: List[str]) -> Tuple[int, int, int]:
+    """
+    Find the range of lines that differs between two versions of a list of lines, by skipping the common prefix and
+    the common suffix.
+    :param old_lines: Old lines.
+    :param new_lines: New lines.
+    :return: Tuple (start, end, new_end), such that new_lines is old_lines with old_lines[start:end] replaced by
+        new_lines[start:new_end].
+    """
+    max_common = min(len(old_lines), len(new_lines))
+    start = 0
+    while start < max_common and old_lines[start] == new_lines[start]:
+        start += 1
+    suffix = 0
+    while suffix < max_common - start and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+        suffix += 1
+    return start, len(old_lines) - suffix, len(new_lines) - suffix
+
+
+########################################################################################################################